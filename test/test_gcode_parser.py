@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# Software License Agreement (MIT License)
+#
+# Copyright (c) 2018, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import unittest
+
+from xarm.x3.parse import GcodeParser
+
+
+class TestGcodeParser(unittest.TestCase):
+    def setUp(self):
+        self.parser = GcodeParser()
+
+    def test_tokenize(self):
+        self.assertEqual(self.parser.tokenize('G1 X300 Y-10.5 Z100 F100'),
+                         {'G': '1', 'X': '300', 'Y': '-10.5', 'Z': '100', 'F': '100'})
+        # the first word of every letter
+        self.assertEqual(self.parser.tokenize('G1 X1 X2'), {'G': '1', 'X': '1'})
+        self.assertEqual(self.parser.tokenize('G1X1Y2'), {'G': '1', 'X': '1', 'Y': '2'})
+        self.assertEqual(self.parser.tokenize(''), {})
+
+    def test_tokenize_hex_addr(self):
+        # D{addr} is hex, its letters are not read as other words
+        self.assertEqual(self.parser.tokenize('M116 D0A0B V1'), {'M': '116', 'D': '0A0B', 'V': '1'})
+        self.assertEqual(self.parser.tokenize('S2 D1FF'), {'S': '2', 'D': '1FF'})
+        words = self.parser.tokenize('M116 D0A0B V1')
+        self.assertEqual(self.parser.get_addr(words), 0x0A0B)
+        self.assertEqual(self.parser.get_addr('M116 D0A0B V1'), 0x0A0B)
+        self.assertEqual(self.parser.get_addr({'D': '12'}, default=-1), -1)
+        self.assertEqual(self.parser.get_addr({'D': 'XYZ'}, default=-1), -1)
+
+    def test_compile_line(self):
+        self.assertEqual(self.parser.compile_line('G1 X300 Y-10.5 Z100 F100\n'),
+                         ('G', 1, {'X': '300', 'Y': '-10.5', 'Z': '100', 'F': '100'}))
+        # lower case
+        self.assertEqual(self.parser.compile_line('g1 x1 y2'), ('G', 1, {'X': '1', 'Y': '2'}))
+        # the command letter is taken out of the words
+        self.assertEqual(self.parser.compile_line('M5 I1.5'), ('M', 5, {'I': '1.5'}))
+        self.assertEqual(self.parser.compile_line('H5'), ('H', 5, {}))
+        self.assertEqual(self.parser.compile_line('M116 D0A0B V1'), ('M', 116, {'D': '0A0B', 'V': '1'}))
+        self.assertEqual(self.parser.compile_line('C131 V1'), ('C', 131, {'V': '1'}))
+        self.assertEqual(self.parser.compile_line('; comment'), (None, -1, {}))
+        self.assertEqual(self.parser.compile_line('X1 Y2'), (None, -1, {'X': '1', 'Y': '2'}))
+
+    def test_compile(self):
+        lines = ['G1 X1\n', '\n', '; comment\n', 'M2\n', 'G7 I1 J2\n']
+        self.assertEqual(list(self.parser.compile(lines)),
+                         [('G', 1, {'X': '1'}), ('M', 2, {}), ('G', 7, {'I': '1', 'J': '2'})])
+
+    def test_format_cmd(self):
+        cmd = self.parser.compile_line('G1 X300 Y-10.5 F100')
+        self.assertEqual(self.parser.format_cmd(cmd), 'G1 X300 Y-10.5 F100')
+        self.assertEqual(self.parser.compile_line(self.parser.format_cmd(cmd)), cmd)
+
+    def test_getters(self):
+        line = 'G1 X300 Y-10 Z100 A1 F50 Q500 T0.5 R5'
+        words = self.parser.compile_line(line)[2]
+        for string in (line, words):
+            self.assertEqual(self.parser.get_poses(string), [300.0, -10.0, 100.0, 1.0, None, None])
+            self.assertEqual(self.parser.get_poses(string, default=0), [300.0, -10.0, 100.0, 1.0, 0, 0])
+            self.assertEqual(self.parser.get_mvvelo(string), 50.0)
+            self.assertEqual(self.parser.get_mvacc(string), 500.0)
+            self.assertEqual(self.parser.get_mvtime(string), 0.5)
+            self.assertEqual(self.parser.get_mvradius(string), 5.0)
+        line = 'G7 I1 J2 M5'
+        words = self.parser.compile_line(line)[2]
+        for string in (line, words):
+            # the command word of the line is not read as a joint
+            self.assertEqual(self.parser.get_joints(string), [1.0, 2.0, None, None, 5.0, None, None])
+        self.assertEqual(self.parser.get_joints('M5 I1'), [1.0, None, None, None, None, None, None])
+
+    def test_values(self):
+        self.assertEqual(self.parser.get_int_value('M116 D0A0B V1'), 1)
+        # the int value is kept for the lines without V
+        self.assertEqual(self.parser.get_int_value('M116 D0A0B'), 1)
+        self.assertEqual(self.parser.get_int_value({'V': '1.5'}, default=0), 1)
+        self.assertEqual(self.parser.get_float_value({'V': '-1.5'}), -1.5)
+        self.assertEqual(self.parser.get_float_value({}), 0)
+        self.assertEqual(self.parser.get_gcode_cmd_num('G12 X1', 'G'), 12)
+        self.assertEqual(self.parser.get_gcode_cmd_num('X1', 'G'), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import struct
+import unittest
+
+from xarm.core.utils.report_decoder import ReportChangeDetector, REPORT_CHANGE_FIELDS, REPORT_REAL_LAYOUT, \
+    REPORT_NORMAL_LAYOUT, REPORT_RICH_LAYOUT, CHANGED_STATE, CHANGED_MODE, CHANGED_CMDNUM, CHANGED_MTBRAKE, \
+    CHANGED_MTABLE, CHANGED_ERROR_CODE, CHANGED_WARN_CODE, CHANGED_TEMPERATURES, CHANGED_COUNT, CHANGED_IDEN_PROGRESS
+
+
+def make_frame(length):
+    data = bytearray(length)
+    data[0:4] = struct.pack('>I', length)
+    return data
+
+
+class TestReportChangeDetector(unittest.TestCase):
+    def test_fixed_bits(self):
+        bits = (CHANGED_STATE, CHANGED_MODE, CHANGED_CMDNUM, CHANGED_MTBRAKE, CHANGED_MTABLE, CHANGED_ERROR_CODE,
+                CHANGED_WARN_CODE, CHANGED_TEMPERATURES, CHANGED_COUNT, CHANGED_IDEN_PROGRESS)
+        self.assertEqual(bits, tuple(1 << i for i in range(len(REPORT_CHANGE_FIELDS))))
+        detector = ReportChangeDetector(REPORT_RICH_LAYOUT)
+        for i, name in enumerate(REPORT_CHANGE_FIELDS):
+            self.assertEqual(detector.get_bit(name), 1 << i, name)
+
+    def test_first_frame(self):
+        detector = ReportChangeDetector(REPORT_RICH_LAYOUT)
+        self.assertEqual(detector.update(make_frame(502)), (1 << len(REPORT_CHANGE_FIELDS)) - 1)
+        self.assertEqual(detector.update(make_frame(502)), 0)
+        # only the fields inside the frame
+        detector = ReportChangeDetector(REPORT_RICH_LAYOUT)
+        self.assertEqual(detector.update(make_frame(245)),
+                         CHANGED_STATE | CHANGED_MODE | CHANGED_CMDNUM | CHANGED_MTBRAKE | CHANGED_MTABLE |
+                         CHANGED_ERROR_CODE | CHANGED_WARN_CODE)
+        # a frame of another length is a first frame again
+        self.assertEqual(detector.update(make_frame(502)), (1 << len(REPORT_CHANGE_FIELDS)) - 1)
+        detector.reset()
+        self.assertEqual(detector.update(make_frame(502)), (1 << len(REPORT_CHANGE_FIELDS)) - 1)
+
+    def test_changes(self):
+        detector = ReportChangeDetector(REPORT_RICH_LAYOUT)
+        frame = make_frame(502)
+        detector.update(frame)
+        cases = (
+            (4, 0x01, CHANGED_STATE),
+            (4, 0x21, CHANGED_MODE),
+            (4, 0x12, CHANGED_STATE | CHANGED_MODE),
+            (6, 1, CHANGED_CMDNUM),
+            (87, 1, CHANGED_MTBRAKE),
+            (88, 1, CHANGED_MTABLE),
+            (89, 22, CHANGED_ERROR_CODE),
+            (90, 23, CHANGED_WARN_CODE),
+            (251, 40, CHANGED_TEMPERATURES),
+            (287, 1, CHANGED_COUNT),
+            (481, 50, CHANGED_IDEN_PROGRESS),
+            # not a field of the mask
+            (10, 1, 0),
+        )
+        for index, value, mask in cases:
+            frame[index] = value
+            self.assertEqual(detector.update(frame), mask, index)
+            self.assertEqual(detector.update(frame), 0, index)
+
+    def test_get_bit(self):
+        detector = ReportChangeDetector(REPORT_RICH_LAYOUT)
+        frame = make_frame(502)
+        detector.update(frame)
+        bit = detector.get_bit('currents')
+        self.assertEqual(bit, 1 << len(REPORT_CHANGE_FIELDS))
+        self.assertEqual(detector.get_bit('currents'), bit)
+        self.assertEqual(detector.get_bit('voltages'), bit << 1)
+        self.assertEqual(detector.get_bit('bogus'), 0)
+        # a new field is reported on the next frame, so the subscriber gets the current value
+        self.assertEqual(detector.update(frame), bit | bit << 1)
+        self.assertEqual(detector.update(frame), 0)
+        frame[360] = 1
+        self.assertEqual(detector.update(frame), bit)
+
+    def test_layouts(self):
+        # the fields not in the layout have no bit
+        detector = ReportChangeDetector(REPORT_REAL_LAYOUT)
+        self.assertEqual(detector.get_bit('error_code'), 0)
+        self.assertEqual(detector.update(make_frame(135)), CHANGED_STATE | CHANGED_MODE | CHANGED_CMDNUM)
+        detector = ReportChangeDetector(REPORT_NORMAL_LAYOUT)
+        self.assertEqual(detector.get_bit('count'), 0)
+        self.assertEqual(detector.get_bit('warn_code'), CHANGED_WARN_CODE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import struct
+import unittest
+
+from xarm.core.utils.report_decoder import ReportDecoder, REPORT_REAL_LAYOUT, REPORT_NORMAL_LAYOUT, \
+    REPORT_RICH_LAYOUT, REPORT_TIMESTAMP_OFFSET, rich_report_decoder, get_report_field
+
+
+def field_size(fmt, count):
+    item = '{}{}'.format(count, fmt[-1]) if count > 1 or fmt[-1] == 's' else fmt[-1]
+    return struct.calcsize('<' + item)
+
+
+def make_values(layout):
+    """
+    :return: {name: value} of distinct values, exactly representable by the format of every field
+    """
+    values = {}
+    for i, (name, offset, fmt, count) in enumerate(layout):
+        code = fmt[-1]
+        if code == 's':
+            values[name] = bytes((i + j) % 256 for j in range(count))
+        elif code == 'f':
+            values[name] = [i + j * 0.25 for j in range(count)]
+        else:
+            values[name] = [(i * 7 + j) % 256 for j in range(count)]
+        if count == 1 and code != 's':
+            values[name] = values[name][0]
+    return values
+
+
+def pack_frame(layout, values, length):
+    data = bytearray(length)
+    for name, offset, fmt, count in layout:
+        if offset + field_size(fmt, count) > length:
+            continue
+        value = values[name]
+        if fmt[-1] == 's':
+            data[offset:offset + count] = value
+        else:
+            items = value if isinstance(value, list) else [value]
+            endian = '>' if fmt[0] == '>' else '<'
+            struct.pack_into('{}{}{}'.format(endian, count, fmt[-1]), data, offset, *items)
+    return bytes(data)
+
+
+class TestReportDecoder(unittest.TestCase):
+    def check_layout(self, layout, lengths):
+        decoder = ReportDecoder(layout)
+        values = make_values(layout)
+        for length in lengths:
+            report = decoder.decode(pack_frame(layout, values, length))
+            for name, offset, fmt, count in layout:
+                if offset + field_size(fmt, count) > length:
+                    self.assertNotIn(name, report, '{} {}'.format(name, length))
+                else:
+                    self.assertEqual(report[name], values[name], '{} {}'.format(name, length))
+
+    def test_real(self):
+        self.check_layout(REPORT_REAL_LAYOUT, (87, 111, 135))
+
+    def test_normal(self):
+        self.check_layout(REPORT_NORMAL_LAYOUT, (133, 145))
+
+    def test_rich(self):
+        self.check_layout(REPORT_RICH_LAYOUT, range(145, 503))
+
+    def test_offsets(self):
+        # the offsets of the controller frames, byte 314 is is_simulation_robot
+        offsets = {name: offset for name, offset, _, _ in REPORT_RICH_LAYOUT}
+        self.assertEqual((offsets['angles'], offsets['pose'], offsets['torque']), (7, 35, 59))
+        self.assertEqual((offsets['error_code'], offsets['gravity_direction']), (89, 133))
+        self.assertEqual((offsets['temperatures'], offsets['count'], offsets['world_offset']), (245, 284, 288))
+        self.assertEqual((offsets['is_simulation_robot'], offsets['is_collision_detection']), (314, 315))
+        self.assertEqual((offsets['voltages'], offsets['currents'], offsets['cgpio_digital']), (341, 355, 383))
+        self.assertEqual((offsets['ft_ext_force'], offsets['iden_progress']), (433, 481))
+        self.assertEqual(REPORT_TIMESTAMP_OFFSET, 494)
+        # the fields do not overlap
+        end = 0
+        for name, offset, fmt, count in REPORT_RICH_LAYOUT:
+            self.assertGreaterEqual(offset, end, name)
+            end = offset + field_size(fmt, count)
+        self.assertEqual(end, 502)
+
+    def test_endian(self):
+        data = bytearray(502)
+        data[0:4] = struct.pack('>I', 502)
+        data[4] = 0x12
+        data[5:7] = struct.pack('>H', 3)
+        data[7:11] = struct.pack('<f', 1.5)
+        data[284:288] = struct.pack('>I', 123456)
+        data[341:343] = struct.pack('>H', 2400)
+        data[494:502] = struct.pack('>Q', 1700000000123456)
+        report = rich_report_decoder.decode(bytes(data))
+        self.assertEqual((report['length'], report['cmd_num'], report['angles'][0]), (502, 3, 1.5))
+        self.assertEqual((report['count'], report['voltages'][0], report['timestamp']), (123456, 2400, 1700000000123456))
+        self.assertEqual((get_report_field(report, 'state'), get_report_field(report, 'mode')), (2, 1))
+        self.assertIsNone(get_report_field(report, 'bogus'))
+
+    def test_memoryview(self):
+        data = pack_frame(REPORT_NORMAL_LAYOUT, make_values(REPORT_NORMAL_LAYOUT), 145)
+        decoder = ReportDecoder(REPORT_NORMAL_LAYOUT)
+        self.assertEqual(decoder.decode(memoryview(data)), decoder.decode(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import math
+import queue
+import random
+import struct
+import threading
+import time
+import unittest
+
+from xarm.core.comm import RxBuffer, ReportFrameSplitter, ReportQueue
+from xarm.x3.report import ReportHandler
+
+
+def make_frame(length, seed=0, length_field=None):
+    """
+    :return: report frame of random bytes, the length field is length (or length_field), the version is ascii
+    """
+    rnd = random.Random(seed * 1000 + length)
+    data = bytearray(rnd.getrandbits(8) for _ in range(length))
+    data[0:4] = struct.pack('>I', length if length_field is None else length_field)
+    if length >= 181:
+        data[151:181] = b'1.13.8'.ljust(30, b'\x00')
+    return bytes(data)
+
+
+def values_equal(a, b):
+    if isinstance(a, float) and isinstance(b, float):
+        return a == b or (math.isnan(a) and math.isnan(b))
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(values_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+class LegacyReportHandler(object):
+    """
+    ReportHandler of the baseline (buffer += data, one frame per call), the reference of the streaming parser
+    The fields after byte 314 are read at the offsets of REPORT_RICH_LAYOUT, the baseline ignored is_simulation_robot
+    """
+    def __init__(self, report_type):
+        self.buffer = b''
+        self.report_size = 0
+        self.report_type = report_type
+
+    def reset(self):
+        self.buffer = b''
+        self.report_size = 0
+
+    def process_report_data(self, recv_data):
+        self.buffer += recv_data
+        if len(self.buffer) < 4:
+            return
+        if self.report_size == 0:
+            self.report_size = struct.unpack('>I', self.buffer[:4])[0]
+        if len(self.buffer) < self.report_size:
+            return
+        if self.report_type == 'rich' and self.report_size == 233 and len(self.buffer) >= 245:
+            if len(self.buffer) >= 249:
+                if struct.unpack('>I', self.buffer[245:249])[0] != self.report_size:
+                    if struct.unpack('>I', self.buffer[233:237])[0] == self.report_size:
+                        size = self.report_size
+                    else:
+                        self.reset()
+                        return -1
+                else:
+                    size = 245
+            elif struct.unpack('>I', self.buffer[233:237])[0] != self.report_size:
+                size = 245
+            else:
+                size = self.report_size
+        else:
+            size = self.report_size
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return self.parse(data)
+
+    def parse(self, rx_data):
+        def fp32s(start, n):
+            return list(struct.unpack('<{}f'.format(n), rx_data[start:start + n * 4]))
+
+        def bits(value):
+            return [value >> i & 0x01 for i in range(8)]
+
+        length = len(rx_data)
+        ret = [length, rx_data[4] & 0x0F, rx_data[4] >> 4, struct.unpack('>H', rx_data[5:7])[0],
+               fp32s(7, 7), fp32s(35, 6), fp32s(59, 7)]
+        if self.report_type == 'devlop':
+            return ret
+        mtbrake, mtable, error_code, warn_code = rx_data[87:91]
+        ret.extend([bits(mtbrake), bits(mtable), error_code, warn_code, fp32s(91, 6), fp32s(115, 4),
+                    rx_data[131], rx_data[132], fp32s(133, 3)])
+        if self.report_type != 'rich':
+            return ret
+        if length >= 151:
+            ret.extend(rx_data[145:151])
+        if length >= 181:
+            ret.append(str(rx_data[151:180], 'utf-8'))
+        if length >= 201:
+            ret.extend(fp32s(181, 5))
+        if length >= 221:
+            ret.extend(fp32s(201, 5))
+        if length >= 229:
+            ret.extend(fp32s(221, 2))
+        if length >= 245:
+            servo_code = list(rx_data[229:245])
+            ret.extend([servo_code[:-2], servo_code[-2:]])
+        if length >= 252:
+            ret.append(list(rx_data[245:252]))
+        if length >= 284:
+            ret.append(fp32s(252, 8))
+        if length >= 288:
+            ret.append(struct.unpack('>I', rx_data[284:288])[0])
+        if length >= 312:
+            ret.append(fp32s(288, 6))
+        if length >= 314:
+            ret.extend(rx_data[312:314])
+        if length >= 417:
+            ret.extend([rx_data[315], rx_data[316], fp32s(317, 6)])
+            ret.append([x / 100 for x in struct.unpack('>7H', rx_data[341:355])])
+            ret.append(fp32s(355, 7))
+            cgpio_states = list(rx_data[383:385]) + list(struct.unpack('>8H', rx_data[385:401]))
+            cgpio_states[6:10] = [x / 4095.0 * 10.0 for x in cgpio_states[6:10]]
+            cgpio_states.append(list(rx_data[401:409]))
+            cgpio_states.append(list(rx_data[409:417]))
+            ret.append(cgpio_states)
+        return ret
+
+
+class TestRxBuffer(unittest.TestCase):
+    def test_extend_pop(self):
+        buf = RxBuffer(16)
+        buf.extend(b'abcdef')
+        self.assertEqual(len(buf), 6)
+        self.assertEqual(bytes(buf.peek(1, 2)), b'bc')
+        self.assertEqual(buf.pop(4), b'abcd')
+        self.assertEqual(buf.pop(10), b'ef')
+        self.assertEqual(len(buf), 0)
+
+    def test_reserve_compacts(self):
+        buf = RxBuffer(16)
+        buf.extend(b'0123456789')
+        buf.skip(8)
+        # 2 unread + 10 new fit in the capacity, the unread bytes are moved to the front
+        buf.extend(b'abcdefghij')
+        self.assertEqual(buf.capacity, 16)
+        self.assertEqual(buf._start, 0)
+        self.assertEqual(buf.pop(12), b'89abcdefghij')
+
+    def test_reserve_grows(self):
+        buf = RxBuffer(16)
+        buf.extend(b'0123456789')
+        buf.skip(2)
+        buf.extend(b'abcdefghij')
+        self.assertEqual(buf.capacity, 32)
+        self.assertEqual(buf.pop(18), b'23456789abcdefghij')
+        buf.extend(bytes(100))
+        self.assertEqual(buf.capacity, 100)
+        self.assertEqual(len(buf), 100)
+
+    def test_writable_commit(self):
+        buf = RxBuffer(8)
+        buf.extend(b'xy')
+        buf.skip(2)
+        view = buf.writable(4)
+        view[:3] = b'abc'
+        buf.commit(3)
+        # the empty buffer restarts at the front
+        self.assertEqual(buf._start, 0)
+        self.assertEqual(buf.pop(3), b'abc')
+
+
+class TestReportFrameSplitter(unittest.TestCase):
+    @staticmethod
+    def split(chunks):
+        buf = RxBuffer(64)
+        splitter = ReportFrameSplitter()
+        frames = []
+        for chunk in chunks:
+            buf.extend(chunk)
+            frames.extend(splitter.split(buf))
+        return frames, splitter, buf
+
+    def test_frames(self):
+        stream = b''.join(make_frame(145, i) for i in range(3))
+        frames, splitter, buf = self.split([stream])
+        self.assertEqual(frames, [make_frame(145, i) for i in range(3)])
+        self.assertEqual(splitter.size, 145)
+        self.assertEqual(len(buf), 0)
+
+    def test_chunks_across_frames(self):
+        stream = b''.join(make_frame(245, i) for i in range(4))
+        for step in (1, 3, 100, 244, 246, 500):
+            chunks = [stream[i:i + step] for i in range(0, len(stream), step)]
+            frames, _, buf = self.split(chunks)
+            self.assertEqual(frames, [make_frame(245, i) for i in range(4)], step)
+            self.assertEqual(len(buf), 0)
+
+    def test_length_233_of_245_frames(self):
+        # some firmware reports 233 in the length field of the 245 bytes frames
+        stream = b''.join(make_frame(245, i, length_field=233) for i in range(3))
+        frames, splitter, _ = self.split([stream[:200], stream[200:]])
+        self.assertEqual(frames, [make_frame(245, i, length_field=233) for i in range(3)])
+        self.assertEqual(splitter.size, 245)
+
+    def test_length_233_of_233_frames(self):
+        stream = b''.join(make_frame(233, i) for i in range(3))
+        frames, splitter, _ = self.split([stream])
+        self.assertEqual(frames, [make_frame(233, i) for i in range(3)])
+        self.assertEqual(splitter.size, 233)
+
+    def test_corrupt_length(self):
+        stream = make_frame(145, 0) + make_frame(145, 1, length_field=146)
+        with self.assertRaises(ValueError):
+            self.split([stream])
+
+
+class TestReportHandler(unittest.TestCase):
+    def test_matches_legacy_parser(self):
+        for report_type in ('devlop', 'normal', 'rich'):
+            for length in range(145, 503):
+                frames = [make_frame(length, i) for i in range(2)]
+                legacy = LegacyReportHandler(report_type)
+                expected = [legacy.process_report_data(frame) for frame in frames]
+                handler = ReportHandler(report_type)
+                results = [handler.process_report_data(frame) for frame in frames]
+                if length == 233:
+                    # the size of a 233 frame is only confirmed by the next frame
+                    self.assertIsNone(results[0])
+                    results[0] = expected[0]
+                self.assertTrue(values_equal(results, expected), '{} {}'.format(report_type, length))
+
+    def test_feed_chunks(self):
+        frames = [make_frame(502, i) for i in range(5)]
+        legacy = LegacyReportHandler('rich')
+        expected = [legacy.process_report_data(frame) for frame in frames]
+        stream = b''.join(frames)
+        handler = ReportHandler('rich')
+        results = []
+        for i in range(0, len(stream), 700):
+            for parse_dict in handler.feed(stream[i:i + 700]):
+                results.append(parse_dict)
+        self.assertEqual(len(results), len(frames))
+        for parse_dict, ret in zip(results, expected):
+            self.assertTrue(values_equal(
+                [parse_dict['length'], parse_dict['state'], parse_dict['mode'], parse_dict['cmd_num'],
+                 parse_dict['angles'], parse_dict['pose'], parse_dict['torque']], ret[:7]))
+            self.assertTrue(values_equal(parse_dict['currents'], ret[-2]))
+        self.assertIsNot(results[0], results[1])
+
+    def test_process_returns_last_frame(self):
+        frames = [make_frame(145, i) for i in range(3)]
+        handler = ReportHandler('normal')
+        self.assertIsNone(handler.process_report_data(frames[0][:100]))
+        ret = handler.process_report_data(frames[0][100:] + frames[1] + frames[2][:10])
+        self.assertTrue(values_equal(ret, LegacyReportHandler('normal').parse(frames[1])))
+        self.assertEqual(handler.source_data, frames[1])
+
+    def test_process_corrupt_stream(self):
+        handler = ReportHandler('normal')
+        self.assertEqual(handler.process_report_data(make_frame(145, 0) + make_frame(145, 1, length_field=100)), -1)
+        self.assertEqual(handler.report_size, 0)
+        self.assertIsNotNone(handler.process_report_data(make_frame(145, 2)))
+
+    def test_parse_capture(self):
+        frames = [make_frame(245, i, length_field=233) for i in range(3)]
+        results = list(ReportHandler.parse_capture('rich', b''.join(frames)))
+        self.assertEqual([x['length'] for x in results], [245] * 3)
+
+
+class TestReportQueue(unittest.TestCase):
+    def test_latest(self):
+        que = ReportQueue(maxsize=2, policy='latest')
+        for i in range(5):
+            self.assertTrue(que.put(i))
+        self.assertEqual([que.get_nowait(), que.get_nowait()], [3, 4])
+        stats = que.stats
+        self.assertEqual((stats['put'], stats['get'], stats['coalesced'], stats['dropped']), (5, 2, 3, 0))
+        self.assertEqual(stats['max_qsize'], 2)
+        with self.assertRaises(queue.Empty):
+            que.get(timeout=0.01)
+
+    def test_all(self):
+        que = ReportQueue(maxsize=3, policy='all')
+        self.assertEqual([que.put(i) for i in range(5)], [True] * 3 + [False] * 2)
+        self.assertEqual([que.get_nowait() for _ in range(3)], [0, 1, 2])
+        stats = que.stats
+        self.assertEqual((stats['put'], stats['get'], stats['coalesced'], stats['dropped']), (3, 3, 0, 2))
+
+    def test_block(self):
+        que = ReportQueue(maxsize=1, policy='block')
+        self.assertTrue(que.put(0))
+        self.assertFalse(que.put(1, timeout=0.01))
+        self.assertEqual((que.stats['blocked'], que.stats['dropped']), (1, 1))
+        threading.Timer(0.05, que.get).start()
+        start = time.monotonic()
+        self.assertTrue(que.put(2, timeout=1))
+        self.assertGreater(time.monotonic() - start, 0.03)
+        self.assertEqual(que.get_nowait(), 2)
+        self.assertEqual((que.stats['put'], que.stats['get'], que.stats['blocked']), (2, 2, 2))
+
+    def test_set_policy(self):
+        que = ReportQueue(maxsize=4, policy='all')
+        for i in range(4):
+            que.put(i)
+        que.set_policy('latest', 2)
+        self.assertEqual(que.stats['coalesced'], 2)
+        self.assertEqual(que.get_nowait(), 2)
+        with self.assertRaises(ValueError):
+            que.set_policy('bogus')
+        que.reset_stats()
+        self.assertEqual(que.stats['get'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
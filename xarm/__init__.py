@@ -1,2 +1,2 @@
-from .wrapper import XArmAPI
+from .wrapper import XArmAPI, XArmManager
 from .version import __version__
@@ -3,3 +3,8 @@ try:
 except:
     SerialPort = None
 from .socket_port import SocketPort
+from .base import ReportQueue, ReportFrameSplitter, RxBuffer
+try:
+    from .async_port import AsyncSocketPort, AsyncReportPort, open_socket_port, open_report_port
+except:
+    AsyncSocketPort = AsyncReportPort = open_socket_port = open_report_port = None
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import os
+import asyncio
+import platform
+from ..utils.log import logger
+from ..utils import convert
+from ..config.x_config import XCONF
+from .base import RxBuffer, ReportFrameSplitter
+
+_Protocol = getattr(asyncio, 'BufferedProtocol', asyncio.Protocol)
+
+
+class AsyncPort(_Protocol):
+    """
+    asyncio protocol base of the xArm sockets, data is received into a RxBuffer and split into frames
+    """
+    def __init__(self, port_type, buffer_size=XCONF.SocketConf.TCP_CONTROL_BUF_SIZE):
+        self.port_type = port_type
+        self.buffer_size = buffer_size
+        self.transport = None
+        self.rx_buffer = RxBuffer(max(buffer_size * 4, 4096))
+        self._connected = False
+        self._closed = asyncio.get_event_loop().create_future()
+
+    @property
+    def connected(self):
+        return self._connected
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._connected = True
+        logger.debug('[{}] connection made'.format(self.port_type))
+
+    def connection_lost(self, exc):
+        self._connected = False
+        if exc is not None:
+            logger.error('[{}] connection lost: {}'.format(self.port_type, exc))
+        else:
+            logger.debug('[{}] connection closed'.format(self.port_type))
+        if not self._closed.done():
+            self._closed.set_result(True)
+
+    # asyncio.BufferedProtocol (python >= 3.7)
+    def get_buffer(self, sizehint):
+        return self.rx_buffer.writable(max(sizehint, self.buffer_size) if sizehint > 0 else self.buffer_size)
+
+    def buffer_updated(self, nbytes):
+        self.rx_buffer.commit(nbytes)
+        self._split_frames()
+
+    # asyncio.Protocol
+    def data_received(self, data):
+        self.rx_buffer.extend(data)
+        self._split_frames()
+
+    def _split_frames(self):
+        raise NotImplementedError
+
+    def write(self, data):
+        if not self._connected:
+            return -1
+        logger.verbose('[{}] send: {}'.format(self.port_type, data))
+        self.transport.write(data)
+        return 0
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    async def wait_closed(self):
+        await self._closed
+
+
+class AsyncSocketPort(AsyncPort):
+    """
+    Main (502) channel, every response is delivered to the future registered with its transaction id
+    :param heartbeat: send heartbeat every second or not
+    :param fb_callback: function called with every feedback frame
+    """
+    def __init__(self, heartbeat=False, fb_callback=None, buffer_size=XCONF.SocketConf.TCP_CONTROL_BUF_SIZE):
+        super(AsyncSocketPort, self).__init__('main-socket', buffer_size=buffer_size)
+        self.fb_callback = fb_callback
+        self._heartbeat = heartbeat
+        self._heartbeat_task = None
+        self._waiters = {}
+
+    def connection_made(self, transport):
+        super(AsyncSocketPort, self).connection_made(transport)
+        if self._heartbeat:
+            self._heartbeat_task = asyncio.ensure_future(self._heartbeat_loop())
+
+    def connection_lost(self, exc):
+        super(AsyncSocketPort, self).connection_lost(exc)
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+        for fut in self._waiters.values():
+            if not fut.done():
+                fut.set_result(-1)
+        self._waiters.clear()
+
+    async def _heartbeat_loop(self):
+        heat_data = bytes([0, 0, 0, 1, 0, 2, 0, 0])
+        while self._connected:
+            if self.write(heat_data) == -1:
+                break
+            await asyncio.sleep(1)
+
+    def add_waiter(self, trans_id):
+        fut = asyncio.get_event_loop().create_future()
+        self._waiters[trans_id] = fut
+        return fut
+
+    def remove_waiter(self, trans_id):
+        self._waiters.pop(trans_id, None)
+
+    def _split_frames(self):
+        rx_buffer = self.rx_buffer
+        while len(rx_buffer) >= 6:
+            head = rx_buffer.peek(4, 2)
+            length = (head[0] << 8 | head[1]) + 6
+            if len(rx_buffer) < length:
+                break
+            self._put(rx_buffer.pop(length))
+
+    def _put(self, data):
+        if data[6] == 0xFF:
+            if self.fb_callback is not None:
+                try:
+                    self.fb_callback(data)
+                except Exception as e:
+                    logger.error('[{}] feedback callback exception: {}'.format(self.port_type, e))
+            return
+        fut = self._waiters.pop(convert.bytes_to_u16(data[0:2]), None)
+        if fut is not None and not fut.done():
+            fut.set_result(data)
+
+
+class AsyncReportPort(AsyncPort):
+    """
+    Report (30001/30002/30003) channel
+    :param frame_callback: function called with every report frame,
+        if None, the frames are put into a queue and can be read by `await read()`
+    :param rxque_max: max frames kept in the queue, the oldest frame is dropped when the queue is full
+    """
+    def __init__(self, frame_callback=None, rxque_max=2, buffer_size=XCONF.SocketConf.TCP_REPORT_RICH_BUF_SIZE):
+        super(AsyncReportPort, self).__init__('report-socket', buffer_size=buffer_size)
+        self.frame_callback = frame_callback
+        self.rx_que = asyncio.Queue(rxque_max)
+        self._splitter = ReportFrameSplitter()
+
+    def connection_lost(self, exc):
+        super(AsyncReportPort, self).connection_lost(exc)
+        if self.rx_que.full():
+            self.rx_que.get_nowait()
+        # wake up the reader
+        self.rx_que.put_nowait(-1)
+
+    async def read(self, timeout=None):
+        """
+        :return: report frame, -1 if the connection is closed or timeout
+        """
+        if not self._connected and self.rx_que.empty():
+            return -1
+        try:
+            return await asyncio.wait_for(self.rx_que.get(), timeout)
+        except asyncio.TimeoutError:
+            return -1
+
+    def _split_frames(self):
+        try:
+            for data in self._splitter.split(self.rx_buffer):
+                self._put(data)
+        except ValueError as e:
+            logger.error('{}, close'.format(e))
+            self.close()
+
+    def _put(self, data):
+        if self.frame_callback is not None:
+            try:
+                self.frame_callback(data)
+            except Exception as e:
+                logger.error('[{}] report callback exception: {}'.format(self.port_type, e))
+            return
+        if self.rx_que.full():
+            self.rx_que.get_nowait()
+        self.rx_que.put_nowait(data)
+
+
+async def _open_port(protocol_factory, server_ip, server_port, forbid_uds=False, timeout=3):
+    loop = asyncio.get_event_loop()
+    if not forbid_uds and platform.system() == 'Linux':
+        uds_path = '/tmp/xarmcontroller_uds_{}'.format(server_port)
+        if os.path.exists(uds_path):
+            try:
+                _, protocol = await asyncio.wait_for(loop.create_unix_connection(protocol_factory, uds_path), timeout)
+                logger.info('{} connect {} success, uds_{}'.format(protocol.port_type, server_ip, server_port))
+                return protocol
+            except Exception:
+                pass
+    _, protocol = await asyncio.wait_for(loop.create_connection(protocol_factory, server_ip, server_port), timeout)
+    logger.info('{} connect {} success'.format(protocol.port_type, server_ip))
+    return protocol
+
+
+async def open_socket_port(server_ip, server_port=XCONF.SocketConf.TCP_CONTROL_PORT, heartbeat=False,
+                           fb_callback=None, forbid_uds=False, timeout=3):
+    """
+    Connect the main channel
+    :return: AsyncSocketPort instance
+    """
+    return await _open_port(lambda: AsyncSocketPort(heartbeat=heartbeat, fb_callback=fb_callback),
+                            server_ip, server_port, forbid_uds=forbid_uds, timeout=timeout)
+
+
+async def open_report_port(server_ip, server_port=XCONF.SocketConf.TCP_REPORT_NORM_PORT, frame_callback=None,
+                           rxque_max=2, forbid_uds=False, timeout=3):
+    """
+    Connect the report channel
+    :param server_port: 30001(normal), 30002(rich) or 30003(real)
+    :return: AsyncReportPort instance
+    """
+    if server_port == XCONF.SocketConf.TCP_REPORT_REAL_PORT:
+        buffer_size = XCONF.SocketConf.TCP_REPORT_REAL_BUF_SIZE
+    elif server_port == XCONF.SocketConf.TCP_REPORT_NORM_PORT:
+        buffer_size = XCONF.SocketConf.TCP_REPORT_NORMAL_BUF_SIZE
+    else:
+        buffer_size = XCONF.SocketConf.TCP_REPORT_RICH_BUF_SIZE
+    return await _open_port(lambda: AsyncReportPort(frame_callback=frame_callback, rxque_max=rxque_max, buffer_size=buffer_size),
+                            server_ip, server_port, forbid_uds=forbid_uds, timeout=timeout)
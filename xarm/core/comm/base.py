@@ -11,8 +11,10 @@ import queue
 import socket
 import select
 import threading
+import collections
 from ..utils.log import logger
 from ..utils import convert
+from ..config.x_config import XCONF
 
 
 class RxParse(object):
@@ -23,7 +25,10 @@ class RxParse(object):
     def flush(self, fromid=-1, toid=-1):
         pass
 
-    def put(self, data, is_report=False):
+    def close(self):
+        pass
+
+    def put(self, data, is_report=False, rx_time=None):
         if not is_report and data[6] == 0xFF:
             if not self.fb_que:
                 return
@@ -32,6 +37,359 @@ class RxParse(object):
             self.rx_que.put(data)
 
 
+class RxWaiter(object):
+    """
+    Slot of a request which is waiting for its response
+    """
+    __slots__ = ('event', 'data', 'rx_time')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.data = -1
+        self.rx_time = None
+
+    def set(self, data, rx_time=None):
+        self.data = data
+        self.rx_time = rx_time
+        self.event.set()
+
+    def wait(self, timeout=None):
+        self.event.wait(timeout)
+        return self.data
+
+
+class TransIdRxParse(RxParse):
+    """
+    Deliver every response straight to the waiter registered with its transaction id,
+    so that several requests can be in flight on one socket at the same time
+    """
+    def __init__(self, rx_que, fb_que=None):
+        super(TransIdRxParse, self).__init__(rx_que, fb_que)
+        self._waiters = {}
+        self._waiters_lock = threading.Lock()
+
+    def add_waiter(self, trans_id):
+        waiter = RxWaiter()
+        with self._waiters_lock:
+            self._waiters[trans_id] = waiter
+        return waiter
+
+    def get_waiter(self, trans_id):
+        return self._waiters.get(trans_id, None)
+
+    def remove_waiter(self, trans_id):
+        with self._waiters_lock:
+            self._waiters.pop(trans_id, None)
+
+    def close(self):
+        # wake up all the waiters, the port is closed
+        with self._waiters_lock:
+            waiters, self._waiters = self._waiters, {}
+        for waiter in waiters.values():
+            waiter.set(-1)
+
+    def put(self, data, is_report=False, rx_time=None):
+        if not is_report and data[6] == 0xFF:
+            if not self.fb_que:
+                return
+            self.fb_que.put(data)
+            return
+        trans_id = convert.bytes_to_u16(data[0:2])
+        # the waiter is removed by the requester, the response may arrive before it starts waiting
+        waiter = self._waiters.get(trans_id, None)
+        if waiter is None:
+            # nobody is waiting for it (heartbeat or timeout response), discard
+            logger.verbose('discard response, trans_id={}'.format(trans_id))
+            return
+        waiter.set(data, rx_time)
+
+
+class RxBuffer(object):
+    """
+    Preallocated receive buffer
+    Data is received in place (recv_into) and complete frames are cut out by moving the read index,
+    the unread bytes are only moved to the front when the free space at the end runs out
+    """
+    def __init__(self, size=4096):
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def capacity(self):
+        return len(self._buf)
+
+    def clear(self):
+        self._start = 0
+        self._end = 0
+
+    def _reserve(self, size):
+        if self._end + size <= len(self._buf):
+            return
+        length = self._end - self._start
+        if length + size > len(self._buf):
+            buf = bytearray(max(len(self._buf) * 2, length + size))
+            buf[:length] = self._view[self._start:self._end]
+            self._buf = buf
+            self._view = memoryview(self._buf)
+        elif length > 0:
+            self._view[:length] = self._view[self._start:self._end]
+        self._start = 0
+        self._end = length
+
+    def recv_into(self, func, size):
+        """
+        :param func: recv_into function of the socket
+        :param size: max size to receive
+        :return: size of the received data
+        """
+        length = func(self.writable(size), size)
+        self.commit(length)
+        return length
+
+    def writable(self, size):
+        """
+        :return: memoryview of at least size bytes to receive data into, call commit after writing
+        """
+        if self._start == self._end:
+            self._start = self._end = 0
+        self._reserve(size)
+        return self._view[self._end:self._end + size]
+
+    def commit(self, length):
+        self._end += length
+
+    def extend(self, data):
+        size = len(data)
+        self._reserve(size)
+        self._view[self._end:self._end + size] = data
+        self._end += size
+
+    def peek(self, offset=0, size=None):
+        start = self._start + offset
+        end = self._end if size is None else min(start + size, self._end)
+        return self._view[start:end]
+
+    def pop(self, size):
+        """
+        :return: bytes of the first size bytes
+        """
+        size = min(size, self._end - self._start)
+        data = bytes(self._view[self._start:self._start + size])
+        self.skip(size)
+        return data
+
+    def skip(self, size):
+        self._start = min(self._start + size, self._end)
+        if self._start == self._end:
+            self._start = self._end = 0
+
+
+class ReportFrameSplitter(object):
+    """
+    Split the report stream into frames
+    The first u32 of every frame is its length, some firmware reports 233 in the length field of a 245 bytes frame
+    """
+    def __init__(self):
+        self.size = 0
+        self.size_is_not_confirm = False
+
+    def reset(self):
+        self.size = 0
+        self.size_is_not_confirm = False
+
+    @staticmethod
+    def is_valid_length(length, size):
+        """
+        :param length: length field (first u32) of the frame
+        :param size: real size of the frame
+        """
+        return length == size or (length == 233 and size == 245)
+
+    def split(self, rx_buffer):
+        """
+        :param rx_buffer: RxBuffer instance
+        :return: generator of complete frames (bytes), raise ValueError if the stream is broken
+        """
+        while len(rx_buffer) >= 4:
+            length = convert.bytes_to_u32(rx_buffer.peek(0, 4))
+            if self.size == 0:
+                self.size = length
+                if length == 233:
+                    self.size_is_not_confirm = True
+                    self.size = 245
+                logger.info('report_data_size: {}, size_is_not_confirm={}'.format(self.size, self.size_is_not_confirm))
+            if len(rx_buffer) < self.size:
+                break
+            if self.size_is_not_confirm:
+                self.size_is_not_confirm = False
+                if convert.bytes_to_u32(rx_buffer.peek(233, 4)) == 233:
+                    self.size = 233
+            if not self.is_valid_length(length, self.size):
+                raise ValueError('report data error, length={}, size={}'.format(length, self.size))
+            yield rx_buffer.pop(self.size)
+
+
+class ReportQueue(object):
+    """
+    Single-producer/single-consumer ring of the report frames, the receiving thread puts and the report thread gets,
+    append/popleft of a deque are atomic, so no lock is needed between them
+    :param maxsize: max frames kept in the ring
+    :param policy: what to do with a new frame when the ring is full
+        'latest': drop the oldest frame (counted as coalesced), the consumer always gets the newest state
+        'all': keep all the frames up to maxsize, drop the new frame (counted as dropped)
+        'block': wait until the consumer takes a frame (backpressure on the socket)
+    """
+    POLICIES = ('latest', 'all', 'block')
+
+    def __init__(self, maxsize=2, policy='latest'):
+        self._not_empty = threading.Event()
+        self._not_full = threading.Event()
+        self._not_full.set()
+        self._ring = collections.deque()
+        self.last_put_time = 0
+        self._maxsize = 1
+        self._policy = 'latest'
+        self.reset_stats()
+        self.set_policy(policy, maxsize)
+
+    @property
+    def policy(self):
+        return self._policy
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @property
+    def queue(self):
+        return self._ring
+
+    def set_policy(self, policy=None, maxsize=None):
+        if policy is not None:
+            if policy not in self.POLICIES:
+                raise ValueError('report queue policy must be one of {}'.format(self.POLICIES))
+            self._policy = policy
+        if maxsize is not None:
+            self._maxsize = max(1, int(maxsize))
+            while len(self._ring) > self._maxsize:
+                self._ring.popleft()
+                self._coalesced += 1
+        self._not_full.set()
+
+    def reset_stats(self):
+        self._put_count = 0
+        self._get_count = 0
+        self._dropped = 0
+        self._coalesced = 0
+        self._blocked = 0
+        self._max_latency = 0
+        self._max_qsize = 0
+
+    @property
+    def stats(self):
+        """
+        :return: dict of the counters
+            put/get: frames put/got
+            dropped: new frames dropped because the ring was full (policy 'all', or timeout of 'block')
+            coalesced: old frames overwritten by a newer one (policy 'latest')
+            blocked: times the producer had to wait (policy 'block')
+            max_latency: max time (seconds) a frame stayed in the ring
+            max_qsize: max frames in the ring
+        """
+        return {
+            'policy': self._policy,
+            'maxsize': self._maxsize,
+            'qsize': len(self._ring),
+            'put': self._put_count,
+            'get': self._get_count,
+            'dropped': self._dropped,
+            'coalesced': self._coalesced,
+            'blocked': self._blocked,
+            'max_latency': self._max_latency,
+            'max_qsize': self._max_qsize,
+        }
+
+    def qsize(self):
+        return len(self._ring)
+
+    def empty(self):
+        return len(self._ring) == 0
+
+    def full(self):
+        return len(self._ring) >= self._maxsize
+
+    def put(self, item, block=True, timeout=None):
+        """
+        Producer side, never raises queue.Full
+        :return: True if the frame is kept
+        """
+        ring = self._ring
+        if len(ring) >= self._maxsize:
+            if self._policy == 'latest':
+                try:
+                    ring.popleft()
+                    self._coalesced += 1
+                except IndexError:
+                    pass
+            elif self._policy == 'block' and block:
+                self._blocked += 1
+                expired = None if timeout is None else time.monotonic() + timeout
+                while len(ring) >= self._maxsize:
+                    self._not_full.clear()
+                    if len(ring) < self._maxsize:
+                        break
+                    remaining = None if expired is None else expired - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._dropped += 1
+                        return False
+                    self._not_full.wait(remaining)
+            else:
+                self._dropped += 1
+                return False
+        ring.append((time.monotonic(), item))
+        self._put_count += 1
+        if len(ring) > self._max_qsize:
+            self._max_qsize = len(ring)
+        self._not_empty.set()
+        return True
+
+    def get(self, block=True, timeout=None):
+        """
+        Consumer side, same as queue.Queue.get
+        """
+        ring = self._ring
+        if block and not ring:
+            expired = None if timeout is None else time.monotonic() + timeout
+            while not ring:
+                self._not_empty.clear()
+                if ring:
+                    break
+                remaining = None if expired is None else expired - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self._not_empty.wait(remaining)
+        try:
+            put_time, item = ring.popleft()
+        except IndexError:
+            raise queue.Empty
+        self._get_count += 1
+        # receive time of the frame just got
+        self.last_put_time = put_time
+        latency = time.monotonic() - put_time
+        if latency > self._max_latency:
+            self._max_latency = latency
+        self._not_full.set()
+        return item
+
+    def get_nowait(self):
+        return self.get(False)
+
+
 class Port(threading.Thread):
     def __init__(self, rxque_max, fb_que=None):
         super(Port, self).__init__()
@@ -43,11 +401,21 @@ class Port(threading.Thread):
         self.com = None
         self.rx_parse = RxParse(self.rx_que, self.fb_que)
         self.com_read = None
+        self.com_read_into = None
         self.com_write = None
         self.port_type = ''
         self.buffer_size = 1
         self.heartbeat_thread = None
         self.alive = True
+        # shared reactor (xarm.core.comm.reactor.Reactor), the port has no receive thread if it is set
+        self.reactor = None
+        # if set, the report frames are passed to it instead of the rx_que
+        self.frame_callback = None
+        self._rx_buffer = None
+        self._report_splitter = None
+        # time the first byte of the latest response arrived
+        self.rx_time = 0
+        self._frame_start_time = 0
 
     @property
     def connected(self):
@@ -62,6 +430,8 @@ class Port(threading.Thread):
 
     def close(self):
         self.alive = False
+        if self.reactor is not None:
+            self.reactor.unregister(self)
         if 'socket' in self.port_type:
             try:
                 self.com.shutdown(socket.SHUT_RDWR)
@@ -71,6 +441,10 @@ class Port(threading.Thread):
             self.com.close()
         except:
             pass
+        try:
+            self.rx_parse.close()
+        except:
+            pass
 
     def flush(self, fromid=-1, toid=-1):
         if not self.connected:
@@ -93,6 +467,13 @@ class Port(threading.Thread):
             logger.error("[{}] send error: {}".format(self.port_type, e))
             return -1
 
+    def set_report_queue(self, maxsize=XCONF.SocketConf.TCP_REPORT_QUE_SIZE, policy=XCONF.SocketConf.TCP_REPORT_QUE_POLICY):
+        """
+        Replace the rx_que of the report port with a ReportQueue, call it before the receiving starts
+        """
+        self.rx_que = ReportQueue(maxsize, policy)
+        self.rx_parse.rx_que = self.rx_que
+
     def read(self, timeout=None):
         if not self.connected:
             return -1
@@ -140,27 +521,18 @@ class Port(threading.Thread):
         logger.debug('[{}] recv thread start'.format(self.port_type))
         failed_read_count = 0
         timeout_count = 0
-        size = 0
-        data_num = 0
-        buffer = b''
-        size_is_not_confirm = False
-
-        data_prev_us = 0
-        data_curr_us = 0
-        data_max_interval_us = 0
-        data_over_us = 205 * 1000  # over 205ms, cnts++
-        data_over_cnts = 0
-
-        recv_prev_us = 0
-        recv_curr_us = 0
-        recv_max_interval_us = 0
-        recv_over_us = 300 * 1000  # over 300ms, cnts++
-        recv_over_cnts = 0
+        rx_buffer = RxBuffer(max(self.buffer_size * 4, 4096))
+        splitter = ReportFrameSplitter()
 
         try:
             while self.connected and self.alive:
                 try:
-                    data = self.com_read(4 - data_num if size == 0 else (size - data_num))
+                    if self.com_read_into is not None:
+                        length = rx_buffer.recv_into(self.com_read_into, self.buffer_size)
+                    else:
+                        data = self.com_read(self.buffer_size)
+                        length = len(data)
+                        rx_buffer.extend(data)
                 except socket.timeout:
                     timeout_count += 1
                     if timeout_count > 3:
@@ -168,80 +540,22 @@ class Port(threading.Thread):
                         logger.error('[{}] socket read timeout'.format(self.port_type))
                         break
                     continue
-                else:
-                    if len(data) == 0:
-                        failed_read_count += 1
-                        if failed_read_count > 5:
-                            self._connected = False
-                            logger.error('[{}] socket read failed, len=0'.format(self.port_type))
-                            break
-                        time.sleep(0.1)
-                        continue
-                    data_num += len(data)
-                    buffer += data
-                    if size == 0:
-                        if data_num != 4:
-                            continue
-                        size = convert.bytes_to_u32(buffer[0:4])
-                        if size == 233:
-                            size_is_not_confirm = True
-                            size = 245
-                        logger.info('report_data_size: {}, size_is_not_confirm={}'.format(size, size_is_not_confirm))
-                    else:
-                        if data_num < size:
-                            continue
-                        if size_is_not_confirm:
-                            size_is_not_confirm = True
-                            if convert.bytes_to_u32(buffer[233:237]) == 233:
-                                size = 233
-                                buffer = buffer[233:]
-                                continue
-
-                        if convert.bytes_to_u32(buffer[0:4]) != size:
-                            logger.error('report data error, close, length={}, size={}'.format(convert.bytes_to_u32(buffer[0:4]), size))
-                            break
-
-                        # # buffer[494:502]
-                        # data_curr_us = convert.bytes_to_u64(buffer[-8:])
-                        # recv_curr_us = time.monotonic() * 1000000
-                        #
-                        # if data_prev_us != 0 and recv_prev_us != 0:
-                        #     data_interval_us = data_curr_us - data_prev_us
-                        #     data_over_cnts += 1 if data_interval_us > data_over_us else 0
-                        #
-                        #     recv_interval_us = recv_curr_us - recv_prev_us
-                        #     recv_over_cnts += 1 if recv_interval_us > recv_over_us else 0
-                        #
-                        #     print_flag = False
-                        #
-                        #     if data_interval_us > data_max_interval_us:
-                        #         data_max_interval_us = data_interval_us
-                        #         print_flag = True
-                        #     elif data_interval_us > data_over_us:
-                        #         print_flag = True
-                        #
-                        #     if recv_interval_us > recv_max_interval_us:
-                        #         recv_max_interval_us = recv_interval_us
-                        #         print_flag = True
-                        #     elif recv_interval_us > recv_over_us:
-                        #         print_flag = True
-                        #
-                        #     if print_flag:
-                        #         print('[RECV] Di={}, Dmax={}, Dcnts={}, Ri={}, Rmax={}, Rcnts={}'.format(
-                        #             data_interval_us / 1000, data_max_interval_us / 1000, data_over_cnts,
-                        #             recv_interval_us / 1000, recv_max_interval_us / 1000, recv_over_cnts
-                        #         ))
-                        # data_prev_us = data_curr_us
-                        # recv_prev_us = recv_curr_us
-
-                        if self.rx_que.qsize() > 1:
-                            self.rx_que.get()
-                        self.rx_parse.put(buffer, True)
-                        buffer = b''
-                        data_num = 0
-
-                    timeout_count = 0
-                    failed_read_count = 0
+                if length == 0:
+                    failed_read_count += 1
+                    if failed_read_count > 5:
+                        self._connected = False
+                        logger.error('[{}] socket read failed, len=0'.format(self.port_type))
+                        break
+                    time.sleep(0.1)
+                    continue
+                timeout_count = 0
+                failed_read_count = 0
+                try:
+                    for data in splitter.split(rx_buffer):
+                        self._put_report(data)
+                except ValueError as e:
+                    logger.error('{}, close'.format(e))
+                    break
         except Exception as e:
             if self.alive:
                 logger.error('[{}] recv error: {}'.format(self.port_type, e))
@@ -250,6 +564,62 @@ class Port(threading.Thread):
         logger.debug('[{}] recv thread had stopped'.format(self.port_type))
         self._connected = False
 
+    def _split_frames(self, rx_buffer, recv_size=0):
+        """
+        :param recv_size: size of the data just received, used to know when the first byte of a frame arrived
+        """
+        recv_time = time.monotonic()
+        if len(rx_buffer) == recv_size:
+            # the buffer was empty, a new frame starts with this data
+            self._frame_start_time = recv_time
+        while len(rx_buffer) >= 6:
+            head = rx_buffer.peek(4, 2)
+            length = (head[0] << 8 | head[1]) + 6
+            if len(rx_buffer) < length:
+                break
+            self.rx_time = self._frame_start_time
+            self.rx_parse.put(rx_buffer.pop(length), rx_time=self.rx_time)
+            self._frame_start_time = recv_time
+
+    def _put_report(self, data):
+        if self.frame_callback is not None:
+            self.frame_callback(data)
+        else:
+            self.rx_parse.put(data, True)
+
+    def handle_readable(self):
+        """
+        Called by the reactor when the socket is readable
+        :return: False if the port is closed
+        """
+        if self._rx_buffer is None:
+            self._rx_buffer = RxBuffer(max(self.buffer_size * 4, 4096))
+            self._report_splitter = ReportFrameSplitter()
+        try:
+            length = self._rx_buffer.recv_into(self.com_read_into, self.buffer_size)
+        except (socket.timeout, BlockingIOError, InterruptedError):
+            return True
+        except Exception as e:
+            if self.alive:
+                logger.error('[{}] recv error: {}'.format(self.port_type, e))
+            length = 0
+        try:
+            if length == 0:
+                if self.alive:
+                    logger.error('[{}] socket read failed, len=0'.format(self.port_type))
+            elif self.port_type == 'report-socket':
+                for data in self._report_splitter.split(self._rx_buffer):
+                    self._put_report(data)
+                return True
+            else:
+                self._split_frames(self._rx_buffer, length)
+                return True
+        except Exception as e:
+            logger.error('[{}] {}'.format(self.port_type, e))
+        self._connected = False
+        self.close()
+        return False
+
     def recv_proc(self):
         self.alive = True
         logger.debug('[{}] recv thread start'.format(self.port_type))
@@ -257,14 +627,19 @@ class Port(threading.Thread):
         is_main_serial = self.port_type == 'main-serial'
         try:
             failed_read_count = 0
-            buffer = b''
+            rx_buffer = RxBuffer(max(self.buffer_size * 4, 4096))
             while self.connected and self.alive:
                 if is_main_tcp:
                     try:
-                        rx_data = self.com_read(self.buffer_size)
+                        if self.com_read_into is not None:
+                            length = rx_buffer.recv_into(self.com_read_into, self.buffer_size)
+                        else:
+                            rx_data = self.com_read(self.buffer_size)
+                            length = len(rx_data)
+                            rx_buffer.extend(rx_data)
                     except socket.timeout:
                         continue
-                    if len(rx_data) == 0:
+                    if length == 0:
                         failed_read_count += 1
                         if failed_read_count > 5:
                             self._connected = False
@@ -272,18 +647,10 @@ class Port(threading.Thread):
                             break
                         time.sleep(0.1)
                         continue
-                    buffer += rx_data
-                    while True:
-                        if len(buffer) < 6:
-                            break
-                        length = convert.bytes_to_u16(buffer[4:6]) + 6
-                        if len(buffer) < length:
-                            break
-                        rx_data = buffer[:length]
-                        buffer = buffer[length:]
-                        self.rx_parse.put(rx_data)
+                    self._split_frames(rx_buffer, length)
                 elif is_main_serial:
                     rx_data = self.com_read(self.com.in_waiting or self.buffer_size)
+                    self.rx_time = time.monotonic()
                     self.rx_parse.put(rx_data)
                 else:
                     break
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import heapq
+import socket
+import selectors
+import threading
+from ..utils.log import logger
+
+
+class Reactor(threading.Thread):
+    """
+    One selector (epoll/kqueue/select) thread which receives the data of many ports,
+    the registered ports have no receive thread and no heartbeat thread of their own.
+    """
+    def __init__(self):
+        super(Reactor, self).__init__()
+        self.daemon = True
+        self.alive = False
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._timers = []
+        self._timer_seq = 0
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+
+    @property
+    def port_count(self):
+        return len(self._selector.get_map()) - 1
+
+    def _wakeup(self):
+        try:
+            self._wakeup_w.send(b'\x00')
+        except:
+            pass
+
+    def register(self, port):
+        """
+        Receive the data of the port in the reactor thread
+        :param port: Port instance (connected), port.handle_readable() is called when its socket is readable
+        """
+        port.reactor = self
+        with self._lock:
+            self._pending.append((True, port))
+        self._wakeup()
+
+    def unregister(self, port):
+        with self._lock:
+            self._pending.append((False, port))
+        self._wakeup()
+
+    def call_every(self, interval, func, *args):
+        """
+        Call func(*args) in the reactor thread every interval seconds, stop it by returning False
+        """
+        with self._lock:
+            self._timer_seq += 1
+            heapq.heappush(self._timers, (time.monotonic() + interval, self._timer_seq, interval, func, args))
+        self._wakeup()
+
+    def stop(self):
+        self.alive = False
+        self._wakeup()
+
+    def _handle_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for is_add, port in pending:
+            try:
+                if is_add:
+                    self._selector.register(port.com, selectors.EVENT_READ, port)
+                else:
+                    self._selector.unregister(port.com)
+            except (KeyError, ValueError, OSError):
+                pass
+
+    def _run_timers(self):
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._timers or self._timers[0][0] > now:
+                    return self._timers[0][0] - now if self._timers else None
+                deadline, seq, interval, func, args = heapq.heappop(self._timers)
+            try:
+                again = func(*args)
+            except Exception as e:
+                logger.error('reactor timer exception: {}'.format(e))
+                again = False
+            if again is not False:
+                with self._lock:
+                    heapq.heappush(self._timers, (max(deadline + interval, now), seq, interval, func, args))
+
+    def run(self):
+        self.alive = True
+        logger.debug('reactor thread start')
+        try:
+            while self.alive:
+                self._handle_pending()
+                timeout = self._run_timers()
+                for key, _ in self._selector.select(timeout):
+                    port = key.data
+                    if port is None:
+                        try:
+                            while self._wakeup_r.recv(1024):
+                                pass
+                        except (BlockingIOError, InterruptedError):
+                            pass
+                        continue
+                    if not port.handle_readable():
+                        try:
+                            self._selector.unregister(key.fileobj)
+                        except (KeyError, ValueError, OSError):
+                            pass
+        except Exception as e:
+            logger.error('reactor thread exception: {}'.format(e))
+        finally:
+            for key in list(self._selector.get_map().values()):
+                if key.data is not None:
+                    key.data.close()
+            self._selector.close()
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+        logger.debug('reactor thread had stopped')
@@ -90,7 +90,9 @@ class HeartBeatThread(threading.Thread):
 
 class SocketPort(Port):
     def __init__(self, server_ip, server_port, rxque_max=XCONF.SocketConf.TCP_RX_QUE_MAX, heartbeat=False,
-                 buffer_size=XCONF.SocketConf.TCP_CONTROL_BUF_SIZE, forbid_uds=False, fb_que=None):
+                 buffer_size=XCONF.SocketConf.TCP_CONTROL_BUF_SIZE, forbid_uds=False, fb_que=None,
+                 reactor=None, frame_callback=None, report_queue_size=XCONF.SocketConf.TCP_REPORT_QUE_SIZE,
+                 report_queue_policy=XCONF.SocketConf.TCP_REPORT_QUE_POLICY):
         is_main_tcp = server_port == XCONF.SocketConf.TCP_CONTROL_PORT or server_port == XCONF.SocketConf.TCP_CONTROL_PORT + 1
         super(SocketPort, self).__init__(rxque_max, fb_que)
         if is_main_tcp:
@@ -98,6 +100,7 @@ class SocketPort(Port):
             # self.com.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, 5)
         else:
             self.port_type = 'report-socket'
+            self.set_report_queue(report_queue_size, report_queue_policy)
         try:
             socket.setdefaulttimeout(1)
             use_uds = False
@@ -137,14 +140,24 @@ class SocketPort(Port):
             # time.sleep(1)
 
             self.com_read = self.com.recv
+            self.com_read_into = self.com.recv_into
             self.com_write = self.com.send
             self.write_lock = threading.Lock()
-            self.start()
-            if heartbeat:
-                self.heartbeat_thread = HeartBeatThread(self)
-                self.heartbeat_thread.start()
+            self.frame_callback = frame_callback
+            if reactor is not None:
+                # the shared reactor receives the data and sends the heartbeat, no thread of its own
+                reactor.register(self)
+                if heartbeat:
+                    reactor.call_every(1, self._send_heartbeat)
+            else:
+                self.start()
+                if heartbeat:
+                    self.heartbeat_thread = HeartBeatThread(self)
+                    self.heartbeat_thread.start()
         except Exception as e:
             logger.info('{} connect {} failed, {}'.format(self.port_type, server_ip, e))
             # logger.error('{} connect {}:{} failed, {}'.format(self.port_type, server_ip, server_port, e))
             self._connected = False
 
+    def _send_heartbeat(self):
+        return self.connected and self.write(bytes([0, 0, 0, 1, 0, 2, 0, 0])) == 0
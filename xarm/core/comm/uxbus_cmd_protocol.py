@@ -51,25 +51,25 @@ class Ux2HexProtocol(object):
             logger.error('len(rxstr) < length')
 
         for i in range(length):
-            rxch = bytes([rxstr[i]])
+            rxch = rxstr[i]
             # print_hex(self.DB_FLG, rxch, 1)
             # print('state:%d' % (self.rxstate))
             if UX2HEX_RXSTART_FROMID == self.rxstate:
-                if self.toid == rxch[0] or 255 == self.toid:
-                    self.rxbuf = rxch
+                if self.toid == rxch or 255 == self.toid:
+                    self.rxbuf = bytearray([rxch])
                     self.rxstate = UX2HEX_RXSTART_TOID
 
             elif UX2HEX_RXSTART_TOID == self.rxstate:
-                if self.fromid == rxch[0] or self.fromid == 0xFF:
-                    self.rxbuf += rxch
+                if self.fromid == rxch or self.fromid == 0xFF:
+                    self.rxbuf.append(rxch)
                     self.rxstate = UX2HEX_RXSTATE_LEN
                 else:
                     self.rxstate = UX2HEX_RXSTART_FROMID
 
             elif UX2HEX_RXSTATE_LEN == self.rxstate:
-                if rxch[0] < UX2HEX_RXLEN_MAX:
-                    self.rxbuf += rxch
-                    self.len = rxch[0]
+                if rxch < UX2HEX_RXLEN_MAX:
+                    self.rxbuf.append(rxch)
+                    self.len = rxch
                     self.data_idx = 0
                     self.rxstate = UX2HEX_RXSTATE_DATA
                 else:
@@ -77,7 +77,7 @@ class Ux2HexProtocol(object):
 
             elif UX2HEX_RXSTATE_DATA == self.rxstate:
                 if self.data_idx < self.len:
-                    self.rxbuf += rxch
+                    self.rxbuf.append(rxch)
                     self.data_idx += 1
                     if self.data_idx == self.len:
                         self.rxstate = UX2HEX_RXSTATE_CRC1
@@ -85,16 +85,14 @@ class Ux2HexProtocol(object):
                     self.rxstate = UX2HEX_RXSTART_FROMID
 
             elif UX2HEX_RXSTATE_CRC1 == self.rxstate:
-                self.rxbuf += rxch
+                self.rxbuf.append(rxch)
                 self.rxstate = UX2HEX_RXSTATE_CRC2
 
             elif UX2HEX_RXSTATE_CRC2 == self.rxstate:
-                self.rxbuf += rxch
+                self.rxbuf.append(rxch)
                 self.rxstate = UX2HEX_RXSTART_FROMID
-                crc = crc16.crc_modbus(self.rxbuf[:self.len + 3])
-                if crc[0] == self.rxbuf[self.len + 3] and crc[1] == self.rxbuf[self.len + 4]:
+                if crc16.check_crc_modbus(self.rxbuf, self.len + 3):
                     if self.rx_que.full():
                         self.rx_que.get()
-                    self.rx_que.put(self.rxbuf)
+                    self.rx_que.put(bytes(self.rxbuf))
                     # print(self.rxbuf)
-
@@ -216,6 +216,9 @@ class XCONF(object):
         TCP_REPORT_REAL_BUF_SIZE = 87
         TCP_REPORT_NORMAL_BUF_SIZE = 133
         TCP_REPORT_RICH_BUF_SIZE = 233
+        TCP_REPORT_QUE_SIZE = 2
+        TCP_REPORT_QUE_POLICY = 'latest'  # latest/all/block
+        TCP_REPORT_AUTO_REAL_RATE = 20  # report_type='auto' uses the real port if a subscription needs a higher rate (Hz)
 
     class UxbusReg:
         GET_VERSION = 1
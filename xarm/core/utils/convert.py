@@ -10,68 +10,83 @@
 
 import struct
 
+try:
+    import numpy as np
+except:
+    np = None
+
+_STRUCT_CACHE = {}
+_FP32_LE = struct.Struct('<f')
+_FP32_BE = struct.Struct('>f')
+_INT32_LE = struct.Struct('<i')
+_INT32_BE = struct.Struct('>i')
+_U16_BE = struct.Struct('>H')
+
+
+def get_struct(fmt):
+    """预编译的struct.Struct, 按格式缓存"""
+    st = _STRUCT_CACHE.get(fmt, None)
+    if st is None:
+        st = struct.Struct(fmt)
+        _STRUCT_CACHE[fmt] = st
+    return st
+
+
+def _to_buffer(data):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return data
+    return bytes(data)
+
 
 def fp32_to_bytes(data, is_big_endian=False):
     """小端字节序"""
-    return bytes(struct.pack('>f' if is_big_endian else '<f', data))
+    return (_FP32_BE if is_big_endian else _FP32_LE).pack(data)
 
 
 def int32_to_bytes(data, is_big_endian=False):
     """小端字节序"""
-    return bytes(struct.pack('>i' if is_big_endian else '<i', data))
+    return (_INT32_BE if is_big_endian else _INT32_LE).pack(data)
 
 
 def int32s_to_bytes(data, n):
     """小端字节序"""
     assert n > 0
-    ret = int32_to_bytes(data[0])
-    for i in range(1, n):
-        ret += int32_to_bytes(data[i])
-    return ret
+    return get_struct('<{}i'.format(n)).pack(*data[:n])
 
 
-def bytes_to_fp32(data):
+def bytes_to_fp32(data, offset=0):
     """小端字节序"""
-    byte = bytes([data[0]])
-    byte += bytes([data[1]])
-    byte += bytes([data[2]])
-    byte += bytes([data[3]])
-    ret = struct.unpack('<f', byte)
-    return ret[0]
+    return _FP32_LE.unpack_from(_to_buffer(data), offset)[0]
 
 
 def fp32s_to_bytes(data, n):
     """小端字节序"""
     assert n > 0
-    ret = fp32_to_bytes(data[0])
-    for i in range(1, n):
-        ret += fp32_to_bytes(data[i])
-    return ret
+    return get_struct('<{}f'.format(n)).pack(*data[:n])
 
 
-def bytes_to_fp32s(data, n):
+def bytes_to_fp32s(data, n, offset=0):
     """小端字节序"""
-    ret = [0] * n
-    for i in range(n):
-        ret[i] = bytes_to_fp32(data[i * 4:i * 4 + 4])
-    return ret
+    return list(get_struct('<{}f'.format(n)).unpack_from(_to_buffer(data), offset))
+
+
+def bytes_to_fp32s_np(data, n, offset=0):
+    """小端字节序, 返回numpy数组(共享data的内存), 没有numpy时返回list"""
+    if np is None:
+        return bytes_to_fp32s(data, n, offset)
+    return np.frombuffer(_to_buffer(data), dtype='<f4', count=n, offset=offset)
 
 
 def u16_to_bytes(data):
     """大端字节序"""
-    bts = bytes([data // 256 % 256])
-    bts += bytes([data % 256])
-    return bts
+    return _U16_BE.pack(data & 0xFFFF)
 
 
 def u16s_to_bytes(data, num):
     """大端字节序"""
-    bts = b''
-    if num != 0:
-        bts = u16_to_bytes(data[0])
-        for i in range(1, num):
-            bts += u16_to_bytes(data[i])
-    return bts
+    if num == 0:
+        return b''
+    return get_struct('>{}H'.format(num)).pack(*[val & 0xFFFF for val in data[:num]])
 
 
 def bytes_to_u16(data):
@@ -80,20 +95,14 @@ def bytes_to_u16(data):
     return data_u16
 
 
-def bytes_to_u16s(data, n):
+def bytes_to_u16s(data, n, offset=0):
     """大端字节序"""
-    ret = [0] * n
-    for i in range(n):
-        ret[i] = bytes_to_u16(data[i * 2: i * 2 + 2])
-    return ret
+    return list(get_struct('>{}H'.format(n)).unpack_from(_to_buffer(data), offset))
 
 
-def bytes_to_16s(data, n):
+def bytes_to_16s(data, n, offset=0):
     """大端字节序"""
-    ret = [0] * n
-    for i in range(n):
-        ret[i] = struct.unpack('>h', bytes(data[i * 2: i * 2 + 2]))[0]
-    return ret
+    return list(get_struct('>{}h'.format(n)).unpack_from(_to_buffer(data), offset))
 
 
 def bytes_to_u32(data):
@@ -108,15 +117,9 @@ def bytes_to_u64(data):
 
 
 def bytes_to_num32(data, fmt='>l'):
-    byte = bytes([data[0]])
-    byte += bytes([data[1]])
-    byte += bytes([data[2]])
-    byte += bytes([data[3]])
-    ret = struct.unpack(fmt, byte)
-    return ret[0]
+    return get_struct(fmt).unpack_from(_to_buffer(data), 0)[0]
 
 
 def bytes_to_long_big(data):
     """大端字节序"""
     return bytes_to_num32(data, '>l')
-
@@ -57,20 +57,42 @@ CRC_TABLE_L = (
 0x80, 0x40)
 
 
-def crc_modbus(data):
-    leng = len(data)
-    init_crch = 0xFF
-    init_crcl = 0xFF
-    i = 0
+def _gen_crc16_table(poly=0xA001):
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ poly if crc & 0x01 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+# 16位查表(Modbus, 反射多项式0xA001), 与CRC_TABLE_H/CRC_TABLE_L结果一致
+CRC16_TABLE = _gen_crc16_table()
+CRC16_INIT = 0xFFFF
+
 
-    while leng > 0:
-        index = init_crch ^ data[i]
-        i += 1
-        init_crch = init_crcl ^ CRC_TABLE_H[index]
-        init_crcl = CRC_TABLE_L[index]
-        leng -= 1
-    s = init_crch << 8 | init_crcl
-    crc = bytes([s // 256 % 256])
-    crc += bytes([s % 256])
+def crc16_update(crc, data):
+    """
+    增量计算, 可以分段传入同一帧的数据
+    :param crc: 上一次的结果, 第一次为CRC16_INIT
+    :param data: bytes/bytearray/memoryview/list
+    :return: crc (u16)
+    """
+    table = CRC16_TABLE
+    for ch in data:
+        crc = (crc >> 8) ^ table[(crc ^ ch) & 0xFF]
     return crc
 
+
+def crc_modbus(data):
+    crc = crc16_update(CRC16_INIT, data)
+    return bytes([crc & 0xFF, crc >> 8])
+
+
+def check_crc_modbus(data, length):
+    """
+    校验data[:length]的crc, crc位于data[length:length+2]
+    """
+    crc = crc16_update(CRC16_INIT, memoryview(data)[:length] if isinstance(data, (bytes, bytearray)) else data[:length])
+    return (crc & 0xFF) == data[length] and (crc >> 8) == data[length + 1]
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import itertools
+
+try:
+    import numpy as np
+except:
+    np = None
+
+# name of the 4 values of every joint in the dh params
+DH_FIELDS = ('theta', 'd', 'alpha', 'a')
+# 'standard': Rz(theta) * Tz(d) * Tx(a) * Rx(alpha)
+# 'modified' (Craig): Rx(alpha) * Tx(a) * Rz(theta) * Tz(d)
+DH_CONVENTIONS = ('modified', 'standard')
+
+
+def pose_to_matrix(poses):
+    """
+    :param poses: (..., 6) array of [x, y, z, roll, pitch, yaw] (mm, radian), R = Rz(yaw) * Ry(pitch) * Rx(roll)
+    :return: (..., 4, 4) homogeneous transforms
+    """
+    poses = np.asarray(poses, dtype=float)
+    cr, sr = np.cos(poses[..., 3]), np.sin(poses[..., 3])
+    cp, sp = np.cos(poses[..., 4]), np.sin(poses[..., 4])
+    cy, sy = np.cos(poses[..., 5]), np.sin(poses[..., 5])
+    mat = np.zeros(poses.shape[:-1] + (4, 4))
+    mat[..., 0, 0] = cy * cp
+    mat[..., 0, 1] = cy * sp * sr - sy * cr
+    mat[..., 0, 2] = cy * sp * cr + sy * sr
+    mat[..., 1, 0] = sy * cp
+    mat[..., 1, 1] = sy * sp * sr + cy * cr
+    mat[..., 1, 2] = sy * sp * cr - cy * sr
+    mat[..., 2, 0] = -sp
+    mat[..., 2, 1] = cp * sr
+    mat[..., 2, 2] = cp * cr
+    mat[..., :3, 3] = poses[..., :3]
+    mat[..., 3, 3] = 1
+    return mat
+
+
+def matrix_to_pose(mats):
+    """
+    :param mats: (..., 4, 4) homogeneous transforms
+    :return: (..., 6) array of [x, y, z, roll, pitch, yaw] (mm, radian)
+    """
+    mats = np.asarray(mats, dtype=float)
+    poses = np.empty(mats.shape[:-2] + (6,))
+    poses[..., :3] = mats[..., :3, 3]
+    poses[..., 3] = np.arctan2(mats[..., 2, 1], mats[..., 2, 2])
+    poses[..., 4] = np.arctan2(-mats[..., 2, 0], np.hypot(mats[..., 0, 0], mats[..., 1, 0]))
+    poses[..., 5] = np.arctan2(mats[..., 1, 0], mats[..., 0, 0])
+    return poses
+
+
+def _rotation_error(target, current):
+    """
+    :return: (..., 3) rotation vector of target * current^T (base frame)
+    """
+    rot = target @ np.swapaxes(current, -1, -2)
+    cos = np.clip((rot[..., 0, 0] + rot[..., 1, 1] + rot[..., 2, 2] - 1) / 2, -1.0, 1.0)
+    angle = np.arccos(cos)
+    axis = np.stack([rot[..., 2, 1] - rot[..., 1, 2],
+                     rot[..., 0, 2] - rot[..., 2, 0],
+                     rot[..., 1, 0] - rot[..., 0, 1]], axis=-1)
+    sin = np.sin(angle)
+    # angle / (2 * sin(angle)) -> 1/2 when the angle is small
+    scale = np.where(sin > 1e-9, angle / (2 * np.where(sin > 1e-9, sin, 1)), 0.5)
+    return axis * scale[..., None]
+
+
+class DHKinematics(object):
+    """
+    Forward/inverse kinematics on the host for batches of joint angles/poses (NumPy)
+    All the angles are radian and the lengths are mm, the poses are [x, y, z, roll, pitch, yaw] like the arm
+    :param dh_params: DH parameters of the joints, list of 4 values per joint (flat list like get_dh_params or N x 4)
+    :param axis: number of the joints, default is all the joints of dh_params
+    :param layout: names of the 4 values of every joint, permutation of DH_FIELDS
+    :param convention: 'modified'/'standard'
+    :param tcp_offset: [x, y, z, roll, pitch, yaw] of the tcp in the flange frame
+    :param base_offset: [x, y, z, roll, pitch, yaw] of the base in the frame of the poses (identity by default)
+    :param joint_limits: list of (min, max) per joint, used to clip the ik solutions
+    """
+    def __init__(self, dh_params, axis=None, layout=DH_FIELDS, convention='modified',
+                 tcp_offset=None, base_offset=None, joint_limits=None):
+        if np is None:
+            raise ImportError('DHKinematics requires numpy')
+        if convention not in DH_CONVENTIONS:
+            raise ValueError('convention must be one of {}'.format(DH_CONVENTIONS))
+        params = np.asarray(dh_params, dtype=float).reshape(-1, 4)
+        self.axis = len(params) if axis is None else int(axis)
+        self.layout = tuple(layout)
+        self.convention = convention
+        params = params[:self.axis]
+        self.theta_offset, self.d, self.alpha, self.a = [params[:, self.layout.index(name)] for name in DH_FIELDS]
+        self.tool = pose_to_matrix(tcp_offset if tcp_offset is not None else [0] * 6)
+        self.base = pose_to_matrix(base_offset if base_offset is not None else [0] * 6)
+        if joint_limits:
+            limits = np.asarray(joint_limits, dtype=float)[:self.axis]
+            self.lower, self.upper = limits[:, 0], limits[:, 1]
+        else:
+            self.lower = self.upper = None
+
+    def _joint_transforms(self, q):
+        # q: (B, n) => (B, n, 4, 4)
+        theta = q + self.theta_offset
+        ct, st = np.cos(theta), np.sin(theta)
+        ca, sa = np.cos(self.alpha), np.sin(self.alpha)
+        a, d = self.a, self.d
+        mats = np.zeros(q.shape + (4, 4))
+        if self.convention == 'standard':
+            mats[..., 0, 0] = ct
+            mats[..., 0, 1] = -st * ca
+            mats[..., 0, 2] = st * sa
+            mats[..., 0, 3] = a * ct
+            mats[..., 1, 0] = st
+            mats[..., 1, 1] = ct * ca
+            mats[..., 1, 2] = -ct * sa
+            mats[..., 1, 3] = a * st
+            mats[..., 2, 1] = sa
+            mats[..., 2, 2] = ca
+            mats[..., 2, 3] = d
+        else:
+            mats[..., 0, 0] = ct
+            mats[..., 0, 1] = -st
+            mats[..., 0, 3] = a
+            mats[..., 1, 0] = st * ca
+            mats[..., 1, 1] = ct * ca
+            mats[..., 1, 2] = -sa
+            mats[..., 1, 3] = -sa * d
+            mats[..., 2, 0] = st * sa
+            mats[..., 2, 1] = ct * sa
+            mats[..., 2, 2] = ca
+            mats[..., 2, 3] = ca * d
+        mats[..., 3, 3] = 1
+        return mats
+
+    def _chain(self, q):
+        """
+        :return: (tcp transforms (B, 4, 4), axes (B, n, 3), origins (B, n, 3)) of the joints in the pose frame
+        """
+        mats = self._joint_transforms(q)
+        batch = q.shape[0]
+        frame = np.broadcast_to(self.base, (batch, 4, 4))
+        axes = np.empty((batch, self.axis, 3))
+        origins = np.empty((batch, self.axis, 3))
+        for i in range(self.axis):
+            if self.convention == 'standard':
+                # joint i rotates around the z axis of the frame before its transform
+                axes[:, i] = frame[:, :3, 2]
+                origins[:, i] = frame[:, :3, 3]
+                frame = frame @ mats[:, i]
+            else:
+                frame = frame @ mats[:, i]
+                axes[:, i] = frame[:, :3, 2]
+                origins[:, i] = frame[:, :3, 3]
+        return frame @ self.tool, axes, origins
+
+    def _as_batch(self, values, size):
+        values = np.asarray(values, dtype=float)
+        single = values.ndim == 1
+        values = values.reshape(-1, values.shape[-1])
+        return values[:, :size], single
+
+    def fk_matrix(self, angles):
+        """
+        :param angles: (n,) or (B, n) joint angles
+        :return: (4, 4) or (B, 4, 4) transforms of the tcp
+        """
+        q, single = self._as_batch(angles, self.axis)
+        mats = self._chain(q)[0]
+        return mats[0] if single else mats
+
+    def fk(self, angles):
+        """
+        :param angles: (n,) or (B, n) joint angles
+        :return: (6,) or (B, 6) tcp poses
+        """
+        return matrix_to_pose(self.fk_matrix(angles))
+
+    def jacobian(self, angles):
+        """
+        :return: (6, n) or (B, 6, n) geometric jacobian, rows are [vx, vy, vz, wx, wy, wz] (mm/rad, rad/rad)
+        """
+        q, single = self._as_batch(angles, self.axis)
+        mats, axes, origins = self._chain(q)
+        jac = np.empty((q.shape[0], 6, self.axis))
+        jac[:, :3] = np.swapaxes(np.cross(axes, mats[:, None, :3, 3] - origins), 1, 2)
+        jac[:, 3:] = np.swapaxes(axes, 1, 2)
+        return jac[0] if single else jac
+
+    def ik(self, poses, seeds=None, max_iter=100, pos_tol=0.01, rot_tol=1e-4, damping=0.1, rot_weight=100.0):
+        """
+        Damped least squares inverse kinematics of all the poses at the same time
+        :param poses: (6,) or (B, 6) target tcp poses
+        :param seeds: (n,) or (B, n) initial joint angles, such as the current angles, default is zeros
+        :param pos_tol: position tolerance (mm)
+        :param rot_tol: orientation tolerance (radian)
+        :param rot_weight: weight of the orientation error (mm per radian) against the position error
+        :return: (angles, success, pos_err, rot_err), (n,)/(B, n), bool/(B,), mm, radian
+        """
+        targets = pose_to_matrix(poses)
+        single = targets.ndim == 2
+        targets = targets.reshape(-1, 4, 4)
+        batch = targets.shape[0]
+        if seeds is None:
+            q = np.zeros((batch, self.axis))
+        else:
+            q = np.array(np.broadcast_to(np.asarray(seeds, dtype=float)[..., :self.axis], (batch, self.axis)))
+        weight = np.array([1, 1, 1, rot_weight, rot_weight, rot_weight], dtype=float)
+        active = np.ones(batch, dtype=bool)
+        pos_err = np.full(batch, np.inf)
+        rot_err = np.full(batch, np.inf)
+        eye = np.eye(6) * damping ** 2
+        for _ in range(max_iter):
+            idx = np.nonzero(active)[0]
+            if len(idx) == 0:
+                break
+            mats, axes, origins = self._chain(q[idx])
+            err = np.empty((len(idx), 6))
+            err[:, :3] = targets[idx, :3, 3] - mats[:, :3, 3]
+            err[:, 3:] = _rotation_error(targets[idx, :3, :3], mats[:, :3, :3])
+            pos_err[idx] = np.linalg.norm(err[:, :3], axis=1)
+            rot_err[idx] = np.linalg.norm(err[:, 3:], axis=1)
+            done = (pos_err[idx] <= pos_tol) & (rot_err[idx] <= rot_tol)
+            active[idx[done]] = False
+            keep = ~done
+            if not keep.any():
+                break
+            idx, mats, axes, origins, err = idx[keep], mats[keep], axes[keep], origins[keep], err[keep]
+            jac = np.empty((len(idx), 6, self.axis))
+            jac[:, :3] = np.swapaxes(np.cross(axes, mats[:, None, :3, 3] - origins), 1, 2)
+            jac[:, 3:] = np.swapaxes(axes, 1, 2)
+            jac *= weight[None, :, None]
+            err *= weight
+            # dq = J^T (J J^T + lambda^2 I)^-1 e
+            jjt = jac @ np.swapaxes(jac, 1, 2) + eye
+            dq = (np.swapaxes(jac, 1, 2) @ np.linalg.solve(jjt, err[..., None]))[..., 0]
+            q[idx] += dq
+            if self.lower is not None:
+                q[idx] = np.clip(q[idx], self.lower, self.upper)
+        success = (pos_err <= pos_tol) & (rot_err <= rot_tol)
+        if single:
+            return q[0], bool(success[0]), float(pos_err[0]), float(rot_err[0])
+        return q, success, pos_err, rot_err
+
+    @classmethod
+    def detect(cls, dh_params, samples, axis=None, **kwargs):
+        """
+        Find the layout/convention of the dh params which reproduces the reference fk samples
+        :param samples: list of (angles, pose) pairs, such as the results of the fk of the controller
+        :return: (DHKinematics, max position error (mm), max orientation error (radian)), the best candidate
+        """
+        angles = np.asarray([s[0] for s in samples], dtype=float)
+        targets = pose_to_matrix([s[1] for s in samples])
+        best = None
+        for convention in DH_CONVENTIONS:
+            for layout in itertools.permutations(DH_FIELDS):
+                kin = cls(dh_params, axis=axis, layout=layout, convention=convention, **kwargs)
+                mats = kin.fk_matrix(angles).reshape(-1, 4, 4)
+                pos_err = np.linalg.norm(mats[:, :3, 3] - targets[:, :3, 3], axis=1).max()
+                rot_err = np.linalg.norm(_rotation_error(targets[:, :3, :3], mats[:, :3, :3]), axis=1).max()
+                if best is None or pos_err + rot_err * 100 < best[1] + best[2] * 100:
+                    best = (kin, float(pos_err), float(rot_err))
+        return best
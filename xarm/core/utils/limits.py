@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import math
+
+try:
+    import numpy as np
+except:
+    np = None
+
+# names of the violation arrays of LimitChecker.check
+LIMIT_CHECKS = ('joint_range', 'reduced_joint_range', 'tcp_limit', 'tcp_boundary', 'unreachable')
+
+
+class LimitChecker(object):
+    """
+    Vectorised limit checking of many targets at the same time, without any round-trip to the controller
+    All the values are radian/mm, the limits which are None are not checked
+    :param joint_limits: [(lower, upper), ...] of every joint, such as XCONF.Robot.JOINT_LIMITS
+    :param tcp_limits: [(lower, upper), ...] of x/y/z/roll/pitch/yaw, such as XCONF.Robot.TCP_LIMITS,
+        only roll/pitch/yaw are checked (same as the check of set_position), a range with lower == upper is not checked
+    :param rot_offset: offset of the roll/pitch/yaw limits, such as tcp offset + world offset
+    :param reduced_joint_range: [j1_min, j1_max, j2_min, j2_max, ...], the joint range of the reduced mode
+    :param tcp_boundary: [x_max, x_min, y_max, y_min, z_max, z_min], the tcp boundary of the safety boundary mode
+    :param tolerance: tolerance (radian) of the joint/rotation limits
+    :param margin: (mm, radian), a target within the margin of a limit is borderline
+    """
+    def __init__(self, joint_limits=None, tcp_limits=None, rot_offset=None, reduced_joint_range=None,
+                 tcp_boundary=None, tolerance=math.radians(0.1), margin=(1.0, math.radians(0.5))):
+        if np is None:
+            raise ImportError('LimitChecker requires numpy')
+        self.tolerance = tolerance
+        self.margin = margin
+        self.joint_limits = np.asarray(joint_limits, dtype=float).reshape(-1, 2) if joint_limits else None
+        self.reduced_joint_range = np.asarray(reduced_joint_range, dtype=float).reshape(-1, 2) if reduced_joint_range else None
+        self.tcp_boundary = None
+        if tcp_boundary:
+            boundary = np.asarray(tcp_boundary, dtype=float).reshape(3, 2)
+            # => [(min, max), ...] of x/y/z
+            self.tcp_boundary = np.stack([boundary.min(axis=1), boundary.max(axis=1)], axis=1)
+        self.rot_limits = None
+        if tcp_limits and len(tcp_limits) >= 6:
+            limits = np.asarray(tcp_limits[3:6], dtype=float)
+            if rot_offset is not None:
+                limits = limits + np.asarray(rot_offset, dtype=float)[3:6, None]
+            self.rot_limits = limits
+
+    @staticmethod
+    def as_targets(targets, is_joint=False, is_radian=True):
+        """
+        :param targets: list of the joint angles or the tcp poses ([x, y, z, roll, pitch, yaw])
+        :return: (B, n) array, the angles are converted to radian
+        """
+        if np is None:
+            raise ImportError('LimitChecker requires numpy')
+        targets = np.atleast_2d(np.array(targets, dtype=float))
+        if not is_radian:
+            if is_joint:
+                targets = np.radians(targets)
+            else:
+                targets[:, 3:] = np.radians(targets[:, 3:])
+        return targets
+
+    def _check_range(self, values, limits, tolerance, margin):
+        """
+        :param values: (B, n)
+        :param limits: (m, 2), the ranges with lower == upper are skipped
+        :return: (violated, borderline), (B,) bool
+        """
+        n = min(values.shape[1], len(limits))
+        values, limits = values[:, :n], limits[:n]
+        active = limits[:, 0] != limits[:, 1]
+        lower, upper = limits[:, 0] - tolerance, limits[:, 1] + tolerance
+        violated = ((values < lower) | (values > upper)) & active
+        distance = np.minimum(np.abs(values - lower), np.abs(values - upper))
+        borderline = (distance <= margin) & active
+        return violated.any(axis=1), borderline.any(axis=1)
+
+    def check_joints(self, angles):
+        """
+        :param angles: (B, n) joint angles
+        :return: ({name: (B,) bool}, (B,) borderline)
+        """
+        angles = np.asarray(angles, dtype=float)
+        result = {}
+        borderline = np.zeros(len(angles), dtype=bool)
+        for name, limits in (('joint_range', self.joint_limits), ('reduced_joint_range', self.reduced_joint_range)):
+            if limits is not None:
+                result[name], near = self._check_range(angles, limits, self.tolerance, self.margin[1])
+                borderline |= near
+        return result, borderline
+
+    def check_poses(self, poses):
+        """
+        :param poses: (B, 6) tcp poses
+        :return: ({name: (B,) bool}, (B,) borderline)
+        """
+        poses = np.asarray(poses, dtype=float)
+        result = {}
+        borderline = np.zeros(len(poses), dtype=bool)
+        if self.rot_limits is not None:
+            result['tcp_limit'], near = self._check_range(poses[:, 3:6], self.rot_limits, self.tolerance, self.margin[1])
+            borderline |= near
+        if self.tcp_boundary is not None:
+            result['tcp_boundary'], near = self._check_range(poses[:, :3], self.tcp_boundary, 0, self.margin[0])
+            borderline |= near
+        return result, borderline
+
+    def check(self, targets, is_joint=False, kinematics=None, seeds=None):
+        """
+        :param targets: (B, n) joint angles if is_joint else (B, 6) tcp poses
+        :param kinematics: DHKinematics, used to check the other side of the targets,
+            the tcp limits of the joint targets (by fk), the joint ranges of the tcp targets (by ik)
+        :param seeds: seeds of the ik, such as the current angles
+        :return: {name: (B,) bool, ..., 'ok': (B,) bool, 'borderline': (B,) bool}
+            name is one of LIMIT_CHECKS, True means violated, only the names which are checked are in the result
+        """
+        targets = np.atleast_2d(np.asarray(targets, dtype=float))
+        if is_joint:
+            result, borderline = self.check_joints(targets)
+            if kinematics is not None:
+                res, near = self.check_poses(kinematics.fk(targets[:, :kinematics.axis]))
+                result.update(res)
+                borderline |= near
+        else:
+            result, borderline = self.check_poses(targets)
+            if kinematics is not None:
+                angles, success, _, _ = kinematics.ik(targets[:, :6], seeds=seeds)
+                res, near = self.check_joints(angles)
+                for name in res:
+                    result[name] = res[name] & success
+                result['unreachable'] = ~success
+                borderline |= near & success
+        ok = np.ones(len(targets), dtype=bool)
+        for name in result:
+            ok &= ~result[name]
+        result['ok'] = ok
+        result['borderline'] = borderline
+        return result
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import struct
+
+# Layout of the report frames (new protocol)
+# (name, offset, format, count)
+#   format: '<f' little-endian fp32, '>H'/'>I'/'>Q' big-endian integer, 'B' u8, 's' raw bytes (count is the size)
+#   count: 1 means a scalar value, otherwise a list
+REPORT_REAL_LAYOUT = (
+    ('length', 0, '>I', 1),
+    ('state_mode', 4, 'B', 1),
+    ('cmd_num', 5, '>H', 1),
+    ('angles', 7, '<f', 7),
+    ('pose', 35, '<f', 6),
+    ('torque', 59, '<f', 7),
+    ('ft_ext_force', 87, '<f', 6),
+    ('ft_raw_force', 111, '<f', 6),
+)
+
+REPORT_NORMAL_LAYOUT = (
+    ('length', 0, '>I', 1),
+    ('state_mode', 4, 'B', 1),
+    ('cmd_num', 5, '>H', 1),
+    ('angles', 7, '<f', 7),
+    ('pose', 35, '<f', 6),
+    ('torque', 59, '<f', 7),
+    ('mtbrake', 87, 'B', 1),
+    ('mtable', 88, 'B', 1),
+    ('error_code', 89, 'B', 1),
+    ('warn_code', 90, 'B', 1),
+    ('pose_offset', 91, '<f', 6),
+    ('tcp_load', 115, '<f', 4),
+    ('collis_sens', 131, 'B', 1),
+    ('teach_sens', 132, 'B', 1),
+    ('gravity_direction', 133, '<f', 3),
+)
+
+REPORT_RICH_LAYOUT = REPORT_NORMAL_LAYOUT + (
+    ('arm_info', 145, 'B', 6),  # arm_type, arm_axis, master_id, slave_id, motor_tid, motor_fid
+    ('version', 151, 's', 30),
+    ('trs', 181, '<f', 5),  # tcp_jerk, min_tcp_acc, max_tcp_acc, min_tcp_speed, max_tcp_speed
+    ('p2p', 201, '<f', 5),  # joint_jerk, min_joint_acc, max_joint_acc, min_joint_speed, max_joint_speed
+    ('rot', 221, '<f', 2),  # rot_jerk, max_rot_acc
+    ('servo_codes', 229, 'B', 16),
+    ('temperatures', 245, 'B', 7),
+    ('speeds', 252, '<f', 8),
+    ('count', 284, '>I', 1),
+    ('world_offset', 288, '<f', 6),
+    ('cgpio_reset_enable', 312, 'B', 1),
+    ('tgpio_reset_enable', 313, 'B', 1),
+    ('is_simulation_robot', 314, 'B', 1),
+    ('is_collision_detection', 315, 'B', 1),
+    ('collision_tool_type', 316, 'B', 1),
+    ('collision_tool_params', 317, '<f', 6),
+    ('voltages', 341, '>H', 7),
+    ('currents', 355, '<f', 7),
+    ('cgpio_digital', 383, 'B', 2),
+    ('cgpio_analog', 385, '>H', 8),
+    ('cgpio_input_conf', 401, 'B', 8),
+    ('cgpio_output_conf', 409, 'B', 8),
+    ('cgpio_input_conf2', 417, 'B', 8),
+    ('cgpio_output_conf2', 425, 'B', 8),
+    ('ft_ext_force', 433, '<f', 6),
+    ('ft_raw_force', 457, '<f', 6),
+    ('iden_progress', 481, 'B', 1),
+    ('pose_aa', 482, '<f', 3),
+    ('timestamp', 494, '>Q', 1),
+)
+
+# offset of the controller timestamp (u64 microseconds) in the rich report frame
+REPORT_TIMESTAMP_OFFSET = [x[1] for x in REPORT_RICH_LAYOUT if x[0] == 'timestamp'][0]
+
+
+class ReportDecoder(object):
+    """
+    Decode a whole report frame with two precompiled structs (one little-endian, one big-endian),
+    the structs are built once for every frame length, the fields beyond the frame are left out
+    :param layout: REPORT_REAL_LAYOUT/REPORT_NORMAL_LAYOUT/REPORT_RICH_LAYOUT
+    """
+    def __init__(self, layout):
+        self.layout = tuple(sorted(layout, key=lambda x: x[1]))
+        self._cache = {}
+
+    def _build(self, length):
+        fmts = {'<': ['<'], '>': ['>']}
+        pos = {'<': 0, '>': 0}
+        index = {'<': 0, '>': 0}
+        fields = []
+        for name, offset, fmt, count in self.layout:
+            code = fmt[-1]
+            endian = '>' if fmt[0] == '>' else '<'
+            item = '{}{}'.format(count, code) if count > 1 or code == 's' else code
+            size = struct.calcsize(endian + item)
+            if offset + size > length:
+                continue
+            if offset > pos[endian]:
+                fmts[endian].append('{}x'.format(offset - pos[endian]))
+            fmts[endian].append(item)
+            pos[endian] = offset + size
+            num = 1 if code == 's' else count
+            fields.append((name, endian == '>', index[endian], index[endian] + num, num == 1))
+            index[endian] += num
+        entry = (struct.Struct(''.join(fmts['<'])), struct.Struct(''.join(fmts['>'])), tuple(fields))
+        self._cache[length] = entry
+        return entry
+
+    def decode(self, data):
+        """
+        :param data: report frame (bytes/bytearray/memoryview)
+        :return: dict of {name: value}, only the fields inside the frame
+        """
+        entry = self._cache.get(len(data), None)
+        if entry is None:
+            entry = self._build(len(data))
+        le_struct, be_struct, fields = entry
+        le_values = le_struct.unpack_from(data)
+        be_values = be_struct.unpack_from(data)
+        report = {}
+        for name, is_be, start, end, is_scalar in fields:
+            values = be_values if is_be else le_values
+            report[name] = values[start] if is_scalar else list(values[start:end])
+        return report
+
+
+real_report_decoder = ReportDecoder(REPORT_REAL_LAYOUT)
+normal_report_decoder = ReportDecoder(REPORT_NORMAL_LAYOUT)
+rich_report_decoder = ReportDecoder(REPORT_RICH_LAYOUT)
+
+
+def _layout_fields(layout):
+    # state/mode are the low/high 4 bits of state_mode
+    return frozenset([x[0] for x in layout if x[0] not in ('length', 'state_mode')] + ['state', 'mode'])
+
+
+REPORT_REAL_FIELDS = _layout_fields(REPORT_REAL_LAYOUT)
+REPORT_NORMAL_FIELDS = _layout_fields(REPORT_NORMAL_LAYOUT)
+REPORT_RICH_FIELDS = _layout_fields(REPORT_RICH_LAYOUT)
+REPORT_FIELDS = REPORT_REAL_FIELDS | REPORT_RICH_FIELDS
+
+
+def select_report_type(fields, rate=0, real_rate=20):
+    """
+    Cheapest report type which carries all the fields at the rate
+    :param fields: field names of REPORT_FIELDS
+    :param rate: max rate (Hz) of the consumers, 0 means no requirement
+    :param real_rate: rate above which only the real report is fast enough
+    :return: 'real'/'normal'/'rich'
+    """
+    fields = frozenset(fields)
+    if fields <= REPORT_REAL_FIELDS and (rate > real_rate or not fields <= REPORT_NORMAL_FIELDS):
+        return 'real'
+    if fields <= REPORT_NORMAL_FIELDS:
+        return 'normal'
+    return 'rich'
+
+
+def get_report_field(report, field):
+    """
+    :return: value of the field in the decoded report, None if the field is not in the report
+    """
+    if field == 'state':
+        return report['state_mode'] & 0x0F
+    if field == 'mode':
+        return report['state_mode'] >> 4
+    return report.get(field, None)
+
+
+# fields of the report-driven events, bit i of the change mask is REPORT_CHANGE_FIELDS[i]
+# state/mode are the low/high 4 bits of state_mode
+REPORT_CHANGE_FIELDS = ('state', 'mode', 'cmd_num', 'mtbrake', 'mtable', 'error_code', 'warn_code',
+                        'temperatures', 'count', 'iden_progress')
+CHANGED_STATE = 1 << 0
+CHANGED_MODE = 1 << 1
+CHANGED_CMDNUM = 1 << 2
+CHANGED_MTBRAKE = 1 << 3
+CHANGED_MTABLE = 1 << 4
+CHANGED_ERROR_CODE = 1 << 5
+CHANGED_WARN_CODE = 1 << 6
+CHANGED_TEMPERATURES = 1 << 7
+CHANGED_COUNT = 1 << 8
+CHANGED_IDEN_PROGRESS = 1 << 9
+
+
+class ReportChangeDetector(object):
+    """
+    Change bitmask of the report frames, computed by comparing the raw bytes of the fields with the previous frame
+    The fields of REPORT_CHANGE_FIELDS always have their fixed bits, other fields get the next bits by get_bit()
+    :param layout: REPORT_REAL_LAYOUT/REPORT_NORMAL_LAYOUT/REPORT_RICH_LAYOUT
+    """
+    def __init__(self, layout):
+        self._ranges = {}
+        for name, offset, fmt, count in layout:
+            item = '{}{}'.format(count, fmt[-1]) if count > 1 or fmt[-1] == 's' else fmt[-1]
+            self._ranges[name] = (offset, offset + struct.calcsize('<' + item), None)
+        if 'state_mode' in self._ranges:
+            offset = self._ranges['state_mode'][0]
+            self._ranges['state'] = (offset, offset + 1, 0x0F)
+            self._ranges['mode'] = (offset, offset + 1, 0xF0)
+        self._bits = {}
+        self._items = []
+        self._force = 0
+        self._prev = None
+        for i, name in enumerate(REPORT_CHANGE_FIELDS):
+            if name in self._ranges:
+                self._add(name, 1 << i)
+        self._next_bit = 1 << len(REPORT_CHANGE_FIELDS)
+
+    def _add(self, name, bit):
+        start, end, nibble = self._ranges[name]
+        self._bits[name] = bit
+        self._items.append((bit, start, end, nibble))
+
+    def get_bit(self, name):
+        """
+        :return: bit of the field, the field is added if not yet, 0 if the field is not in the layout
+        """
+        bit = self._bits.get(name, None)
+        if bit is None:
+            if name not in self._ranges:
+                return 0
+            bit = self._next_bit
+            self._next_bit <<= 1
+            self._add(name, bit)
+            # reported as changed on the next frame, so the subscriber gets the current value
+            self._force |= bit
+        return bit
+
+    def reset(self):
+        self._prev = None
+
+    def update(self, data):
+        """
+        :param data: report frame
+        :return: change mask, all the bits (of the fields inside the frame) are set for the first frame
+        """
+        prev, self._prev = self._prev, bytes(data)
+        length = len(data)
+        mask, self._force = self._force, 0
+        if prev is None or len(prev) != length:
+            for bit, start, end, nibble in self._items:
+                if end <= length:
+                    mask |= bit
+            return mask
+        for bit, start, end, nibble in self._items:
+            if end > length:
+                continue
+            if nibble is None:
+                if prev[start:end] != data[start:end]:
+                    mask |= bit
+            elif (prev[start] ^ data[start]) & nibble:
+                mask |= bit
+        return mask
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import threading
+
+try:
+    import numpy as np
+except:
+    np = None
+
+# host_time: time.monotonic() when the frame was received
+# ctrl_time: timestamp of the controller (microseconds), 0 if the frame has no timestamp (only the rich report has)
+# angles/pose: the units are the same as the attributes of the arm (radian, mm)
+REPORT_RECORD_DTYPE = [
+    ('host_time', 'f8'),
+    ('ctrl_time', 'u8'),
+    ('state', 'u1'),
+    ('mode', 'u1'),
+    ('cmd_num', 'u2'),
+    ('error_code', 'u1'),
+    ('warn_code', 'u1'),
+    ('angles', 'f4', (7,)),
+    ('pose', 'f4', (6,)),
+    ('torque', 'f4', (7,)),
+    ('currents', 'f4', (7,)),
+    ('ft_ext_force', 'f4', (6,)),
+    ('ft_raw_force', 'f4', (6,)),
+]
+
+
+class ReportHistory(object):
+    """
+    Preallocated ring of the last `size` report records (NumPy structured array)
+    Every record is written twice (index i and i + size), so the latest n records are always
+    one contiguous slice and can be returned as a view without copying
+    Note: the views are overwritten by the new records after `size - n` frames, use copy=True to keep them
+    :param size: max records
+    """
+    def __init__(self, size=1000):
+        if np is None:
+            raise ImportError('ReportHistory requires numpy')
+        self.size = max(1, int(size))
+        self.dtype = np.dtype(REPORT_RECORD_DTYPE)
+        self._buf = np.zeros(self.size * 2, dtype=self.dtype)
+        self._index = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.size)
+
+    @property
+    def total(self):
+        """
+        records appended since created/cleared, including the overwritten ones
+        """
+        return self._count
+
+    def clear(self):
+        with self._lock:
+            self._index = 0
+            self._count = 0
+
+    def append(self, host_time, ctrl_time, state, mode, cmd_num, error_code, warn_code,
+               angles, pose, torque, currents, ft_ext_force, ft_raw_force):
+        record = (host_time, ctrl_time, state, mode, cmd_num, error_code, warn_code,
+                  angles[:7], pose[:6], torque[:7], currents[:7], ft_ext_force[:6], ft_raw_force[:6])
+        with self._lock:
+            index = self._index
+            self._buf[index] = record
+            self._buf[index + self.size] = self._buf[index]
+            self._index = (index + 1) % self.size
+            self._count += 1
+
+    def latest(self, n=None, copy=False):
+        """
+        :param n: number of the latest records, None means all
+        :param copy: return a copy or a view
+        :return: structured array in time order (the oldest first)
+        """
+        with self._lock:
+            length = min(self._count, self.size)
+            n = length if n is None else max(0, min(int(n), length))
+            end = self._index + self.size
+            records = self._buf[end - n:end]
+            return records.copy() if copy else records
+
+    def window(self, start_time, end_time, copy=False):
+        """
+        :param start_time/end_time: time.monotonic() based
+        :return: structured array of the records received in [start_time, end_time]
+        """
+        records = self.latest()
+        host_time = records['host_time']
+        i = int(np.searchsorted(host_time, start_time, side='left'))
+        j = int(np.searchsorted(host_time, end_time, side='right'))
+        return records[i:j].copy() if copy else records[i:j]
+
+    def nearest(self, t):
+        """
+        :param t: time.monotonic() based, such as the capture time of an image
+        :return: copy of the record received nearest to t, None if empty
+        """
+        records = self.latest()
+        if len(records) == 0:
+            return None
+        host_time = records['host_time']
+        i = int(np.searchsorted(host_time, t))
+        if i >= len(records) or (i > 0 and t - host_time[i - 1] <= host_time[i] - t):
+            i -= 1
+        return records[i].copy()
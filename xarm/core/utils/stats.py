@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import json
+import bisect
+import threading
+
+# upper bounds of the buckets, milliseconds
+DEFAULT_BOUNDS_MS = (0.05, 0.1, 0.2, 0.5, 1, 2, 3, 5, 8, 10, 15, 20, 30, 50, 100, 200, 300, 500, 1000, 2000, 5000)
+
+
+class Histogram(object):
+    """
+    Fixed bucket histogram, record() is O(log(buckets)) and allocates nothing
+    :param bounds: sorted upper bounds of the buckets, values over the last bound go to the overflow bucket
+    :param over: threshold, values over it are counted in over_cnts
+    """
+    def __init__(self, bounds=DEFAULT_BOUNDS_MS, over=None):
+        self.bounds = tuple(bounds)
+        self.over = over
+        self.reset()
+
+    def reset(self):
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+        self.over_cnts = 0
+
+    def record(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.last = value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if self.over is not None and value > self.over:
+            self.over_cnts += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, p):
+        """
+        :param p: 0~100
+        :return: upper bound of the bucket which the percentile falls into (max value for the overflow bucket)
+        """
+        if not self.count:
+            return None
+        target = self.count * p / 100.0
+        acc = 0
+        for i, cnt in enumerate(self.buckets):
+            acc += cnt
+            if cnt and acc >= target:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'last': self.last,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'over': self.over,
+            'over_cnts': self.over_cnts,
+            'bounds': list(self.bounds),
+            'buckets': list(self.buckets),
+        }
+
+
+class ReportStats(object):
+    """
+    Jitter and latency of the report stream, all the values are milliseconds
+        recv_interval: interval of the frames received by the host
+        data_interval: interval of the controller timestamps (microseconds in the rich report frame)
+        skew: (host receive time - controller timestamp) - min of it, the transfer delay over the best case
+        process: time of processing a frame (decode, update the states, dispatch the callbacks)
+    """
+    def __init__(self, recv_over=300, data_over=205):
+        self._lock = threading.Lock()
+        self.recv_interval = Histogram(over=recv_over)
+        self.data_interval = Histogram(over=data_over)
+        self.skew = Histogram()
+        self.process = Histogram()
+        self._prev_recv_time = None
+        self._prev_data_us = None
+        self._min_offset_us = None
+        self._start_time = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self.recv_interval.reset()
+            self.data_interval.reset()
+            self.skew.reset()
+            self.process.reset()
+            self._prev_recv_time = None
+            self._prev_data_us = None
+            self._min_offset_us = None
+            self._start_time = time.monotonic()
+
+    def update(self, recv_time, process_time, ctrl_time=None):
+        """
+        :param recv_time: time.monotonic() when the frame was received
+        :param process_time: seconds used to process the frame
+        :param ctrl_time: controller timestamp (microseconds) of the frame, None if the frame has no timestamp
+        """
+        with self._lock:
+            if self._prev_recv_time is not None:
+                self.recv_interval.record((recv_time - self._prev_recv_time) * 1000)
+            self._prev_recv_time = recv_time
+            self.process.record(process_time * 1000)
+            if ctrl_time is None:
+                return
+            data_us = ctrl_time
+            if self._prev_data_us is not None:
+                self.data_interval.record((data_us - self._prev_data_us) / 1000)
+            self._prev_data_us = data_us
+            offset_us = recv_time * 1000000 - data_us
+            if self._min_offset_us is None or offset_us < self._min_offset_us:
+                self._min_offset_us = offset_us
+            self.skew.record((offset_us - self._min_offset_us) / 1000)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'duration': time.monotonic() - self._start_time,
+                'recv_interval': self.recv_interval.to_dict(),
+                'data_interval': self.data_interval.to_dict(),
+                'skew': self.skew.to_dict(),
+                'process': self.process.to_dict(),
+            }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+class CmdTiming(object):
+    """
+    Timing of the uxbus commands, grouped by funcode, all the values are milliseconds
+        lock_wait: waiting for the command lock (other threads' commands)
+        send: from getting the lock to the request written to the port
+        first_byte: from the request written to the response received by the port
+        rtt: from getting the lock to the response parsed
+    """
+    FIELDS = ('lock_wait', 'send', 'first_byte', 'rtt')
+
+    def __init__(self, bounds=DEFAULT_BOUNDS_MS):
+        self._bounds = bounds
+        self._lock = threading.Lock()
+        self._items = {}
+        self._start_time = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self._items = {}
+            self._start_time = time.monotonic()
+
+    def record(self, funcode, code, lock_wait, send=None, first_byte=None, rtt=None):
+        """
+        :param funcode: register of the command
+        :param code: code of the command, 0/1/2 (the controller has error/warn) means the response is received
+        :param lock_wait/send/first_byte/rtt: seconds, None means not available
+        """
+        with self._lock:
+            item = self._items.get(funcode, None)
+            if item is None:
+                item = {'count': 0, 'errors': 0}
+                for name in self.FIELDS:
+                    item[name] = Histogram(self._bounds)
+                self._items[funcode] = item
+            item['count'] += 1
+            if code not in (0, 1, 2):
+                item['errors'] += 1
+            for name, value in zip(self.FIELDS, (lock_wait, send, first_byte, rtt)):
+                if value is not None:
+                    item[name].record(value * 1000)
+
+    def to_dict(self, names=None):
+        """
+        :param names: dict of {funcode: name}, used as the key if given
+        """
+        names = names or {}
+        with self._lock:
+            return {
+                names.get(funcode, funcode): {
+                    k: (v.to_dict() if isinstance(v, Histogram) else v) for k, v in item.items()
+                } for funcode, item in self._items.items()
+            }
+
+    def dump(self, names=None):
+        """
+        :return: text table, sorted by the total rtt
+        """
+        names = names or {}
+        with self._lock:
+            items = sorted(self._items.items(), key=lambda x: x[1]['rtt'].total, reverse=True)
+            lines = ['{:<32}{:>8}{:>8}{:>12}{:>12}{:>12}{:>12}{:>12}{:>12}'.format(
+                'funcode', 'count', 'errors', 'total(ms)', 'lock_avg', 'send_avg', 'first_avg', 'rtt_avg', 'rtt_max')]
+            for funcode, item in items:
+                lines.append('{:<32}{:>8}{:>8}{:>12.3f}{:>12.3f}{:>12.3f}{:>12.3f}{:>12.3f}{:>12.3f}'.format(
+                    str(names.get(funcode, funcode)), item['count'], item['errors'], item['rtt'].total,
+                    item['lock_wait'].mean or 0, item['send'].mean or 0, item['first_byte'].mean or 0,
+                    item['rtt'].mean or 0, item['rtt'].max or 0))
+        return '\n'.join(lines)
@@ -9,3 +9,7 @@
 
 from .uxbus_cmd_ser import UxbusCmdSer
 from .uxbus_cmd_tcp import UxbusCmdTcp
+try:
+    from .uxbus_cmd_async import AsyncUxbusCmdTcp
+except:
+    AsyncUxbusCmdTcp = None
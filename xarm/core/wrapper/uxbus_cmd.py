@@ -17,14 +17,36 @@ from ..config.x_config import XCONF
 def lock_require(func):
     @functools.wraps(func)
     def decorator(*args, **kwargs):
+        if args[0]._timing is not None:
+            return args[0]._call_with_timing(func, args, kwargs)
         with args[0].lock:
             return func(*args, **kwargs)
     return decorator
 
 
+def lock_require_pipelined(func):
+    """
+    Same as lock_require, but the lock is released while waiting for the response if the pipelined mode is on,
+    only for the primitives which send a single request, the sequences of requests keep the lock (atomic)
+    """
+    locked_func = lock_require(func)
+
+    @functools.wraps(func)
+    def decorator(*args, **kwargs):
+        local = args[0]._pipeline_local
+        local.release = True
+        try:
+            return locked_func(*args, **kwargs)
+        finally:
+            local.release = False
+    return decorator
+
+
 class UxbusCmd(object):
     BAUDRATES = (4800, 9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600,
                  1000000, 1500000, 2000000, 2500000)
+    # max requests in flight of is_nfp32_burst, the responses of the tcp are matched by the transaction id
+    MAX_BURST = 1
 
     def __init__(self, set_feedback_key_tranid=None):
         self._has_error = False
@@ -41,6 +63,11 @@ class UxbusCmd(object):
         self._last_modbus_comm_time = time.monotonic()
         self._feedback_type = 0
         self._set_feedback_key_tranid = set_feedback_key_tranid
+        # CmdTiming if the timing is enabled, the marks of the current command are kept per thread
+        self._timing = None
+        self._timing_local = threading.local()
+        # release: the lock may be released while waiting for the response (see lock_require_pipelined)
+        self._pipeline_local = threading.local()
 
     @property
     def last_comm_time(self):
@@ -71,6 +98,50 @@ class UxbusCmd(object):
 
     def set_debug(self, debug):
         self._debug = debug
+
+    @property
+    def timing(self):
+        return self._timing
+
+    def set_timing(self, timing):
+        """
+        :param timing: CmdTiming instance, None means disable
+        """
+        self._timing = timing
+
+    def _timing_mark_sent(self):
+        # called by the transport after the request is written, only the first request of a command is marked
+        if self._timing_local.sent is None:
+            self._timing_local.sent = time.monotonic()
+
+    def _timing_mark_received(self, rx_time):
+        # rx_time: time the response arrived at the port
+        if self._timing_local.received is None:
+            self._timing_local.received = rx_time
+
+    def _call_with_timing(self, func, args, kwargs):
+        timing = self._timing
+        local = self._timing_local
+        call_time = time.monotonic()
+        with self.lock:
+            lock_time = time.monotonic()
+            local.sent = None
+            local.received = None
+            ret = func(*args, **kwargs)
+            done_time = time.monotonic()
+            sent_time, received_time = local.sent, local.received
+        if timing is not None:
+            # the primitives (set_nu8/get_nfp32/...) are grouped by funcode, the others by name
+            if func.__code__.co_varnames[1:2] == ('funcode',):
+                funcode = args[1] if len(args) > 1 else kwargs.get('funcode')
+            else:
+                funcode = func.__name__
+            timing.record(
+                funcode, ret[0] if isinstance(ret, (list, tuple)) and ret else 0, lock_time - call_time,
+                send=None if sent_time is None else sent_time - lock_time,
+                first_byte=None if sent_time is None or received_time is None else max(received_time - sent_time, 0),
+                rtt=done_time - lock_time)
+        return ret
     
     def send_modbus_request(self, unit_id, pdu_data, pdu_len, prot_id=-1, t_id=None):
         raise NotImplementedError
@@ -78,10 +149,12 @@ class UxbusCmd(object):
     def recv_modbus_response(self, t_unit_id, t_trans_id, num, timeout, t_prot_id=-1, ret_raw=False):
         raise NotImplementedError
 
-    @lock_require
+    @lock_require_pipelined
     def set_nu8(self, funcode, datas, num, timeout=None, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
         need_set_fb = feedback_type != 0 and (self._feedback_type & feedback_type) != feedback_type
         if feedback_key and need_set_fb:
+            # set feedback type => send => restore feedback type, keep the lock until the end
+            self._pipeline_local.release = False
             self._set_feedback_type_no_lock(self._feedback_type | feedback_type)
 
         trans_id = self._get_trans_id()
@@ -95,21 +168,21 @@ class UxbusCmd(object):
             self._set_feedback_type_no_lock(self._feedback_type)
         return ret
 
-    @lock_require
+    @lock_require_pipelined
     def getset_nu8(self, funcode, datas, num_send, num_get):
         ret = self.send_modbus_request(funcode, datas, num_send)
         if ret == -1:
             return [XCONF.UxbusState.ERR_NOTTCP]
         return self.recv_modbus_response(funcode, ret, num_get, self._S_TOUT)
 
-    @lock_require
+    @lock_require_pipelined
     def get_nu8(self, funcode, num):
         ret = self.send_modbus_request(funcode, 0, 0)
         if ret == -1:
             return [XCONF.UxbusState.ERR_NOTTCP] * (num + 1)
         return self.recv_modbus_response(funcode, ret, num, self._G_TOUT)
 
-    @lock_require
+    @lock_require_pipelined
     def set_nu16(self, funcode, datas, num):
         hexdata = convert.u16s_to_bytes(datas, num)
         ret = self.send_modbus_request(funcode, hexdata, num * 2)
@@ -118,7 +191,7 @@ class UxbusCmd(object):
         ret = self.recv_modbus_response(funcode, ret, 0, self._S_TOUT)
         return ret
 
-    @lock_require
+    @lock_require_pipelined
     def get_nu16(self, funcode, num):
         ret = self.send_modbus_request(funcode, 0, 0)
         if ret == -1:
@@ -129,10 +202,12 @@ class UxbusCmd(object):
         data[1:num] = convert.bytes_to_u16s(ret[1:num * 2 + 1], num)
         return data
 
-    @lock_require
+    @lock_require_pipelined
     def set_nfp32(self, funcode, datas, num, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
         need_set_fb = feedback_type != 0 and (self._feedback_type & feedback_type) != feedback_type
         if feedback_key and need_set_fb:
+            # set feedback type => send => restore feedback type, keep the lock until the end
+            self._pipeline_local.release = False
             self._set_feedback_type_no_lock(self._feedback_type | feedback_type)
 
         trans_id = self._get_trans_id()
@@ -147,10 +222,12 @@ class UxbusCmd(object):
             self._set_feedback_type_no_lock(self._feedback_type)
         return ret
 
-    @lock_require
+    @lock_require_pipelined
     def set_nfp32_with_bytes(self, funcode, datas, num, additional_bytes, rx_len=0, timeout=None, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
         need_set_fb = feedback_type != 0 and (self._feedback_type & feedback_type) != feedback_type
         if feedback_key and need_set_fb:
+            # set feedback type => send => restore feedback type, keep the lock until the end
+            self._pipeline_local.release = False
             self._set_feedback_type_no_lock(self._feedback_type | feedback_type)
 
         trans_id = self._get_trans_id()
@@ -166,10 +243,12 @@ class UxbusCmd(object):
             self._set_feedback_type_no_lock(self._feedback_type)
         return ret
 
-    @lock_require
+    @lock_require_pipelined
     def set_nint32(self, funcode, datas, num, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
         need_set_fb = feedback_type != 0 and (self._feedback_type & feedback_type) != feedback_type
         if feedback_key and need_set_fb:
+            # set feedback type => send => restore feedback type, keep the lock until the end
+            self._pipeline_local.release = False
             self._set_feedback_type_no_lock(self._feedback_type | feedback_type)
 
         trans_id = self._get_trans_id()
@@ -184,7 +263,7 @@ class UxbusCmd(object):
             self._set_feedback_type_no_lock(self._feedback_type)
         return ret
 
-    @lock_require
+    @lock_require_pipelined
     def get_nfp32(self, funcode, num, timeout=None):
         ret = self.send_modbus_request(funcode, 0, 0)
         if ret == -1:
@@ -195,7 +274,7 @@ class UxbusCmd(object):
         data[1:num+1] = convert.bytes_to_fp32s(ret[1:num * 4 + 1], num)
         return data
 
-    @lock_require
+    @lock_require_pipelined
     def get_nfp32_with_datas(self, funcode, datas, num_send, num_get, timeout=None):
         ret = self.send_modbus_request(funcode, datas, num_send)
         if ret == -1:
@@ -206,7 +285,7 @@ class UxbusCmd(object):
         data[1:num_get + 1] = convert.bytes_to_fp32s(ret[1:num_get * 4 + 1], num_get)
         return data
 
-    @lock_require
+    @lock_require_pipelined
     def swop_nfp32(self, funcode, datas, txn, rxn):
         hexdata = convert.fp32s_to_bytes(datas, txn)
         ret = self.send_modbus_request(funcode, hexdata, txn * 4)
@@ -218,7 +297,7 @@ class UxbusCmd(object):
         data[1:rxn+1] = convert.bytes_to_fp32s(ret[1:rxn * 4 + 1], rxn)
         return data
 
-    @lock_require
+    @lock_require_pipelined
     def is_nfp32(self, funcode, datas, txn):
         hexdata = convert.fp32s_to_bytes(datas, txn)
         ret = self.send_modbus_request(funcode, hexdata, txn * 4)
@@ -226,6 +305,23 @@ class UxbusCmd(object):
             return [XCONF.UxbusState.ERR_NOTTCP] * 2
         return self.recv_modbus_response(funcode, ret, 1, self._G_TOUT)
 
+    @lock_require
+    def is_nfp32_burst(self, funcode, datas_list, txn):
+        """
+        is_nfp32 of all the datas in one hold of the lock (kept even in the pipelined mode),
+        up to MAX_BURST requests are sent before their responses are received
+        """
+        rets = []
+        for i in range(0, len(datas_list), self.MAX_BURST):
+            trans_ids = [self.send_modbus_request(funcode, convert.fp32s_to_bytes(datas, txn), txn * 4)
+                         for datas in datas_list[i:i + self.MAX_BURST]]
+            for trans_id in trans_ids:
+                if trans_id == -1:
+                    rets.append([XCONF.UxbusState.ERR_NOTTCP] * 2)
+                else:
+                    rets.append(self.recv_modbus_response(funcode, trans_id, 1, self._G_TOUT))
+        return rets
+
     def get_version(self):
         return self.get_nu8(XCONF.UxbusReg.GET_VERSION, 40)
 
@@ -637,6 +733,12 @@ class UxbusCmd(object):
     def is_tcp_limit(self, pose):
         return self.is_nfp32(XCONF.UxbusReg.IS_TCP_LIMIT, pose, 6)
 
+    def is_joint_limits(self, joints):
+        return self.is_nfp32_burst(XCONF.UxbusReg.IS_JOINT_LIMIT, joints, 7)
+
+    def is_tcp_limits(self, poses):
+        return self.is_nfp32_burst(XCONF.UxbusReg.IS_TCP_LIMIT, poses, 6)
+
     @lock_require
     def gripper_addr_w16(self, addr, value):
         return self.tgpio_addr_w16(addr, value, bid=XCONF.GRIPPER_ID)
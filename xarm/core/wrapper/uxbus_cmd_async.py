@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import asyncio
+from ..utils import convert
+from ..config.x_config import XCONF
+from .uxbus_cmd_tcp import ModbusTcpProtocol, PRIVATE_MODBUS_TCP_PROTOCOL, TRANSACTION_ID_MAX, debug_log_datas
+
+
+class AsyncUxbusCmdTcp(ModbusTcpProtocol):
+    """
+    Awaitable uxbus primitives over an AsyncSocketPort (xarm.core.comm.async_port)
+    The requests are not serialized, every request waits for the response with its own transaction id,
+    so several arms and requests can be driven by one event loop.
+
+    Usage:
+        port = await open_socket_port('192.168.1.185')
+        arm_cmd = AsyncUxbusCmdTcp(port)
+        code, state = await arm_cmd.get_state()
+    """
+    def __init__(self, arm_port, set_feedback_key_tranid=None):
+        self.arm_port = arm_port
+        self._has_err_warn = False
+        self._state_is_ready = False
+        self._debug = False
+        self._G_TOUT = XCONF.UxbusConf.GET_TIMEOUT / 1000
+        self._S_TOUT = XCONF.UxbusConf.SET_TIMEOUT / 1000
+        self._last_comm_time = time.monotonic()
+        self._transaction_id = 1
+        self._protocol_identifier = PRIVATE_MODBUS_TCP_PROTOCOL
+        self._feedback_type = 0
+        self._feedback_lock = None
+        self._set_feedback_key_tranid = set_feedback_key_tranid
+
+    @property
+    def last_comm_time(self):
+        return self._last_comm_time
+
+    @property
+    def state_is_ready(self):
+        return self._state_is_ready
+
+    @property
+    def has_err_warn(self):
+        return self._has_err_warn
+
+    def set_debug(self, debug):
+        self._debug = debug
+
+    def set_timeout(self, timeout):
+        if isinstance(timeout, (tuple, list)) and len(timeout) >= 2:
+            self._S_TOUT = timeout[0] if timeout[0] > 0 else self._S_TOUT
+            self._G_TOUT = timeout[1] if timeout[1] > 0 else self._G_TOUT
+        elif isinstance(timeout, (int, float)) and timeout > 0:
+            self._S_TOUT = self._G_TOUT = timeout
+        return [self._S_TOUT, self._G_TOUT] if self._S_TOUT != self._G_TOUT else self._S_TOUT
+
+    def set_protocol_identifier(self, protocol_identifier):
+        self._protocol_identifier = protocol_identifier
+        return 0
+
+    def get_protocol_identifier(self):
+        return self._protocol_identifier
+
+    def send_modbus_request(self, unit_id, pdu_data, pdu_len, prot_id=-1, t_id=None):
+        """
+        :return: (trans_id, future of the response), trans_id is -1 if failed
+        """
+        trans_id = self._transaction_id if t_id is None else t_id
+        prot_id = self._protocol_identifier if prot_id < 0 else prot_id
+        send_data = self.pack_modbus_request(trans_id, prot_id, unit_id, pdu_data, pdu_len)
+        fut = self.arm_port.add_waiter(trans_id)
+        if self._debug:
+            debug_log_datas(send_data, label='send({})'.format(unit_id))
+        if self.arm_port.write(send_data) != 0:
+            self.arm_port.remove_waiter(trans_id)
+            return -1, None
+        if t_id is None:
+            self._transaction_id = self._transaction_id % TRANSACTION_ID_MAX + 1
+        return trans_id, fut
+
+    async def recv_modbus_response(self, t_unit_id, t_trans_id, fut, num, timeout, t_prot_id=-1, ret_raw=False):
+        prot_id = self._protocol_identifier if t_prot_id < 0 else t_prot_id
+        ret = [0] * 320 if num == -1 else [0] * (num + 1)
+        ret[0] = XCONF.UxbusState.ERR_TOUT
+        try:
+            rx_data = await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            self.arm_port.remove_waiter(t_trans_id)
+            return ret
+        if rx_data == -1:
+            ret[0] = XCONF.UxbusState.ERR_NOTTCP
+            return ret
+        self._last_comm_time = time.monotonic()
+        if self._debug:
+            debug_log_datas(rx_data, label='recv({})'.format(t_unit_id))
+        code = self.check_protocol_header(rx_data, t_trans_id, prot_id, t_unit_id)
+        if code != 0:
+            ret[0] = code
+            return ret
+        return self._parse_modbus_response(rx_data, prot_id, ret, ret_raw)
+
+    async def _request(self, funcode, datas, num_send, num_get, timeout):
+        trans_id, fut = self.send_modbus_request(funcode, datas, num_send)
+        if trans_id == -1:
+            return [XCONF.UxbusState.ERR_NOTTCP] * (num_get + 1)
+        return await self.recv_modbus_response(funcode, trans_id, fut, num_get, timeout)
+
+    async def _set_feedback_type(self, feedback_type):
+        return await self._request(XCONF.UxbusReg.SET_FEEDBACK_TYPE, [feedback_type], 1, 0, self._S_TOUT)
+
+    async def _request_with_feedback(self, funcode, hexdata, num_send, num_get, timeout, feedback_key, feedback_type):
+        if not feedback_key:
+            return await self._request(funcode, hexdata, num_send, num_get, timeout)
+        if self._feedback_lock is None:
+            self._feedback_lock = asyncio.Lock()
+        # the feedback type is a setting of the connection, keep it unchanged until the request is sent
+        async with self._feedback_lock:
+            need_set_fb = feedback_type != 0 and (self._feedback_type & feedback_type) != feedback_type
+            if need_set_fb:
+                await self._set_feedback_type(self._feedback_type | feedback_type)
+            trans_id = self._transaction_id
+            if self._set_feedback_key_tranid:
+                self._set_feedback_key_tranid(feedback_key, trans_id, self._feedback_type)
+            trans_id, fut = self.send_modbus_request(funcode, hexdata, num_send)
+            if trans_id == -1:
+                return [XCONF.UxbusState.ERR_NOTTCP]
+            ret = await self.recv_modbus_response(funcode, trans_id, fut, num_get, timeout)
+            if need_set_fb:
+                await self._set_feedback_type(self._feedback_type)
+        return ret
+
+    async def set_nu8(self, funcode, datas, num, timeout=None, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
+        return await self._request_with_feedback(funcode, datas, num, 0, self._S_TOUT if timeout is None else timeout,
+                                                 feedback_key, feedback_type)
+
+    async def getset_nu8(self, funcode, datas, num_send, num_get):
+        return await self._request(funcode, datas, num_send, num_get, self._S_TOUT)
+
+    async def get_nu8(self, funcode, num):
+        return await self._request(funcode, 0, 0, num, self._G_TOUT)
+
+    async def set_nu16(self, funcode, datas, num):
+        return await self._request(funcode, convert.u16s_to_bytes(datas, num), num * 2, 0, self._S_TOUT)
+
+    async def get_nu16(self, funcode, num):
+        ret = await self._request(funcode, 0, 0, num * 2, self._G_TOUT)
+        return [ret[0]] + convert.bytes_to_u16s(ret[1:num * 2 + 1], num)
+
+    async def set_nfp32(self, funcode, datas, num, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
+        return await self._request_with_feedback(funcode, convert.fp32s_to_bytes(datas, num), num * 4, 0, self._S_TOUT,
+                                                 feedback_key, feedback_type)
+
+    async def set_nfp32_with_bytes(self, funcode, datas, num, additional_bytes, rx_len=0, timeout=None, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
+        hexdata = convert.fp32s_to_bytes(datas, num) + additional_bytes
+        return await self._request_with_feedback(funcode, hexdata, num * 4 + len(additional_bytes), rx_len,
+                                                 self._S_TOUT if timeout is None else timeout, feedback_key, feedback_type)
+
+    async def set_nint32(self, funcode, datas, num, feedback_key=None, feedback_type=XCONF.FeedbackType.MOTION_FINISH):
+        return await self._request_with_feedback(funcode, convert.int32s_to_bytes(datas, num), num * 4, 0, self._S_TOUT,
+                                                 feedback_key, feedback_type)
+
+    async def get_nfp32(self, funcode, num, timeout=None):
+        ret = await self._request(funcode, 0, 0, num * 4, timeout if timeout is not None else self._G_TOUT)
+        return [ret[0]] + convert.bytes_to_fp32s(ret[1:num * 4 + 1], num)
+
+    async def get_nfp32_with_datas(self, funcode, datas, num_send, num_get, timeout=None):
+        ret = await self._request(funcode, datas, num_send, num_get * 4, timeout if timeout is not None else self._G_TOUT)
+        return [ret[0]] + convert.bytes_to_fp32s(ret[1:num_get * 4 + 1], num_get)
+
+    async def swop_nfp32(self, funcode, datas, txn, rxn):
+        ret = await self._request(funcode, convert.fp32s_to_bytes(datas, txn), txn * 4, rxn * 4, self._G_TOUT)
+        return [ret[0]] + convert.bytes_to_fp32s(ret[1:rxn * 4 + 1], rxn)
+
+    async def is_nfp32(self, funcode, datas, txn):
+        return await self._request(funcode, convert.fp32s_to_bytes(datas, txn), txn * 4, 1, self._G_TOUT)
+
+    ####################### common registers ########################
+    async def get_version(self):
+        return await self.get_nu8(XCONF.UxbusReg.GET_VERSION, 40)
+
+    async def get_state(self):
+        return await self.get_nu8(XCONF.UxbusReg.GET_STATE, 1)
+
+    async def set_state(self, value):
+        return await self.set_nu8(XCONF.UxbusReg.SET_STATE, [value], 1)
+
+    async def set_mode(self, mode):
+        return await self.set_nu8(XCONF.UxbusReg.SET_MODE, [mode], 1)
+
+    async def motion_en(self, axis_id, enable):
+        return await self.set_nu8(XCONF.UxbusReg.MOTION_EN, [axis_id, int(enable)], 2,
+                                  timeout=self._S_TOUT if self._S_TOUT >= 5 else 5)
+
+    async def get_cmdnum(self):
+        return await self.get_nu16(XCONF.UxbusReg.GET_CMDNUM, 1)
+
+    async def get_err_code(self):
+        return await self.get_nu8(XCONF.UxbusReg.GET_ERROR, 2)
+
+    async def clean_err(self):
+        return await self.set_nu8(XCONF.UxbusReg.CLEAN_ERR, 0, 0)
+
+    async def clean_war(self):
+        return await self.set_nu8(XCONF.UxbusReg.CLEAN_WAR, 0, 0)
+
+    async def get_tcp_pose(self):
+        return await self.get_nfp32(XCONF.UxbusReg.GET_TCP_POSE, 6)
+
+    async def get_joint_pos(self):
+        return await self.get_nfp32(XCONF.UxbusReg.GET_JOINT_POS, 7)
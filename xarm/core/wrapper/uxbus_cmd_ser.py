@@ -30,6 +30,7 @@ class UxbusCmdSer(UxbusCmd):
         self.toid = toid
         arm_port.flush(fromid, toid)
         self._has_err_warn = False
+        self._tx_buf = bytearray(4 + 255 + 2)
 
     @property
     def has_err_warn(self):
@@ -62,15 +63,35 @@ class UxbusCmdSer(UxbusCmd):
             self._has_err_warn = False
             return 0
     
+    def _build_frame(self, reg, txdata, num):
+        """
+        Write header, payload and crc into the preallocated send buffer
+        :return: memoryview of the frame
+        """
+        size = num + 6
+        if len(self._tx_buf) < size:
+            self._tx_buf = bytearray(size)
+        buf = memoryview(self._tx_buf)
+        buf[0] = self.fromid
+        buf[1] = self.toid
+        buf[2] = num + 1
+        buf[3] = reg
+        if num > 0:
+            buf[4:num + 4] = txdata[:num] if isinstance(txdata, (bytes, bytearray)) else bytes(txdata[:num])
+        crc = crc16.crc16_update(crc16.CRC16_INIT, buf[:num + 4])
+        buf[num + 4] = crc & 0xFF
+        buf[num + 5] = crc >> 8
+        return buf[:size]
+
     def send_modbus_request(self, reg, txdata, num, prot_id=-1, t_id=None):
-        send_data = bytes([self.fromid, self.toid, num + 1, reg])
-        for i in range(num):
-            send_data += bytes([txdata[i]])
-        send_data += crc16.crc_modbus(send_data)
+        send_data = self._build_frame(reg, txdata, num)
         self.arm_port.flush()
         if self._debug:
             debug_log_datas(send_data, label='send')
-        return self.arm_port.write(send_data)
+        ret = self.arm_port.write(send_data)
+        if ret == 0 and self._timing is not None:
+            self._timing_mark_sent()
+        return ret
     
     def recv_modbus_response(self, t_funcode, t_trans_id, num, timeout, t_prot_id=-1, ret_raw=False):
         ret = [0] * 254 if num == -1 else [0] * (num + 1)
@@ -79,9 +100,13 @@ class UxbusCmdSer(UxbusCmd):
         while time.monotonic() < expired:
             remaining = expired - time.monotonic()
             rx_data = self.arm_port.read(remaining)
+            if rx_data == -1 and not self.arm_port.connected:
+                break
             if rx_data != -1 and len(rx_data) > 5:
                 if self._debug:
                     debug_log_datas(rx_data, label='recv')
+                if self._timing is not None:
+                    self._timing_mark_received(self.arm_port.rx_time)
                 ret[0] = self.check_private_protocol(rx_data)
                 num = rx_data[2] if num == -1 else num
                 length = len(rx_data) - 4
@@ -90,5 +115,4 @@ class UxbusCmdSer(UxbusCmd):
                         break
                     ret[i + 1] = rx_data[i + 4]
                 return ret
-            time.sleep(0.001)
         return ret
@@ -13,6 +13,7 @@ import struct
 from ..utils import convert
 from .uxbus_cmd import UxbusCmd, lock_require
 from ..config.x_config import XCONF
+from ..comm.base import TransIdRxParse
 
 STANDARD_MODBUS_TCP_PROTOCOL = 0x00
 PRIVATE_MODBUS_TCP_PROTOCOL = 0x02
@@ -28,35 +29,16 @@ def debug_log_datas(datas, label=''):
     print()
 
 
-class UxbusCmdTcp(UxbusCmd):
-    def __init__(self, arm_port, set_feedback_key_tranid=None):
-        super(UxbusCmdTcp, self).__init__(set_feedback_key_tranid=set_feedback_key_tranid)
-        self.arm_port = arm_port
-        self._has_err_warn = False
-        self._last_comm_time = time.monotonic()
-        self._transaction_id = 1
-        self._protocol_identifier = PRIVATE_MODBUS_TCP_PROTOCOL
-
-    @property
-    def has_err_warn(self):
-        return self._has_err_warn
-
-    @has_err_warn.setter
-    def has_err_warn(self, value):
-        self._has_err_warn = value
-
-    @lock_require
-    def set_protocol_identifier(self, protocol_identifier):
-        if self._protocol_identifier != protocol_identifier:
-            self._protocol_identifier = protocol_identifier
-            print('change protocol identifier to {}'.format(self._protocol_identifier))
-        return 0
-    
-    def get_protocol_identifier(self):
-        return self._protocol_identifier
-    
-    def _get_trans_id(self):
-        return self._transaction_id
+class ModbusTcpProtocol(object):
+    """
+    Framing and checking of the (private) modbus tcp protocol, shared by the blocking and the asyncio implementation
+    """
+    @staticmethod
+    def pack_modbus_request(trans_id, prot_id, unit_id, pdu_data, pdu_len):
+        send_data = struct.pack('>HHHB', trans_id, prot_id, pdu_len + 1, unit_id)
+        if pdu_len > 0:
+            send_data += pdu_data[:pdu_len] if isinstance(pdu_data, bytes) else bytes(pdu_data[:pdu_len])
+        return send_data
 
     def check_protocol_header(self, data, t_trans_id, t_prot_id, t_unit_id):
         trans_id = convert.bytes_to_u16(data[0:2])
@@ -87,21 +69,93 @@ class UxbusCmdTcp(UxbusCmd):
         self._has_err_warn = False
         return 0
     
+    def _parse_modbus_response(self, rx_data, prot_id, ret, ret_raw=False):
+        if prot_id != STANDARD_MODBUS_TCP_PROTOCOL and not ret_raw:
+            # Private Modbus TCP Protocol
+            ret[0] = self.check_private_protocol(rx_data)
+            num = convert.bytes_to_u16(rx_data[4:6]) - 2
+            ret = ret[:num + 1] if len(ret) >= num + 1 else [ret[0]] * (num + 1)
+            length = len(rx_data) - 8
+            for i in range(num):
+                if i >= length:
+                    break
+                ret[i + 1] = rx_data[i + 8]
+        else:
+            # Standard Modbus TCP Protocol
+            num = convert.bytes_to_u16(rx_data[4:6]) + 6
+            ret = ret[:num + 1] if len(ret) >= num + 1 else [ret[0]] * (num + 1)
+            length = len(rx_data)
+            for i in range(num):
+                if i >= length:
+                    break
+                ret[i + 1] = rx_data[i]
+        return ret
+
+
+class UxbusCmdTcp(UxbusCmd, ModbusTcpProtocol):
+    MAX_BURST = 16
+
+    def __init__(self, arm_port, set_feedback_key_tranid=None, pipelined=False):
+        super(UxbusCmdTcp, self).__init__(set_feedback_key_tranid=set_feedback_key_tranid)
+        self.arm_port = arm_port
+        self._has_err_warn = False
+        self._last_comm_time = time.monotonic()
+        self._transaction_id = 1
+        self._protocol_identifier = PRIVATE_MODBUS_TCP_PROTOCOL
+        self._pipelined = bool(pipelined)
+        # every response is delivered by the receiving thread to the waiter of its transaction id
+        self._rx_dispatch = TransIdRxParse(arm_port.rx_que, arm_port.fb_que)
+        arm_port.rx_parse = self._rx_dispatch
+
+    @property
+    def pipelined(self):
+        return self._pipelined
+
+    def set_pipelined(self, pipelined):
+        """
+        Pipelined mode: the lock is only held while a request is being sent,
+        the responses are matched back to the waiting requests by the transaction id,
+        so several requests can be in flight at the same time
+        """
+        with self.lock:
+            self._pipelined = bool(pipelined)
+        return 0
+
+    @property
+    def has_err_warn(self):
+        return self._has_err_warn
+
+    @has_err_warn.setter
+    def has_err_warn(self, value):
+        self._has_err_warn = value
+
+    @lock_require
+    def set_protocol_identifier(self, protocol_identifier):
+        if self._protocol_identifier != protocol_identifier:
+            self._protocol_identifier = protocol_identifier
+            print('change protocol identifier to {}'.format(self._protocol_identifier))
+        return 0
+    
+    def get_protocol_identifier(self):
+        return self._protocol_identifier
+    
+    def _get_trans_id(self):
+        return self._transaction_id
+
     def send_modbus_request(self, unit_id, pdu_data, pdu_len, prot_id=-1, t_id=None):
         trans_id = self._transaction_id if t_id is None else t_id
         prot_id = self._protocol_identifier if prot_id < 0 else prot_id
-        send_data = convert.u16_to_bytes(trans_id)
-        send_data += convert.u16_to_bytes(prot_id)
-        send_data += convert.u16_to_bytes(pdu_len + 1)
-        send_data += bytes([unit_id])
-        for i in range(pdu_len):
-            send_data += bytes([pdu_data[i]])
-        self.arm_port.flush()
+        send_data = self.pack_modbus_request(trans_id, prot_id, unit_id, pdu_data, pdu_len)
+        # register before writing, the response may arrive before write returns
+        self._rx_dispatch.add_waiter(trans_id)
         if self._debug:
             debug_log_datas(send_data, label='send({})'.format(unit_id))
         ret = self.arm_port.write(send_data)
         if ret != 0:
+            self._rx_dispatch.remove_waiter(trans_id)
             return -1
+        if self._timing is not None:
+            self._timing_mark_sent()
         if t_id is None:
             self._transaction_id = self._transaction_id % TRANSACTION_ID_MAX + 1
         return trans_id
@@ -110,44 +164,32 @@ class UxbusCmdTcp(UxbusCmd):
         prot_id = self._protocol_identifier if t_prot_id < 0 else t_prot_id
         ret = [0] * 320 if num == -1 else [0] * (num + 1)
         ret[0] = XCONF.UxbusState.ERR_TOUT
-        expired = time.monotonic() + timeout
-        while time.monotonic() < expired:
-            remaining = expired - time.monotonic()
-            rx_data = self.arm_port.read(remaining)
-            if rx_data == -1:
-                time.sleep(0.001)
-                continue
-            self._last_comm_time = time.monotonic()
-            if self._debug:
-                debug_log_datas(rx_data, label='recv({})'.format(t_unit_id))
-            code = self.check_protocol_header(rx_data, t_trans_id, prot_id, t_unit_id)
-            if code != 0:
-                if code != XCONF.UxbusState.ERR_NUM:
-                    ret[0] = code
-                    return ret
-                else:
-                    continue
-            if prot_id != STANDARD_MODBUS_TCP_PROTOCOL and not ret_raw:
-                # Private Modbus TCP Protocol
-                ret[0] = self.check_private_protocol(rx_data)
-                num = convert.bytes_to_u16(rx_data[4:6]) - 2
-                ret = ret[:num + 1] if len(ret) >= num + 1 else [ret[0]] * (num + 1)
-                length = len(rx_data) - 8
-                for i in range(num):
-                    if i >= length:
-                        break
-                    ret[i + 1] = rx_data[i + 8]       
-            else:
-                # Standard Modbus TCP Protocol
-                num = convert.bytes_to_u16(rx_data[4:6]) + 6
-                ret = ret[:num + 1] if len(ret) >= num + 1 else [ret[0]] * (num + 1)
-                length = len(rx_data)
-                for i in range(num):
-                    if i >= length:
-                        break
-                    ret[i + 1] = rx_data[i]
+        waiter = self._rx_dispatch.get_waiter(t_trans_id)
+        if waiter is None:
             return ret
-        return ret
+        if self._pipelined and getattr(self._pipeline_local, 'release', False):
+            # the caller holds the lock (lock_require_pipelined), release it while waiting so that
+            # other requests can be sent before this response arrives
+            self.lock.release()
+            try:
+                rx_data = waiter.wait(timeout)
+            finally:
+                self.lock.acquire()
+        else:
+            rx_data = waiter.wait(timeout)
+        self._rx_dispatch.remove_waiter(t_trans_id)
+        if rx_data == -1:
+            return ret
+        self._last_comm_time = time.monotonic()
+        if self._debug:
+            debug_log_datas(rx_data, label='recv({})'.format(t_unit_id))
+        code = self.check_protocol_header(rx_data, t_trans_id, prot_id, t_unit_id)
+        if code != 0:
+            ret[0] = code
+            return ret
+        if self._timing is not None and waiter.rx_time is not None:
+            self._timing_mark_received(waiter.rx_time)
+        return self._parse_modbus_response(rx_data, prot_id, ret, ret_raw)
 
     # def send_hex_request(self, send_data):
     #     trans_id = int('0x' + str(send_data[0]) + str(send_data[1]), 16)
@@ -6,6 +6,13 @@
 #
 # Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
 
+import time
+import queue
+import threading
+import collections
+from ..core.utils.log import logger
+from ..core.utils.stats import Histogram
+
 
 class ThreadManage(object):
     def __init__(self):
@@ -28,3 +35,171 @@ class ThreadManage(object):
 
     def count(self):
         return len(self.threads)
+
+
+class KeyedWorkerPool(object):
+    """
+    Fixed number of worker threads, the tasks with the same key always run in the same thread,
+    so they are executed in order while different keys run in parallel
+    """
+    def __init__(self, thread_count=2, que_max=1024, name='worker'):
+        self._ques = [queue.Queue(que_max) for _ in range(max(1, thread_count))]
+        self._key_map = {}
+        self._lock = threading.Lock()
+        self._dropped = 0
+        self._threads = []
+        for i, que in enumerate(self._ques):
+            t = threading.Thread(target=self._worker, args=(que,), name='{}-{}'.format(name, i), daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    @property
+    def thread_count(self):
+        return len(self._threads)
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    def _get_que(self, key):
+        index = self._key_map.get(key, None)
+        if index is None:
+            with self._lock:
+                index = self._key_map.setdefault(key, len(self._key_map) % len(self._ques))
+        return self._ques[index]
+
+    def submit(self, key, func, *args):
+        """
+        :return: True if the task is queued, False if it is dropped because the queue is full
+        """
+        que = self._get_que(key)
+        try:
+            que.put_nowait((func, args))
+            return True
+        except queue.Full:
+            self._dropped += 1
+            return False
+
+    def release(self, key):
+        with self._lock:
+            self._key_map.pop(key, None)
+
+    @staticmethod
+    def _worker(que):
+        while True:
+            task = que.get()
+            if task is None:
+                break
+            func, args = task
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error('worker task exception: {}'.format(e))
+
+    def close(self, timeout=None):
+        for que in self._ques:
+            que.put(None)
+        for t in self._threads:
+            t.join(timeout=timeout)
+
+
+class CallbackDispatcher(object):
+    """
+    Run the callbacks in one executor thread, in the order they are dispatched
+    The callbacks dispatched with a coalescing key keep only the latest payload while they are waiting,
+    so a slow consumer receives the latest data instead of a growing backlog
+    Stats of every callback (milliseconds):
+        latency: from the first dispatch of the pending call to the callback starting
+        run: time of the callback
+    """
+    def __init__(self, name='callback-dispatcher'):
+        self._cond = threading.Condition()
+        self._que = collections.deque()
+        self._pending = {}
+        self._stats = {}
+        self._alive = True
+        self._thread = threading.Thread(target=self._worker, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def alive(self):
+        return self._alive
+
+    def dispatch(self, callback, payload, key=None):
+        """
+        :param callback: callback(payload)
+        :param key: coalescing key, None means every payload is delivered
+        """
+        with self._cond:
+            if not self._alive:
+                return
+            if key is not None:
+                entry = self._pending.get(key, None)
+                if entry is not None:
+                    entry[1] = payload
+                    self._get_stats(callback)['coalesced'] += 1
+                    return
+            entry = [callback, payload, time.monotonic(), key]
+            if key is not None:
+                self._pending[key] = entry
+            self._que.append(entry)
+            self._cond.notify()
+
+    def _get_stats(self, callback):
+        item = self._stats.get(callback, None)
+        if item is None:
+            item = {'calls': 0, 'coalesced': 0, 'errors': 0, 'latency': Histogram(), 'run': Histogram()}
+            self._stats[callback] = item
+        return item
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._alive and not self._que:
+                    self._cond.wait()
+                if not self._que:
+                    break
+                callback, payload, dispatch_time, key = self._que.popleft()
+                if key is not None:
+                    self._pending.pop(key, None)
+            start_time = time.monotonic()
+            error = False
+            try:
+                callback(payload)
+            except Exception as e:
+                error = True
+                logger.error('callback exception: {}'.format(e))
+            end_time = time.monotonic()
+            with self._cond:
+                item = self._get_stats(callback)
+                item['calls'] += 1
+                item['errors'] += error
+                item['latency'].record((start_time - dispatch_time) * 1000)
+                item['run'].record((end_time - start_time) * 1000)
+
+    def get_stats(self):
+        """
+        :return: {callback_name: {'calls', 'coalesced', 'errors', 'latency', 'run'}}, 'pending': number of waiting calls
+        """
+        with self._cond:
+            stats = {'pending': len(self._que)}
+            for callback, item in self._stats.items():
+                name = getattr(callback, '__qualname__', None) or getattr(callback, '__name__', None) or repr(callback)
+                if name in stats:
+                    name = '{}@{:x}'.format(name, id(callback))
+                stats[name] = {k: (v.to_dict() if isinstance(v, Histogram) else v) for k, v in item.items()}
+            return stats
+
+    def reset_stats(self):
+        with self._cond:
+            self._stats = {}
+
+    def close(self, timeout=None):
+        """
+        Stop after the waiting calls are finished
+        """
+        with self._cond:
+            self._alive = False
+            self._cond.notify()
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout=timeout)
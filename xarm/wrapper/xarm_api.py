@@ -79,6 +79,28 @@ class XArmAPI(object):
                 Note: only available in the param `check_cmdnum_limit` is True
             check_is_ready: check if the arm is ready to move or not, default is True
                 Note: only available if firmware_version < 1.5.20
+            pipelined: allow several commands to be in flight at the same time on the control socket, default is False
+                Note: only available in socket way, the responses are matched to the requests by the transaction id,
+                    so commands called from different threads no longer wait for each other's round-trip
+            report_queue_policy: policy of the report queue, 'latest'/'all'/'block', default is 'latest'
+                Note: see set_report_queue_policy
+            report_queue_size: max frames in the report queue, default is 2
+            enable_report_stats: collect the jitter and latency statistics of the report stream or not, default is False
+                Note: see get_report_stats
+            max_callback_thread_count: how to run the callbacks, default is 0
+                0: run in the report thread
+                < 0: run in an asyncio loop thread
+                > 0: run in one callback dispatcher thread, the report frames are coalesced if a callback falls behind
+            report_max_age: max age (seconds) of the report frame used by get_position/get_servo_angle/get_state/get_err_warn_code
+                instead of the command channel, default is 0 (disable)
+                Note: see set_report_max_age
+            report_history_size: keep the last report records in a ring (requires numpy), default is 0 (disable)
+                Note: see report_history
+            report_type: type (port) of the report, 'normal'/'rich'/'real'/'auto', default is 'rich'
+                Note: 'auto' selects the cheapest type by the report subscriptions, see subscribe_report
+            enable_cmd_timing: collect the timing of the commands or not, default is False
+                Note: see get_cmd_timing
+            reactor/report_decoder/callback_pool: shared threads of XArmManager, set by XArmManager.add_arm
         """
         self._arm = XArm(port=port,
                          is_radian=is_radian,
@@ -810,10 +832,16 @@ class XArmAPI(object):
                         speed = speed / max_tcp_speed * max_joint_speed
                         mvacc = mvacc / max_tcp_acc * max_joint_acc
                     4. if there is no suitable IK, a C40 error will be triggered
+            :param future: return a MoveFuture instead of the code and do not wait, default is False
+                the future is resolved with the code when the motion is finished, see the Note of MoveFuture
+                ex: future = arm.set_position(..., future=True)
+                    ...  # do something else while moving
+                    code = future.result()  # or `code = await future` in the coroutine
         :return: code
             code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
                 code < 0: the last_used_position/last_used_tcp_speed/last_used_tcp_acc will not be modified
                 code >= 0: the last_used_position/last_used_tcp_speed/last_used_tcp_acc will be modified
+            MoveFuture if future is True
         """
         return self._arm.set_position(x=x, y=y, z=z, roll=roll, pitch=pitch, yaw=yaw, radius=radius,
                                       speed=speed, mvacc=mvacc, mvtime=mvtime, relative=relative,
@@ -925,10 +953,16 @@ class XArmAPI(object):
                 ex: code = arm.set_servo_angle(..., radius=0)
                 Note: Need to set radius>=0
         :param kwargs: reserved
+            :param future: return a MoveFuture instead of the code and do not wait, default is False
+                the future is resolved with the code when the motion is finished, see the Note of MoveFuture
+                ex: future = arm.set_servo_angle(..., future=True)
+                    ...  # do something else while moving
+                    code = future.result()  # or `code = await future` in the coroutine
         :return: code
             code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
                 code < 0: the last_used_angles/last_used_joint_speed/last_used_joint_acc will not be modified
                 code >= 0: the last_used_angles/last_used_joint_speed/last_used_joint_acc will be modified
+            MoveFuture if future is True
         """
         return self._arm.set_servo_angle(servo_id=servo_id, angle=angle, speed=speed, mvacc=mvacc, mvtime=mvtime,
                                          relative=relative, is_radian=is_radian, wait=wait, timeout=timeout, radius=radius, **kwargs)
@@ -986,10 +1020,16 @@ class XArmAPI(object):
         :param is_tool_coord: is tool coord or not, default is False, only available if firmware_version >= 1.11.100
         :param is_axis_angle: is axis angle or not, default is False, only available if firmware_version >= 1.11.100
         :param kwargs: reserved
+            :param future: return a MoveFuture instead of the code and do not wait, default is False
+                the future is resolved with the code when the motion is finished, see the Note of MoveFuture
+                ex: future = arm.move_circle(..., future=True)
+                    ...  # do something else while moving
+                    code = future.result()  # or `code = await future` in the coroutine
         :return: code
             code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
                 code < 0: the last_used_tcp_speed/last_used_tcp_acc will not be modified
                 code >= 0: the last_used_tcp_speed/last_used_tcp_acc will be modified
+            MoveFuture if future is True
         """
         return self._arm.move_circle(pose1, pose2, percent, speed=speed, mvacc=mvacc, mvtime=mvtime,
                                      is_radian=is_radian, wait=wait, timeout=timeout,
@@ -1046,6 +1086,31 @@ class XArmAPI(object):
                                         repeat_pause_time=repeat_pause_time, automatic_calibration=automatic_calibration,
                                         speed=speed, mvacc=mvacc, mvtime=mvtime, wait=wait)
 
+    def move_batch(self, segments, is_radian=None, wait=False, timeout=None):
+        """
+        Queue a whole list of linear/joint/circle segments as one batch
+        Note:
+            1. the segments are sent without waiting, the command buffer of the controller is kept filled by
+                the cmdnum of the report (max_cmdnum, see check_cmdnum_limit), so a long blended path (radius > 0)
+                is streamed at the speed of the controller
+            2. the sending runs in a background thread (one per arm, the batches run in order), wait only waits for it
+            3. the sending stops early if a segment fails, the arm has error or is stopped,
+                future.cancel() also stops the sending (the segments already sent are not stopped)
+
+        :param segments: list of dict, the other keys (speed/mvacc/mvtime/radius/relative/...) are passed to the api
+            1. linear (set_position): {'type': 'line', 'pose': [x, y, z, roll, pitch, yaw], 'speed': 100, 'radius': 5}
+            2. joint (set_servo_angle): {'type': 'joint', 'angles': [j1, j2, ...], 'speed': 0.5, 'radius': 5}
+            3. arc (move_circle): {'type': 'circle', 'pose1': [...], 'pose2': [...], 'percent': 50, 'speed': 100}
+        :param is_radian: the roll/pitch/yaw/angles of the segments are in radians or not, default is self.default_is_radian
+            Note: a segment can override it by its own `is_radian` key
+        :param wait: whether to wait for the batch to complete, default is False
+        :param timeout: maximum time of the whole batch, sending and moving (unit: second), default is None (no timeout)
+            Note: the segments not sent in time are dropped and the result is APIState.WAIT_FINISH_TIMEOUT
+        :return: code if wait is True, else a MoveFuture of the whole batch (resolved when the last segment is finished)
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.move_batch(segments, is_radian=is_radian, wait=wait, timeout=timeout)
+
     def set_servo_attach(self, servo_id=None):
         """
         Attach the servo
@@ -1747,6 +1812,29 @@ class XArmAPI(object):
         """
         return self._arm.get_forward_kinematics(angles, input_is_radian=input_is_radian, return_is_radian=return_is_radian)
 
+    def get_local_kinematics(self, samples=8):
+        """
+        Get the kinematics model of the arm for the host (forward/inverse kinematics of whole batches with NumPy,
+        no round-trip per pose), built from the DH parameters of the controller (get_dh_params)
+        Note:
+            1. only available if firmware_version >= 2.0.0, requires numpy
+            2. the model is validated against get_forward_kinematics of the controller at `samples` random joint angles
+                (the layout/convention of the DH parameters is detected by them), fails if the error > 0.1mm/0.001rad
+            3. the current tcp offset (and world offset) are part of the model, get it again after changing them
+            4. the units of the model are always mm/radian
+                kinematics.fk(angles): angles (n,) or (B, n) => poses (6,) or (B, 6)
+                kinematics.ik(poses, seeds=None): poses (6,) or (B, 6) => (angles, success, pos_err, rot_err)
+                    numerical (damped least squares), the solution depends on the seeds (such as the current angles),
+                    success is False if the pose is not reached (such as unreachable), so it can be used to check the reachability
+                kinematics.jacobian(angles): (6, n) or (B, 6, n)
+
+        :param samples: number of the validation samples (each is a get_forward_kinematics call)
+        :return: tuple((code, kinematics)), only when code is 0, the returned result is correct.
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            kinematics: DHKinematics instance (xarm/core/utils/kinematics.py)
+        """
+        return self._arm.get_local_kinematics(samples=samples)
+
     def is_tcp_limit(self, pose, is_radian=None):
         """
         Check the tcp pose is in limit
@@ -1771,6 +1859,43 @@ class XArmAPI(object):
         """
         return self._arm.is_joint_limit(joint, is_radian=is_radian)
 
+    def check_limits(self, targets, is_joint=False, is_radian=None, kinematics=None, confirm=False, margin=None, refresh=False):
+        """
+        Check many targets (such as a generated path) against the limits at the same time, computed on the host with NumPy
+        Note:
+            1. requires numpy
+            2. the limits are checked locally (no round-trip per target):
+                joint_range: the joint limits of the arm (same as the check of set_servo_angle)
+                reduced_joint_range: the joint range of the reduced mode (set_reduced_joint_range), only if the reduced mode is on
+                tcp_limit: the roll/pitch/yaw limits of the arm (same as the check of set_position)
+                tcp_boundary: the tcp boundary (set_reduced_tcp_boundary), only if the safety boundary (set_fense_mode) is on
+                unreachable: the ik of the kinematics fails (only the tcp targets with kinematics)
+            3. the reduced states are read from the controller once (get_reduced_states) and cached,
+                the cache is cleared by set_reduced_mode/set_reduced_tcp_boundary/set_reduced_joint_range/set_fense_mode
+            4. with the kinematics (see get_local_kinematics), the joint targets are also checked against the tcp limits (by fk),
+                the tcp targets are also checked against the joint ranges (by ik, seeded by the current angles)
+            5. with confirm=True, the borderline targets are checked by the controller (is_joint_limit/is_tcp_limit),
+                all the requests are sent in bursts (without waiting for every response), and its result replaces `ok`
+
+        :param targets: list (or 2D NumPy array) of the joint angles if is_joint else the tcp poses [x, y, z, roll, pitch, yaw]
+        :param is_joint: the targets are joint angles or not
+        :param is_radian: the angle values are radians or not, default is self.default_is_radian
+        :param kinematics: the kinematics returned by get_local_kinematics, default is None
+        :param confirm: confirm the borderline targets by the controller or not
+        :param margin: (mm, radian), a target within the margin of a limit is borderline, default is (1.0, 0.5 degrees)
+        :param refresh: read the reduced states again or not
+        :return: tuple((code, result)), only when code is 0, the returned result is correct.
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            result: dict of bool arrays (one value per target)
+                'joint_range'/'reduced_joint_range'/'tcp_limit'/'tcp_boundary'/'unreachable': True means violated,
+                    only the checked items are in the result
+                'ok': no violation
+                'borderline': within the margin of a limit
+                'confirmed': checked by the controller
+        """
+        return self._arm.check_limits(targets, is_joint=is_joint, is_radian=is_radian, kinematics=kinematics,
+                                      confirm=confirm, margin=margin, refresh=refresh)
+
     def emergency_stop(self):
         """
         Emergency stop (set_state(4) -> motion_enable(True) -> set_state(0))
@@ -2026,6 +2151,11 @@ class XArmAPI(object):
                                  report_mtable=True, report_mtbrake=True, report_cmd_num=True):
         """
         Register the report callback, only available if enable_report is True
+        Note:
+            1. the callback data of one frame is shared by the callbacks which report the same items,
+                it is read-only (a dict which can not be modified, the lists are tuples), copy it (dict(data)) to modify
+            2. if max_callback_thread_count > 0, the callbacks run in the callback dispatcher thread,
+                the frames are coalesced (only the latest is delivered) if the callback falls behind, see get_callback_stats
 
         :param callback:
             callback data:
@@ -2062,6 +2192,11 @@ class XArmAPI(object):
     def register_report_location_callback(self, callback=None, report_cartesian=True, report_joints=True):
         """
         Register the report location callback, only available if enable_report is True
+        Note:
+            1. the callback data of one frame is shared by the callbacks which report the same items,
+                it is read-only (a dict which can not be modified, the lists are tuples), copy it (dict(data)) to modify
+            2. if max_callback_thread_count > 0, the callbacks run in the callback dispatcher thread,
+                the frames are coalesced (only the latest is delivered) if the callback falls behind, see get_callback_stats
 
         :param callback:
             callback data:
@@ -2317,10 +2452,53 @@ class XArmAPI(object):
     def run_gcode_file(self, path, **kwargs):
         """
         Run the gcode file
+        Note:
+            1. the file is read and compiled line by line while running (streaming), so the size of the file is not limited
+            2. the commands are the same as send_cmd_sync, the lines without command are skipped
+
         :param path: gcode file path
+        :param kwargs:
+            times: run times, default is 1
+            init: clean_error/clean_warn/motion_enable/set_mode/set_state before running or not, default is False
+            mode: mode of the init, default is 0
+            state: state of the init, default is 0
+            wait_seconds: seconds to wait before running, default is 0
+            lookahead: max number of the consecutive motion commands (G1/G2/G7/G9) sent as one batch (see move_batch),
+                the batches are sent by a background thread while the next lines are compiled,
+                the batches are sent (not waiting for the motions) before a non-motion command is handled,
+                default is 0 (every command is handled on its own, same as send_cmd_sync)
+            blend_radius: radius (mm) of the G1 commands which are followed by another motion command (only with lookahead),
+                default is None (the G1 commands are not blended, radius=-1)
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
         """
         return self._arm.run_gcode_file(path, **kwargs)
 
+    def parse_gcode_file(self, path):
+        """
+        Compile the gcode file without running it (parse only)
+        Note:
+            1. every command is a tuple (letter, num, words), such as ('G', 1, {'X': '300', 'F': '100'}) (the command word is not in the words),
+                the commands can be cached (such as json/pickle) and replayed by run_gcode_commands
+
+        :param path: gcode file path
+        :return: tuple((code, commands)), only when code is 0, the returned result is correct.
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            commands: list of the compiled commands
+        """
+        return self._arm.parse_gcode_file(path)
+
+    def run_gcode_commands(self, commands, **kwargs):
+        """
+        Run the compiled gcode commands (see parse_gcode_file)
+
+        :param commands: list (or iterable, it is materialized if times > 1) of the compiled commands
+        :param kwargs: same as run_gcode_file
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.run_gcode_commands(commands, **kwargs)
+
     def get_gripper_version(self):
         """
         Get gripper version, only for debug
@@ -2580,6 +2758,214 @@ class XArmAPI(object):
         """
         return self._arm.set_timeout(timeout)
     
+    def set_report_queue_policy(self, policy=None, size=None):
+        """
+        Set how the report frames are queued when the report thread can not keep up with the report rate
+
+        :param policy: None means no change
+            'latest': keep the newest `size` frames, the older frames are overwritten (coalesced)
+            'all': keep all the frames up to `size`, the new frames are dropped when the queue is full
+            'block': stop receiving until the report thread takes a frame
+        :param size: max frames in the queue, None means no change
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.set_report_queue_policy(policy=policy, size=size)
+
+    def get_report_queue_stats(self):
+        """
+        Get the counters of the report queue
+
+        :return: dict, empty if the report socket is not connected
+            policy/maxsize: the settings of the queue
+            qsize: frames in the queue now
+            put/get: frames put into/taken from the queue
+            dropped: new frames dropped because the queue was full
+            coalesced: old frames overwritten by newer frames
+            blocked: times the receiving waited for the report thread
+            max_latency: max seconds a frame stayed in the queue
+            max_qsize: max frames in the queue
+        """
+        return self._arm.get_report_queue_stats()
+
+    def reset_report_queue_stats(self):
+        """
+        Reset the counters of the report queue
+
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.reset_report_queue_stats()
+
+    def set_report_stats_enable(self, enable):
+        """
+        Enable the jitter and latency statistics of the report stream or not
+
+        :param enable: True/False
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.set_report_stats_enable(enable)
+
+    def get_report_stats(self):
+        """
+        Get the jitter and latency statistics of the report stream
+        Note:
+            1. the statistics need to be enabled by set_report_stats_enable(True) or XArmAPI(..., enable_report_stats=True)
+            2. all the values are milliseconds, the result can be dumped by json
+            3. data_interval and skew are only available in the rich report (the frames carry the controller timestamp)
+
+        :return: dict, empty if not enabled
+            duration: seconds since the statistics started
+            recv_interval: histogram of the interval of the frames received by the host
+            data_interval: histogram of the interval of the controller timestamps
+            skew: histogram of (host receive time - controller timestamp) over its minimum, the network/host jitter
+            process: histogram of the time of processing a frame (decode, update the states, dispatch the callbacks)
+            every histogram: {count, min, max, mean, last, p50, p90, p99, over, over_cnts, bounds, buckets}
+        """
+        return self._arm.get_report_stats()
+
+    def reset_report_stats(self):
+        """
+        Reset the statistics of the report stream
+
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.reset_report_stats()
+
+    def get_callback_stats(self):
+        """
+        Get the statistics of the callbacks run by the callback dispatcher (max_callback_thread_count > 0)
+        Note:
+            1. the times are milliseconds
+                latency: from the callback dispatched to the callback starting (the lag of the callback)
+                run: run time of the callback
+            2. coalesced: the report frames skipped because the callback was still waiting
+
+        :return: {'pending': number of waiting calls, callback_name: {'calls', 'coalesced', 'errors', 'latency', 'run'}, ...}
+            empty dict if the callback dispatcher is not used
+        """
+        return self._arm.get_callback_stats()
+
+    def reset_callback_stats(self):
+        """
+        Reset the statistics of the callbacks
+
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.reset_callback_stats()
+
+    def set_report_max_age(self, max_age):
+        """
+        Let get_position/get_servo_angle/get_state/get_err_warn_code answer from the report instead of the command channel
+        Note:
+            1. only used when a report frame newer than max_age (seconds) exists, otherwise the command is still sent
+            2. the frames received before the last command is finished are not used (at least 2 frames later),
+                so the result of a command (such as set_state) is not covered by the old frames
+            3. get_err_warn_code always uses the command channel if the report_type is 'real' (no error/warn code in it),
+                get_servo_angle(is_real=True) always uses the command channel
+            4. max_age should be larger than the interval of the report (report_type), such as 2 intervals
+
+        :param max_age: max age (seconds) of the report frame, 0 means disable (always use the command channel)
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.set_report_max_age(max_age)
+
+    def get_report_snapshot(self, is_radian=None):
+        """
+        Get the state of the latest report frame as one immutable snapshot (no communication, no lock)
+        Note:
+            1. all the fields of a snapshot come from the same report frame, unlike reading
+                the properties (position/angles/state/...) one by one which may be updated between the reads
+            2. the snapshot is a namedtuple (ReportSnapshot), the fields:
+                seq, host_time, ctrl_time, is_radian, state, mode, cmd_num, error_code, warn_code,
+                angles, position, position_aa, position_offset, joints_torque, realtime_joint_speeds, realtime_tcp_speed,
+                currents, voltages, temperatures, ft_ext_force, ft_raw_force, motor_brake_states, motor_enable_states, count
+            3. seq increases by 1 for every report frame, host_time is time.monotonic() when the frame was received,
+                ctrl_time is the timestamp of the controller (microseconds, only the rich report has, otherwise 0)
+            4. only available when the report is enabled (enable_report=True)
+                ex: snapshot = arm.get_report_snapshot()
+                    print(snapshot.seq, snapshot.state, snapshot.position, snapshot.angles)
+
+        :param is_radian: the angles/position(roll/pitch/yaw) are in radians or not, default is self.default_is_radian
+        :return: ReportSnapshot, None if no report frame is received
+        """
+        return self._arm.get_report_snapshot(is_radian=is_radian)
+
+    @property
+    def report_history(self):
+        """
+        History of the report (ReportHistory), None if not enabled
+        Note:
+            1. enabled by set_report_history(size) or XArmAPI(..., report_history_size=size), requires numpy
+            2. the records are NumPy structured arrays with the fields:
+                host_time (time.monotonic() of receiving), ctrl_time (controller timestamp, microseconds, only the rich report),
+                state, mode, cmd_num, error_code, warn_code, angles (radian), pose (mm/radian), torque, currents, ft_ext_force, ft_raw_force
+            3. report_history.latest(n): the latest n records as a view (zero-copy) in time order
+            4. report_history.window(start_time, end_time): the records received in the period as a view
+            5. report_history.nearest(t): the record received nearest to the time t, such as the capture time of an image
+            6. the views are overwritten by the new records when the ring wraps, use copy=True to keep them
+        """
+        return self._arm.report_history
+
+    def set_report_history(self, size):
+        """
+        Keep the last `size` report records in a preallocated ring (requires numpy), see report_history
+
+        :param size: max records, 0 means disable
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.set_report_history(size)
+
+    def set_cmd_timing_enable(self, enable):
+        """
+        Enable the timing of the commands or not, the timing is grouped by the register (funcode) of the command
+
+        :param enable: True/False
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.set_cmd_timing_enable(enable)
+
+    def get_cmd_timing(self):
+        """
+        Get the timing of the commands
+        Note:
+            1. the timing needs to be enabled by set_cmd_timing_enable(True) or XArmAPI(..., enable_cmd_timing=True)
+            2. all the values are milliseconds, the result can be dumped by json
+
+        :return: dict of {register name: timing}, empty if not enabled
+            timing: {count, errors, lock_wait, send, first_byte, rtt}
+                count/errors: commands sent/failed (timeout, disconnect, ...)
+                lock_wait: histogram of the time waiting for the commands of other threads
+                send: histogram of the time from getting the lock to the request written to the socket/serial
+                first_byte: histogram of the time from the request written to the response received
+                rtt: histogram of the time from getting the lock to the response parsed
+                every histogram: {count, min, max, mean, last, p50, p90, p99, over, over_cnts, bounds, buckets}
+        """
+        return self._arm.get_cmd_timing()
+
+    def dump_cmd_timing(self):
+        """
+        Get the timing of the commands as a text table, sorted by the total time
+
+        :return: str, empty if not enabled
+        """
+        return self._arm.dump_cmd_timing()
+
+    def reset_cmd_timing(self):
+        """
+        Reset the timing of the commands
+
+        :return: code
+            code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+        """
+        return self._arm.reset_cmd_timing()
+
     def set_baud_checkset_enable(self, enable):
         """
         Enable auto checkset the baudrate of the end IO board or not
@@ -2987,6 +3373,30 @@ class XArmAPI(object):
         """
         return self._arm.vc_set_cartesian_velocity(speeds, is_radian=is_radian, is_tool_coord=is_tool_coord, duration=duration, **kwargs)
 
+    def create_servo_streamer(self, mode='servo_j', period=0.004, **kwargs):
+        """
+        Create a streamer which pushes the setpoints of a trajectory at a fixed period (monotonic deadline scheduler)
+        Note:
+            1. the deadline of the setpoint k is start + k * period, the sleep jitter never accumulates
+            2. the arm must be in the mode of the streamer (servo_j/servo_cartesian: mode 1, joint_velocity: mode 4,
+                cartesian_velocity: mode 5) and state 0 before running
+            3. streamer.run(trajectory) streams in the calling thread, await streamer.run_async(trajectory) in an asyncio loop
+                (the api is called in the executor of the loop),
+                streamer.stop() stops it, streamer.get_stats() returns the sent/failed/skipped/overruns counts
+                and the histograms (ms) of the send lateness and the send duration
+            4. trajectory: iterable of the setpoints, such as a 2D NumPy array (one row per setpoint) or a generator
+
+        :param mode: 'servo_j' (set_servo_angle_j), 'servo_cartesian' (set_servo_cartesian),
+            'joint_velocity' (vc_set_joint_velocity), 'cartesian_velocity' (vc_set_cartesian_velocity)
+        :param period: send period (unit: second), default is 0.004
+        :param kwargs:
+            spin: the last part (seconds) before every deadline is busy-waited for accuracy (not in run_async), default is 0.0005
+            skip_late: drop the setpoints which are already too late instead of sending them in a burst, default is False
+            others are passed to the api of the mode, such as speed/mvacc/is_radian/is_tool_coord/duration
+        :return: ServoStreamer
+        """
+        return self._arm.create_servo_streamer(mode=mode, period=period, **kwargs)
+
     def calibrate_tcp_coordinate_offset(self, four_points, is_radian=None):
         """
         Four-point method to calibrate tool coordinate system position offset
@@ -3488,8 +3898,15 @@ class XArmAPI(object):
         :param speed: speed of the linear track. Integer between 1 and 1000mm/s. default is not set
         :param wait: wait to motion finish or not, default is True
         :param timeout: wait timeout, seconds, default is 100s.
+        :param kwargs:
+            :param future: return a MoveFuture instead of the code and do not wait, default is False
+                the future is resolved with the code when the motion is finished, the linear track has no feedback, it is waited in a background thread (one per arm)
+                ex: future = arm.set_linear_track_pos(..., future=True)
+                    ...  # do something else while moving
+                    code = future.result()  # or `code = await future` in the coroutine
         :return: code
             code: See the [API Code Documentation](./xarm_api_code.md#api-code) for details.
+            MoveFuture if future is True
         """
         return self._arm.set_linear_track_pos(pos, speed=speed, wait=wait, timeout=timeout, **kwargs)
 
@@ -3797,6 +4214,71 @@ class XArmAPI(object):
         :return: True/False
         """
         return self._arm.release_feedback_callback(callback=callback)
+
+    def register_report_field_callback(self, callback=None, field='state', index=None, threshold=None):
+        """
+        Register the callback of a single field of the report, only called when the field changes
+        Note:
+            1. the change is detected on the raw bytes of the report frame (change bitmask), the frames in which
+                the field is unchanged cost nothing, so it is cheaper than filtering in the report callback
+            2. only available for the new protocol report (real/normal/rich)
+            3. the value is the raw value of the report, the angles/pose are always radian/mm
+
+        :param callback:
+            callback data: {'field': field, 'index': index, 'value': value}
+                the data also has 'threshold' and 'above' (value > threshold) if threshold is not None
+        :param field: name of the field in the report, such as 'state', 'mode', 'cmd_num', 'error_code', 'warn_code',
+            'mtbrake', 'mtable', 'angles', 'pose', 'torque', 'temperatures', 'currents', 'voltages', 'ft_ext_force', ...
+            see REPORT_REAL_LAYOUT/REPORT_RICH_LAYOUT of xarm/core/utils/report_decoder.py
+            Note: the fields beyond the report frame (such as 'temperatures' with the normal report) are never reported
+        :param index: index of the list field, such as index=4 and field='temperatures' is the temperature of joint 5,
+            None means the whole field
+        :param threshold: None means calling on every change, otherwise only calling when the value crosses the threshold
+            (the first value is reported only if it is above the threshold)
+        :return: True/False
+        """
+        return self._arm.register_report_field_callback(callback=callback, field=field, index=index, threshold=threshold)
+
+    def release_report_field_callback(self, callback=None):
+        """
+        Release the callback of the report field, all the subscriptions of the callback are released
+
+        :param callback: None means releasing all the callbacks
+        :return: True/False
+        """
+        return self._arm.release_report_field_callback(callback=callback)
+
+    def subscribe_report(self, callback=None, fields=None, rate=0):
+        """
+        Subscribe the fields of the report at a rate, one subscription per callback (subscribe again to change it)
+        Note:
+            1. with report_type='auto' (see the kwargs of XArmAPI), the cheapest report port carrying all the
+                subscribed fields is used, the report is reconnected if the subscriptions need another port
+                only 'real'/'normal' fields at a low rate: normal (30001)
+                only 'real' fields at a rate above 20Hz, or ft_ext_force/ft_raw_force: real (30003)
+                otherwise: rich (30002)
+            2. the fields not carried by the current report are None
+            3. the value is the raw value of the report, the angles/pose are always radian/mm
+            4. the callbacks with the same fields share the same data, it is read-only (a dict which can not be modified,
+                the lists are tuples), copy it (dict(data)) to modify
+
+        :param callback:
+            callback data: {'time': time.monotonic() of the frame, field: value, ...}
+        :param fields: list of the field names, such as ['state', 'error_code', 'angles'],
+            see REPORT_REAL_LAYOUT/REPORT_RICH_LAYOUT of xarm/core/utils/report_decoder.py ('state'/'mode' for state_mode)
+        :param rate: max rate (Hz) of the callback, 0 means every report frame
+        :return: True/False
+        """
+        return self._arm.subscribe_report(callback=callback, fields=fields, rate=rate)
+
+    def unsubscribe_report(self, callback=None):
+        """
+        Unsubscribe the report
+
+        :param callback: None means all the subscriptions
+        :return: True/False
+        """
+        return self._arm.unsubscribe_report(callback=callback)
     
     def read_coil_bits(self, addr, quantity):
         """
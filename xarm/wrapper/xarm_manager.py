@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import threading
+from multiprocessing.pool import ThreadPool
+from ..core.comm.reactor import Reactor
+from ..core.utils.log import logger
+from ..tools.threads import KeyedWorkerPool
+from .xarm_api import XArmAPI
+
+
+class XArmManager(object):
+    """
+    Manage the connections of many arms with a fixed number of threads
+    Threads:
+        1 reactor thread: receives the control/report sockets of all arms and sends the heartbeats
+        decoder_threads: decode the report frames (the frames of one arm are always decoded in the same thread)
+        callback_threads: run the user callbacks of all arms
+        1 housekeeping thread: keepalive and report reconnection of all arms
+
+    Usage:
+        manager = XArmManager()
+        arm1 = manager.add_arm('192.168.1.185')
+        arm2 = manager.add_arm('192.168.1.186', report_type='rich')
+        ...
+        manager.close()
+    """
+    def __init__(self, decoder_threads=2, callback_threads=4, maintain_interval=1):
+        self._reactor = Reactor()
+        self._reactor.start()
+        self._decoder = KeyedWorkerPool(decoder_threads, name='report-decoder')
+        self._callback_pool = ThreadPool(callback_threads) if callback_threads > 0 else None
+        self._maintain_interval = maintain_interval
+        self._arms = []
+        self._lock = threading.Lock()
+        self._alive = True
+        self._maintain_thread = threading.Thread(target=self._maintain_thread_handle, name='arm-maintain', daemon=True)
+        self._maintain_thread.start()
+
+    @property
+    def arms(self):
+        with self._lock:
+            return list(self._arms)
+
+    @property
+    def reactor(self):
+        return self._reactor
+
+    @property
+    def dropped_report_count(self):
+        return self._decoder.dropped
+
+    def add_arm(self, port, is_radian=False, **kwargs):
+        """
+        Connect an arm which shares the threads of the manager
+        :param port: ip-address of the arm
+        :param is_radian: same as XArmAPI
+        :param kwargs: same as XArmAPI
+        :return: XArmAPI instance, check arm.connected
+        """
+        kwargs['reactor'] = self._reactor
+        kwargs['report_decoder'] = self._decoder
+        kwargs['callback_pool'] = self._callback_pool
+        kwargs['timed_comm'] = False
+        arm = XArmAPI(port=port, is_radian=is_radian, **kwargs)
+        if arm.connected:
+            with self._lock:
+                self._arms.append(arm)
+        return arm
+
+    def remove_arm(self, arm):
+        with self._lock:
+            if arm in self._arms:
+                self._arms.remove(arm)
+        arm.disconnect()
+        self._decoder.release(arm._arm)
+
+    def disconnect_all(self):
+        for arm in self.arms:
+            self.remove_arm(arm)
+
+    def close(self):
+        self.disconnect_all()
+        self._alive = False
+        self._reactor.stop()
+        self._reactor.join(1)
+        self._decoder.close(1)
+        if self._callback_pool is not None:
+            self._callback_pool.close()
+            self._callback_pool.join()
+        self._maintain_thread.join(1)
+
+    def _maintain_thread_handle(self):
+        while self._alive:
+            for arm in self.arms:
+                try:
+                    if not arm._arm._reactor_maintain():
+                        with self._lock:
+                            if arm in self._arms:
+                                self._arms.remove(arm)
+                        self._decoder.release(arm._arm)
+                except Exception as e:
+                    logger.error('arm maintain exception: {}'.format(e))
+            time.sleep(self._maintain_interval)
@@ -13,10 +13,6 @@ import math
 import uuid
 import queue
 import threading
-try:
-    from multiprocessing.pool import ThreadPool
-except:
-    ThreadPool = None
 try:
     import asyncio
 
@@ -29,8 +25,10 @@ except:
 if not hasattr(math, 'inf'):
     setattr(math, 'inf', float('inf'))
 from .events import Events
+from .report_snapshot import ReportSnapshot
+from .move_future import MoveFuture
 from ..core.config.x_config import XCONF
-from ..core.comm import SocketPort
+from ..core.comm import SocketPort, ReportQueue, ReportFrameSplitter
 try:
     from ..core.comm import SerialPort
 except:
@@ -38,11 +36,17 @@ except:
 from ..core.wrapper import UxbusCmdSer, UxbusCmdTcp
 from ..core.utils.log import logger, pretty_print
 from ..core.utils import convert
+from ..core.utils.stats import ReportStats, CmdTiming
+from ..core.utils.report_decoder import real_report_decoder, normal_report_decoder, rich_report_decoder, \
+    REPORT_REAL_LAYOUT, REPORT_RICH_LAYOUT, ReportChangeDetector, CHANGED_MTBRAKE, CHANGED_MTABLE, \
+    CHANGED_TEMPERATURES, CHANGED_COUNT, CHANGED_IDEN_PROGRESS, REPORT_FIELDS, select_report_type, get_report_field, \
+    REPORT_TIMESTAMP_OFFSET
+from ..core.utils.report_history import ReportHistory
 from ..core.config.x_code import ControllerWarn, ControllerError, ControllerErrorCodeMap, ControllerWarnCodeMap
-from .utils import compare_time, compare_version, filter_invaild_number
+from .utils import compare_time, compare_version, filter_invaild_number, ReadOnlyDict
 from .decorator import xarm_is_connected, xarm_is_ready, xarm_is_not_simulation_mode, xarm_wait_until_cmdnum_lt_max, xarm_wait_until_not_pause
 from .code import APIState
-from ..tools.threads import ThreadManage
+from ..tools.threads import ThreadManage, KeyedWorkerPool, CallbackDispatcher
 from ..version import __version__
 
 controller_error_keys = ControllerErrorCodeMap.keys()
@@ -51,6 +55,14 @@ controller_warn_keys = ControllerWarnCodeMap.keys()
 print('SDK_VERSION: {}'.format(__version__))
 
 
+class _FuncQueue(object):
+    """
+    Queue-like object, put() calls the function directly
+    """
+    def __init__(self, func):
+        self.put = func
+
+
 class Base(BaseObject, Events):
     def __init__(self, port=None, is_radian=False, do_not_open=False, **kwargs):
         if kwargs.get('init', False):
@@ -63,6 +75,10 @@ class Base(BaseObject, Events):
             self._enable_heartbeat = kwargs.get('enable_heartbeat', False)
             self._enable_report = kwargs.get('enable_report', True)
             self._report_type = kwargs.get('report_type', 'rich')
+            # 'auto': the report type is selected by the report subscriptions, see subscribe_report
+            self._report_type_auto = self._report_type == 'auto'
+            if self._report_type_auto:
+                self._report_type = 'rich'
             self._forbid_uds = kwargs.get('forbid_uds', False)
 
             self._check_tcp_limit = kwargs.get('check_tcp_limit', False)
@@ -78,6 +94,27 @@ class Base(BaseObject, Events):
             self._check_is_pause = kwargs.get('check_is_pause', True)
             self._timed_comm = kwargs.get('timed_comm', True)
             self._timed_comm_interval = kwargs.get('timed_comm_interval', 30)
+            self._pipelined = kwargs.get('pipelined', False)
+            self._report_queue_policy = kwargs.get('report_queue_policy', XCONF.SocketConf.TCP_REPORT_QUE_POLICY)
+            self._report_queue_size = kwargs.get('report_queue_size', XCONF.SocketConf.TCP_REPORT_QUE_SIZE)
+            self._report_stats = ReportStats() if kwargs.get('enable_report_stats', False) else None
+            self._cmd_timing = CmdTiming() if kwargs.get('enable_cmd_timing', False) else None
+            self._report_history = None
+            self._report_snapshot = None
+            self._report_seq = 0
+            # change bitmask of the report frames (new protocol), see ReportChangeDetector
+            self._real_change_detector = ReportChangeDetector(REPORT_REAL_LAYOUT)
+            self._change_detector = ReportChangeDetector(REPORT_RICH_LAYOUT)
+            self._report_changes = 0
+            self._report_seq_at_cmd = 0
+            self._report_max_age = kwargs.get('report_max_age', 0)
+            if kwargs.get('report_history_size', 0) > 0:
+                self.set_report_history(kwargs.get('report_history_size'))
+            # shared resources of XArmManager
+            self._reactor = kwargs.get('reactor', None)
+            self._report_decoder = kwargs.get('report_decoder', None)
+            self._callback_pool = kwargs.get('callback_pool', None)
+            self._reactor_maintain_state = {}
             self._timed_comm_t = None
             self._timed_comm_t_alive = False
 
@@ -92,6 +129,7 @@ class Base(BaseObject, Events):
             self._asyncio_loop_alive = False
             self._asyncio_loop_thread = None
             self._pool = None
+            self._callback_dispatcher = None
             self._thread_manage = ThreadManage()
 
             self._rewrite_modbus_baudrate_method = kwargs.get('rewrite_modbus_baudrate_method', True)
@@ -181,6 +219,9 @@ class Base(BaseObject, Events):
             self._pause_cond = threading.Condition()
             self._pause_lock = threading.Lock()
             self._pause_cnts = 0
+            # notified on every report frame, feedback and disconnection, see _notify_state_event
+            self._state_cond = threading.Condition()
+            self._state_event_seq = 0
 
             self._realtime_tcp_speed = 0
             self._realtime_joint_speeds = [0, 0, 0, 0, 0, 0, 0]
@@ -239,6 +280,15 @@ class Base(BaseObject, Events):
             self._fb_key_transid_map = {}
             self._fb_transid_type_map = {}
             self._fb_transid_result_map = {}
+            # {trans_id: MoveFuture}, resolved by the feedback
+            self._move_futures = {}
+            self._move_future_lock = threading.Lock()
+            # runs the waits of the futures which have no feedback (one thread per arm, created when needed)
+            self._move_future_waiter = None
+            # sends the segments of move_batch (one thread per arm, created when needed, the batches run in order)
+            self._move_batch_sender = None
+            # reduced states of the controller used by check_limits, cleared by the setters of the reduced mode
+            self._limit_cache = None
 
             if not do_not_open:
                 self.connect()
@@ -299,6 +349,10 @@ class Base(BaseObject, Events):
         self._pause_cond = threading.Condition()
         self._pause_lock = threading.Lock()
         self._pause_cnts = 0
+        self._state_cond = threading.Condition()
+        self._state_event_seq = 0
+        self._real_change_detector.reset()
+        self._change_detector.reset()
 
         self._realtime_tcp_speed = 0
         self._realtime_joint_speeds = [0, 0, 0, 0, 0, 0, 0]
@@ -753,10 +807,17 @@ class Base(BaseObject, Events):
     def wait_until_cmdnum_lt_max(self):
         if not self._check_cmdnum_limit:
             return
-        while self.connected and self.cmd_num >= self._max_cmd_num:
+        while self.connected:
+            # read before checking, so the frame which lowers the cmdnum is never missed
+            event_seq = self._state_event_seq
+            if self.cmd_num < self._max_cmd_num:
+                return
             if time.monotonic() - self._last_report_time > 0.4:
                 self.get_cmdnum()
-            time.sleep(0.05)
+                if self.cmd_num < self._max_cmd_num:
+                    return
+            # woken by the next report frame instead of polling
+            self._wait_state_event(event_seq, 0.05)
 
     @property
     def check_xarm_is_ready(self):
@@ -792,7 +853,16 @@ class Base(BaseObject, Events):
 
     def _clean_thread(self):
         self._thread_manage.join(1)
-        if self._pool:
+        if self._callback_dispatcher is not None:
+            self._callback_dispatcher.close(1)
+            self._callback_dispatcher = None
+        if self._move_future_waiter is not None:
+            self._move_future_waiter.close()
+            self._move_future_waiter = None
+        if self._move_batch_sender is not None:
+            self._move_batch_sender.close(1)
+            self._move_batch_sender = None
+        if self._pool and self._pool is not self._callback_pool:
             try:
                 self._pool.close()
                 self._pool.join()
@@ -835,22 +905,28 @@ class Base(BaseObject, Events):
             if self._port == 'localhost' or re.match(
                     r"^(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$",
                     self._port):
+                # with a shared reactor the feedback is handled in the reactor thread, no feedback thread
+                fb_que = self._feedback_que if self._reactor is None else _FuncQueue(self._feedback_callback)
                 self._stream = SocketPort(self._port, XCONF.SocketConf.TCP_CONTROL_PORT,
                                           heartbeat=self._enable_heartbeat,
-                                          buffer_size=XCONF.SocketConf.TCP_CONTROL_BUF_SIZE, forbid_uds=self._forbid_uds, fb_que=self._feedback_que)
+                                          buffer_size=XCONF.SocketConf.TCP_CONTROL_BUF_SIZE, forbid_uds=self._forbid_uds,
+                                          fb_que=fb_que, reactor=self._reactor)
                 if not self.connected:
                     raise Exception('connect socket failed')
 
                 self._report_error_warn_changed_callback()
-                self._feedback_thread = threading.Thread(target=self._feedback_thread_handle, daemon=True)
-                self._feedback_thread.start()
+                if self._reactor is None:
+                    self._feedback_thread = threading.Thread(target=self._feedback_thread_handle, daemon=True)
+                    self._feedback_thread.start()
 
-                self.arm_cmd = UxbusCmdTcp(self._stream, set_feedback_key_tranid=self._set_feedback_key_tranid)
+                self.arm_cmd = UxbusCmdTcp(self._stream, set_feedback_key_tranid=self._set_feedback_key_tranid,
+                                           pipelined=self._pipelined)
+                self.arm_cmd.set_timing(self._cmd_timing)
                 self.arm_cmd.set_protocol_identifier(2)
                 self._stream_type = 'socket'
 
                 try:
-                    if self._timed_comm:
+                    if self._timed_comm and self._reactor is None:
                         self._timed_comm_t = threading.Thread(target=self._timed_comm_thread, daemon=True)
                         self._timed_comm_t.start()
                 except:
@@ -869,15 +945,26 @@ class Base(BaseObject, Events):
                 self._support_feedback = self.version_is_ge(2, 0, 102)
                 self.arm_cmd.set_debug(self._debug)
 
-                if self._max_callback_thread_count < 0 and asyncio is not None:
+                if self._callback_pool is not None:
+                    self._pool = self._callback_pool
+                elif self._max_callback_thread_count < 0 and asyncio is not None:
                     self._asyncio_loop = asyncio.new_event_loop()
                     self._asyncio_loop_thread = threading.Thread(target=self._run_asyncio_loop, daemon=True)
                     self._thread_manage.append(self._asyncio_loop_thread)
                     self._asyncio_loop_thread.start()
-                elif self._max_callback_thread_count > 0 and ThreadPool is not None:
-                    self._pool = ThreadPool(self._max_callback_thread_count)
-
-                if self._stream.connected and self._enable_report:
+                elif self._max_callback_thread_count > 0:
+                    self._callback_dispatcher = CallbackDispatcher()
+
+                if self._reactor is not None:
+                    # keepalive and report reconnection are done by XArmManager (_reactor_maintain)
+                    self._reactor_maintain_state = {
+                        'protocol_identifier': 2,
+                        'last_send_time': 0,
+                        'last_connect_time': time.monotonic(),
+                        'connected': True,
+                        'reported': self.reported,
+                    }
+                elif self._stream.connected and self._enable_report:
                     self._report_thread = threading.Thread(target=self._report_thread_handle, daemon=True)
                     self._report_thread.start()
                     self._thread_manage.append(self._report_thread)
@@ -892,6 +979,7 @@ class Base(BaseObject, Events):
                 self._report_error_warn_changed_callback()
 
                 self.arm_cmd = UxbusCmdSer(self._stream)
+                self.arm_cmd.set_timing(self._cmd_timing)
                 self._stream_type = 'serial'
 
                 if self._max_callback_thread_count < 0 and asyncio is not None:
@@ -899,8 +987,8 @@ class Base(BaseObject, Events):
                     self._asyncio_loop_thread = threading.Thread(target=self._run_asyncio_loop, daemon=True)
                     self._thread_manage.append(self._asyncio_loop_thread)
                     self._asyncio_loop_thread.start()
-                elif self._max_callback_thread_count > 0 and ThreadPool is not None:
-                    self._pool = ThreadPool(self._max_callback_thread_count)
+                elif self._max_callback_thread_count > 0:
+                    self._callback_dispatcher = CallbackDispatcher()
 
                 if self._enable_report:
                     self._report_thread = threading.Thread(target=self._auto_get_report_thread, daemon=True)
@@ -940,11 +1028,16 @@ class Base(BaseObject, Events):
         # def _async_run_callback(callback, msg):
         #     yield from callback(msg)
 
-    def _run_callback(self, callback, msg, name='', enable_callback_thread=True):
+    def _run_callback(self, callback, msg, name='', enable_callback_thread=True, coalesce=False):
+        """
+        :param coalesce: only the latest msg is delivered if the callback is still waiting (callback dispatcher only)
+        """
         try:
             if self._asyncio_loop_alive and enable_callback_thread:
                 coroutine = self._async_run_callback(callback, msg)
                 asyncio.run_coroutine_threadsafe(coroutine, self._asyncio_loop)
+            elif self._callback_dispatcher is not None and enable_callback_thread:
+                self._callback_dispatcher.dispatch(callback, msg, key=(name, callback) if coalesce else None)
             elif self._pool is not None and enable_callback_thread:
                 self._pool.apply_async(callback, args=(msg,))
             else:
@@ -996,6 +1089,8 @@ class Base(BaseObject, Events):
         self._report_connect_changed_callback(False, False)
         with self._pause_cond:
             self._pause_cond.notifyAll()
+        self._notify_state_event()
+        self._resolve_move_futures(APIState.NOT_CONNECTED)
         self._clean_thread()
 
     def set_timeout(self, timeout):
@@ -1004,6 +1099,196 @@ class Base(BaseObject, Events):
             self._cmd_timeout = self.arm_cmd.set_timeout(self._cmd_timeout)
         return self._cmd_timeout
     
+    def set_report_queue_policy(self, policy=None, size=None):
+        if policy is not None and policy not in ReportQueue.POLICIES:
+            return APIState.API_EXCEPTION
+        if policy is not None:
+            self._report_queue_policy = policy
+        if size is not None:
+            self._report_queue_size = max(1, int(size))
+        if self._stream_report is not None:
+            self._stream_report.rx_que.set_policy(self._report_queue_policy, self._report_queue_size)
+        return 0
+
+    def get_report_queue_stats(self):
+        if self._stream_report is None or not isinstance(self._stream_report.rx_que, ReportQueue):
+            return {}
+        return self._stream_report.rx_que.stats
+
+    def reset_report_queue_stats(self):
+        if self._stream_report is not None and isinstance(self._stream_report.rx_que, ReportQueue):
+            self._stream_report.rx_que.reset_stats()
+        return 0
+
+    def set_report_stats_enable(self, enable):
+        if enable and self._report_stats is None:
+            self._report_stats = ReportStats()
+        elif not enable:
+            self._report_stats = None
+        return 0
+
+    def get_report_stats(self):
+        return self._report_stats.to_dict() if self._report_stats is not None else {}
+
+    def get_callback_stats(self):
+        if self._callback_dispatcher is None:
+            return {}
+        return self._callback_dispatcher.get_stats()
+
+    def reset_callback_stats(self):
+        if self._callback_dispatcher is not None:
+            self._callback_dispatcher.reset_stats()
+        return 0
+
+    def reset_report_stats(self):
+        if self._report_stats is not None:
+            self._report_stats.reset()
+        return 0
+
+    def _get_fresh_report(self):
+        """
+        :return: the latest report snapshot if it is newer than report_max_age and was received
+            after the last command finished (at least 2 frames later), otherwise None (use the command channel)
+        """
+        max_age = self._report_max_age
+        if not max_age or max_age <= 0:
+            return None
+        snapshot = self._report_snapshot
+        if snapshot is None or snapshot.seq < self._report_seq_at_cmd + 2 \
+                or not self._stream_report or not self._stream_report.connected:
+            return None
+        if time.monotonic() - snapshot.host_time > max_age:
+            return None
+        return snapshot
+
+    def set_report_max_age(self, max_age):
+        self._report_max_age = max_age
+        return 0
+
+    @property
+    def report_snapshot(self):
+        return self._report_snapshot
+
+    def get_report_snapshot(self, is_radian=None):
+        snapshot = self._report_snapshot
+        if snapshot is None:
+            return None
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        return snapshot if is_radian else snapshot.to_degree()
+
+    def _select_report_type(self):
+        fields, rate = set(), 0
+        for item in self._report_callbacks.get(self.REPORT_SUBSCRIPTION_ID, []):
+            fields.update(item['fields'])
+            rate = max(rate, item['rate'])
+        for item in self._report_callbacks.get(self.REPORT_FIELD_ID, []):
+            fields.add(item['field'])
+        if not fields:
+            return 'rich'
+        return select_report_type(fields, rate, real_rate=XCONF.SocketConf.TCP_REPORT_AUTO_REAL_RATE)
+
+    def _update_report_type(self):
+        if not self._report_type_auto:
+            return
+        report_type = self._select_report_type()
+        if report_type == self._report_type:
+            return
+        logger.info('report type changed: {} => {}'.format(self._report_type, report_type))
+        self._report_type = report_type
+        if self._stream_report is not None:
+            # reconnected to the port of the new type by the report thread (or XArmManager)
+            try:
+                self._stream_report.close()
+            except:
+                pass
+
+    def subscribe_report(self, callback=None, fields=None, rate=0):
+        fields = tuple(fields) if isinstance(fields, (list, tuple, set, frozenset)) else (fields,) if fields else ()
+        if not callable(callback) or not fields or rate < 0:
+            return False
+        for field in fields:
+            if field not in REPORT_FIELDS:
+                logger.error('subscribe_report, unknown field: {}'.format(field))
+                return False
+        items = self._report_callbacks[self.REPORT_SUBSCRIPTION_ID]
+        items[:] = [item for item in items if item['callback'] != callback]
+        self._register_report_callback(self.REPORT_SUBSCRIPTION_ID, {
+            'callback': callback,
+            'fields': fields,
+            'rate': rate,
+            '_next_time': 0,
+        })
+        self._update_report_type()
+        return True
+
+    def unsubscribe_report(self, callback=None):
+        if callback is None:
+            self._report_callbacks[self.REPORT_SUBSCRIPTION_ID].clear()
+        else:
+            items = self._report_callbacks[self.REPORT_SUBSCRIPTION_ID]
+            items[:] = [item for item in items if item['callback'] != callback]
+        self._update_report_type()
+        return True
+
+    def register_report_field_callback(self, callback=None, field='state', index=None, threshold=None):
+        ret = super(Base, self).register_report_field_callback(
+            callback=callback, field=field, index=index, threshold=threshold)
+        self._update_report_type()
+        return ret
+
+    def release_report_field_callback(self, callback=None):
+        ret = super(Base, self).release_report_field_callback(callback=callback)
+        self._update_report_type()
+        return ret
+
+    @property
+    def report_history(self):
+        return self._report_history
+
+    def set_report_history(self, size):
+        if size <= 0:
+            self._report_history = None
+            return 0
+        if self._report_history is None or self._report_history.size != size:
+            try:
+                self._report_history = ReportHistory(size)
+            except ImportError as e:
+                logger.error(e)
+                return APIState.API_EXCEPTION
+        return 0
+
+    def set_cmd_timing_enable(self, enable):
+        if enable and self._cmd_timing is None:
+            self._cmd_timing = CmdTiming()
+        elif not enable:
+            self._cmd_timing = None
+        if self.arm_cmd is not None:
+            self.arm_cmd.set_timing(self._cmd_timing)
+        return 0
+
+    @staticmethod
+    def _get_uxbus_reg_names():
+        names = {}
+        for name, value in vars(XCONF.UxbusReg).items():
+            if not name.startswith('_') and isinstance(value, int):
+                names.setdefault(value, name)
+        return names
+
+    def get_cmd_timing(self):
+        if self._cmd_timing is None:
+            return {}
+        return self._cmd_timing.to_dict(self._get_uxbus_reg_names())
+
+    def dump_cmd_timing(self):
+        if self._cmd_timing is None:
+            return ''
+        return self._cmd_timing.dump(self._get_uxbus_reg_names())
+
+    def reset_cmd_timing(self):
+        if self._cmd_timing is not None:
+            self._cmd_timing.reset()
+        return 0
+
     def set_baud_checkset_enable(self, enable):
         self._baud_checkset = enable
         return 0
@@ -1034,27 +1319,128 @@ class Base(BaseObject, Events):
 
     def _connect_report(self):
         if self._enable_report:
+            if self._report_type_auto:
+                self._report_type = self._select_report_type()
             if self._stream_report:
                 try:
                     self._stream_report.close()
                 except:
                     pass
                 time.sleep(2)
+            frame_callback = self._on_report_frame if self._reactor is not None else None
             if self._report_type == 'real':
                 self._stream_report = SocketPort(
                     self._port, XCONF.SocketConf.TCP_REPORT_REAL_PORT,
                     buffer_size=1024 if not self._is_old_protocol else 87,
-                    forbid_uds=self._forbid_uds)
+                    forbid_uds=self._forbid_uds, reactor=self._reactor, frame_callback=frame_callback,
+                    report_queue_size=self._report_queue_size, report_queue_policy=self._report_queue_policy)
             elif self._report_type == 'normal':
                 self._stream_report = SocketPort(
                     self._port, XCONF.SocketConf.TCP_REPORT_NORM_PORT,
                     buffer_size=XCONF.SocketConf.TCP_REPORT_NORMAL_BUF_SIZE if not self._is_old_protocol else 87,
-                    forbid_uds=self._forbid_uds)
+                    forbid_uds=self._forbid_uds, reactor=self._reactor, frame_callback=frame_callback,
+                    report_queue_size=self._report_queue_size, report_queue_policy=self._report_queue_policy)
             else:
                 self._stream_report = SocketPort(
                     self._port, XCONF.SocketConf.TCP_REPORT_RICH_PORT,
                     buffer_size=1024 if not self._is_old_protocol else 187,
-                    forbid_uds=self._forbid_uds)
+                    forbid_uds=self._forbid_uds, reactor=self._reactor, frame_callback=frame_callback,
+                    report_queue_size=self._report_queue_size, report_queue_policy=self._report_queue_policy)
+
+    def _on_report_frame(self, data):
+        # called by the reactor thread
+        recv_time = time.monotonic()
+        if self._report_decoder is not None:
+            self._report_decoder.submit(self, self._handle_report_frame, data, recv_time)
+        else:
+            try:
+                self._handle_report_frame(data, recv_time)
+            except Exception as e:
+                logger.error(e)
+
+    def _handle_report_frame(self, data, recv_time=None):
+        size = convert.bytes_to_u32(data)
+        if self._is_old_protocol and size > 256:
+            self._is_old_protocol = False
+        recv_time = time.monotonic() if recv_time is None else recv_time
+        # the controller timestamp is decoded once, shared by the stats/snapshot/history
+        if not self._is_old_protocol and self._report_type == 'rich' and len(data) >= REPORT_TIMESTAMP_OFFSET + 8:
+            ctrl_time = convert.bytes_to_u64(data[REPORT_TIMESTAMP_OFFSET:REPORT_TIMESTAMP_OFFSET + 8])
+        else:
+            ctrl_time = None
+        report_stats = self._report_stats
+        if report_stats is None:
+            self._handle_report_data(data)
+        else:
+            start_time = time.perf_counter()
+            self._handle_report_data(data)
+            report_stats.update(recv_time, time.perf_counter() - start_time, ctrl_time)
+        ctrl_time = 0 if ctrl_time is None else ctrl_time
+        self._report_seq += 1
+        # the only write of the snapshot, readers always see a whole frame
+        self._report_snapshot = ReportSnapshot(
+            self._report_seq, recv_time, ctrl_time, True,
+            self._state, self._mode, self._cmd_num, self._error_code, self._warn_code,
+            tuple(self._angles), tuple(self._position), tuple(self._pose_aa), tuple(self._position_offset),
+            tuple(self._joints_torque), tuple(self._realtime_joint_speeds), self._realtime_tcp_speed,
+            tuple(self._currents), tuple(self._voltages), tuple(self._temperatures),
+            tuple(self._ft_ext_force), tuple(self._ft_raw_force),
+            tuple(self._arm_motor_brake_states), tuple(self._arm_motor_enable_states), self._count)
+        if self._report_history is not None:
+            self._report_history.append(
+                recv_time, ctrl_time,
+                self._state, self._mode, self._cmd_num, self._error_code, self._warn_code,
+                self._angles, self._position, self._joints_torque, self._currents,
+                self._ft_ext_force, self._ft_raw_force)
+        if self._move_futures:
+            if self._error_code != 0:
+                self._resolve_move_futures(APIState.HAS_ERROR)
+            elif self._state == 4 and self._report_seq >= self._report_seq_at_cmd + 2:
+                self._resolve_move_futures(APIState.EMERGENCY_STOP)
+        self._notify_state_event()
+
+    def _reactor_maintain(self):
+        """
+        Keepalive and report reconnection of an arm driven by a shared reactor,
+        called periodically by XArmManager instead of the report thread and the timed communication thread
+        :return: False if the arm is disconnected
+        """
+        state = self._reactor_maintain_state
+        if not state:
+            return False
+        if not self.connected:
+            if state['connected']:
+                state['connected'] = False
+                if self._pause_cnts > 0:
+                    with self._pause_cond:
+                        self._pause_cond.notifyAll()
+                self.disconnect()
+            return False
+        curr_time = time.monotonic()
+        if self._keep_heart:
+            if state['protocol_identifier'] != 3 and self.version_is_ge(1, 8, 6) and self.arm_cmd.set_protocol_identifier(3) == 0:
+                state['protocol_identifier'] = 3
+            if curr_time - state['last_send_time'] > 10 and curr_time - self.arm_cmd.last_comm_time > (30 if state['protocol_identifier'] == 3 else self._timed_comm_interval):
+                code, _ = self.get_state()
+                if code >= 0:
+                    state['last_send_time'] = curr_time
+                if state['protocol_identifier'] == 3 and curr_time - self.arm_cmd.last_comm_time > 90:
+                    logger.error('client timeout over 90s, disconnect')
+                    state['connected'] = False
+                    self.disconnect()
+                    return False
+        if self._enable_report:
+            if not self.reported:
+                if state['reported']:
+                    state['reported'] = False
+                    self._report_connect_changed_callback(True, False)
+                if curr_time - state['last_connect_time'] >= 2:
+                    state['last_connect_time'] = curr_time
+                    self._connect_report()
+            elif not state['reported']:
+                state['reported'] = True
+                self._report_connect_changed_callback(True, True)
+        return True
 
     def __report_callback(self, report_id, item, name=''):
         if report_id in self._report_callbacks.keys():
@@ -1109,39 +1495,115 @@ class Base(BaseObject, Events):
 
     def _report_location_callback(self):
         if self.REPORT_LOCATION_ID in self._report_callbacks.keys():
+            # the payload is built once per frame and shared by the callbacks which subscribe the same items
+            payloads, values = {}, {}
             for item in self._report_callbacks[self.REPORT_LOCATION_ID]:
-                callback = item['callback']
-                ret = {}
-                if item['cartesian']:
-                    ret['cartesian'] = self.position.copy()
-                if item['joints']:
-                    ret['joints'] = self.angles.copy()
-                self._run_callback(callback, ret, name='location')
+                flags = (item['cartesian'], item['joints'])
+                ret = payloads.get(flags, None)
+                if ret is None:
+                    ret = payloads[flags] = self.__build_report_payload(
+                        values, cartesian=item['cartesian'], joints=item['joints'])
+                self._run_callback(item['callback'], ret, name='location', coalesce=True)
 
     def _report_callback(self):
         if self.REPORT_ID in self._report_callbacks.keys():
+            payloads, values = {}, {}
             for item in self._report_callbacks[self.REPORT_ID]:
-                callback = item['callback']
-                ret = {}
-                if item['cartesian']:
-                    ret['cartesian'] = self.position.copy()
-                if item['joints']:
-                    ret['joints'] = self.angles.copy()
-                if item['error_code']:
-                    ret['error_code'] = self._error_code
-                if item['warn_code']:
-                    ret['warn_code'] = self._warn_code
-                if item['state']:
-                    ret['state'] = self._state
-                if item['mtable']:
-                    mtable = [bool(i) for i in self._arm_motor_enable_states]
-                    ret['mtable'] = mtable.copy()
-                if item['mtbrake']:
-                    mtbrake = [bool(i) for i in self._arm_motor_brake_states]
-                    ret['mtbrake'] = mtbrake.copy()
-                if item['cmdnum']:
-                    ret['cmdnum'] = self._cmd_num
-                self._run_callback(callback, ret, name='report')
+                flags = tuple(item[k] for k in self.__REPORT_ITEM_KEYS)
+                ret = payloads.get(flags, None)
+                if ret is None:
+                    ret = payloads[flags] = self.__build_report_payload(
+                        values, **{k: item[k] for k in self.__REPORT_ITEM_KEYS})
+                self._run_callback(item['callback'], ret, name='report', coalesce=True)
+
+    def _report_field_callback(self, report, changes, detector):
+        items = self._report_callbacks.get(self.REPORT_FIELD_ID, None)
+        if not items:
+            return
+        for item in items:
+            field = item['field']
+            # the first frame after registration is always evaluated (the bit is forced by get_bit)
+            if not detector.get_bit(field) & changes and '_value' in item:
+                continue
+            value = get_report_field(report, field)
+            if value is None:
+                continue
+            if item['index'] is not None:
+                if not isinstance(value, list) or not -len(value) <= item['index'] < len(value):
+                    continue
+                value = value[item['index']]
+            threshold = item['threshold']
+            if threshold is not None and isinstance(value, list):
+                continue
+            if threshold is None:
+                if '_value' in item and item['_value'] == value:
+                    continue
+                item['_value'] = value
+                msg = {'field': field, 'index': item['index'], 'value': value}
+            else:
+                above = value > threshold
+                last_above = item.get('_above', None)
+                item['_value'] = value
+                item['_above'] = above
+                if above == last_above or (last_above is None and not above):
+                    continue
+                msg = {'field': field, 'index': item['index'], 'value': value, 'threshold': threshold, 'above': above}
+            self._run_callback(item['callback'], msg, name='report_field')
+
+    def _report_subscription_callback(self, report):
+        items = self._report_callbacks.get(self.REPORT_SUBSCRIPTION_ID, None)
+        if not items:
+            return
+        curr_time = time.monotonic()
+        payloads = {}
+        for item in items:
+            rate = item['rate']
+            if rate > 0:
+                period = 1.0 / rate
+                # 10% tolerance for the jitter of the report frames
+                if curr_time < item['_next_time'] - period * 0.1:
+                    continue
+                next_time = item['_next_time'] + period
+                # keep the phase, but never burst to catch up after a gap
+                item['_next_time'] = next_time if next_time > curr_time else curr_time + period
+            msg = payloads.get(item['fields'], None)
+            if msg is None:
+                # shared by the callbacks with the same fields, so it is read-only (ReadOnlyDict of tuples)
+                msg = {'time': curr_time}
+                for field in item['fields']:
+                    value = get_report_field(report, field)
+                    msg[field] = tuple(value) if isinstance(value, list) else value
+                msg = payloads[item['fields']] = ReadOnlyDict(msg)
+            self._run_callback(item['callback'], msg, name='report_subscription', coalesce=True)
+
+    __REPORT_ITEM_KEYS = ('cartesian', 'joints', 'error_code', 'warn_code', 'state', 'mtable', 'mtbrake', 'cmdnum')
+
+    def __build_report_payload(self, values, cartesian=False, joints=False, error_code=False, warn_code=False,
+                               state=False, mtable=False, mtbrake=False, cmdnum=False):
+        # values: the position/angles of the frame, converted only once for all the payloads
+        # the payload is shared by the callbacks, so it is read-only (ReadOnlyDict of tuples)
+        ret = {}
+        if cartesian:
+            if 'cartesian' not in values:
+                values['cartesian'] = tuple(self.position)
+            ret['cartesian'] = values['cartesian']
+        if joints:
+            if 'joints' not in values:
+                values['joints'] = tuple(self.angles)
+            ret['joints'] = values['joints']
+        if error_code:
+            ret['error_code'] = self._error_code
+        if warn_code:
+            ret['warn_code'] = self._warn_code
+        if state:
+            ret['state'] = self._state
+        if mtable:
+            ret['mtable'] = tuple(bool(i) for i in self._arm_motor_enable_states)
+        if mtbrake:
+            ret['mtbrake'] = tuple(bool(i) for i in self._arm_motor_brake_states)
+        if cmdnum:
+            ret['cmdnum'] = self._cmd_num
+        return ReadOnlyDict(ret)
 
     def _report_thread_handle(self):
         main_socket_connected = self.connected
@@ -1187,10 +1649,7 @@ class Base(BaseObject, Events):
                     self._report_connect_changed_callback(main_socket_connected, report_socket_connected)
                 recv_data = self._stream_report.read(1)
                 if recv_data != -1:
-                    size = convert.bytes_to_u32(recv_data)
-                    if self._is_old_protocol and size > 256:
-                        self._is_old_protocol = False
-                    self._handle_report_data(recv_data)
+                    self._handle_report_frame(recv_data, getattr(self._stream_report.rx_que, 'last_put_time', None))
                 # else:
                 #     if self.connected:
                 #         code, err_warn = self.get_err_warn_code()
@@ -1406,11 +1865,13 @@ class Base(BaseObject, Events):
             self._first_report_over = True
 
         def __handle_report_real(rx_data):
-            state, mode = rx_data[4] & 0x0F, rx_data[4] >> 4
-            cmd_num = convert.bytes_to_u16(rx_data[5:7])
-            angles = convert.bytes_to_fp32s(rx_data[7:7 * 4 + 7], 7)
-            pose = convert.bytes_to_fp32s(rx_data[35:6 * 4 + 35], 6)
-            torque = convert.bytes_to_fp32s(rx_data[59:7 * 4 + 59], 7)
+            report = real_report_decoder.decode(rx_data)
+            changes = self._report_changes = self._real_change_detector.update(rx_data)
+            state, mode = report['state_mode'] & 0x0F, report['state_mode'] >> 4
+            cmd_num = report['cmd_num']
+            angles = report['angles']
+            pose = report['pose']
+            torque = report['torque']
             if cmd_num != self._cmd_num:
                 self._cmd_num = cmd_num
                 self._report_cmdnum_changed_callback()
@@ -1442,38 +1903,42 @@ class Base(BaseObject, Events):
             if not self._is_sync and self._state not in [4, 5]:
                 self._sync()
                 self._is_sync = True
-            length = len(rx_data)
-            if length >= 135:
+            if 'ft_raw_force' in report:
                 # FT_SENSOR
-                self._ft_ext_force = convert.bytes_to_fp32s(rx_data[87:111], 6)
-                self._ft_raw_force = convert.bytes_to_fp32s(rx_data[111:135], 6)
-
-        def __handle_report_normal(rx_data):
+                self._ft_ext_force = report['ft_ext_force']
+                self._ft_raw_force = report['ft_raw_force']
+            self._report_field_callback(report, changes, self._real_change_detector)
+            self._report_subscription_callback(report)
+
+        def __handle_report_normal(rx_data, report=None):
+            is_rich = report is not None
+            if report is None:
+                report = normal_report_decoder.decode(rx_data)
             report_time = time.monotonic()
             interval = report_time - self._last_report_time
             self._max_report_interval = max(self._max_report_interval, interval)
             self._last_report_time = report_time
             # print('length:', convert.bytes_to_u32(rx_data[0:4]), len(rx_data))
-            state, mode = rx_data[4] & 0x0F, rx_data[4] >> 4
+            state, mode = report['state_mode'] & 0x0F, report['state_mode'] >> 4
             # if state != self._state or mode != self._mode:
             #     print('mode: {}, state={}, time={}'.format(mode, state, time.monotonic()))
-            cmd_num = convert.bytes_to_u16(rx_data[5:7])
-            angles = convert.bytes_to_fp32s(rx_data[7:7 * 4 + 7], 7)
-            pose = convert.bytes_to_fp32s(rx_data[35:6 * 4 + 35], 6)
-            torque = convert.bytes_to_fp32s(rx_data[59:7 * 4 + 59], 7)
-            mtbrake, mtable, error_code, warn_code = rx_data[87:91]
-            pose_offset = convert.bytes_to_fp32s(rx_data[91:6 * 4 + 91], 6)
-            tcp_load = convert.bytes_to_fp32s(rx_data[115:4 * 4 + 115], 4)
-            collis_sens, teach_sens = rx_data[131:133]
+            cmd_num = report['cmd_num']
+            angles = report['angles']
+            pose = report['pose']
+            torque = report['torque']
+            mtbrake, mtable, error_code, warn_code = report['mtbrake'], report['mtable'], report['error_code'], report['warn_code']
+            pose_offset = report['pose_offset']
+            tcp_load = report['tcp_load']
+            collis_sens, teach_sens = report['collis_sens'], report['teach_sens']
             # if (collis_sens not in list(range(6)) or teach_sens not in list(range(6))) \
             #         and ((error_code != 0 and error_code not in controller_error_keys) or (warn_code != 0 and warn_code not in controller_warn_keys)):
             #     self._stream_report.close()
             #     logger.warn('ReportDataException: data={}'.format(rx_data))
             #     return
-            length = convert.bytes_to_u32(rx_data[0:4])
+            length = report['length']
             data_len = len(rx_data)
-            if (length != data_len and (length != 233 or data_len != 245)) or collis_sens not in list(range(6)) or teach_sens not in list(range(6)) \
-                or mode not in list(range(12)) or state not in list(range(10)):
+            if not ReportFrameSplitter.is_valid_length(length, data_len) or not 0 <= collis_sens < 6 or not 0 <= teach_sens < 6 \
+                or not 0 <= mode < 12 or not 0 <= state < 10:
                 self._stream_report.close()
                 logger.warn('ReportDataException: length={}, data_len={}, '
                             'state={}, mode={}, collis_sens={}, teach_sens={}, '
@@ -1482,7 +1947,8 @@ class Base(BaseObject, Events):
                     state, mode, collis_sens, teach_sens, error_code, warn_code
                 ))
                 return
-            self._gravity_direction = convert.bytes_to_fp32s(rx_data[133:3*4 + 133], 3)
+            changes = self._report_changes = self._change_detector.update(rx_data)
+            self._gravity_direction = report.get('gravity_direction', self._gravity_direction)
 
             reset_tgpio_params = False
             reset_linear_track_params = False
@@ -1558,15 +2024,18 @@ class Base(BaseObject, Events):
                 self._mode = mode
                 self._report_mode_changed_callback()
 
-            mtbrake = [mtbrake & 0x01, mtbrake >> 1 & 0x01, mtbrake >> 2 & 0x01, mtbrake >> 3 & 0x01,
-                       mtbrake >> 4 & 0x01, mtbrake >> 5 & 0x01, mtbrake >> 6 & 0x01, mtbrake >> 7 & 0x01]
-            mtable = [mtable & 0x01, mtable >> 1 & 0x01, mtable >> 2 & 0x01, mtable >> 3 & 0x01,
-                      mtable >> 4 & 0x01, mtable >> 5 & 0x01, mtable >> 6 & 0x01, mtable >> 7 & 0x01]
-
-            if mtbrake != self._arm_motor_brake_states or mtable != self._arm_motor_enable_states:
-                self._arm_motor_enable_states = mtable
-                self._arm_motor_brake_states = mtbrake
-                self._report_mtable_mtbrake_changed_callback()
+            if changes & (CHANGED_MTBRAKE | CHANGED_MTABLE):
+                mtbrake = [mtbrake & 0x01, mtbrake >> 1 & 0x01, mtbrake >> 2 & 0x01, mtbrake >> 3 & 0x01,
+                           mtbrake >> 4 & 0x01, mtbrake >> 5 & 0x01, mtbrake >> 6 & 0x01, mtbrake >> 7 & 0x01]
+                mtable = [mtable & 0x01, mtable >> 1 & 0x01, mtable >> 2 & 0x01, mtable >> 3 & 0x01,
+                          mtable >> 4 & 0x01, mtable >> 5 & 0x01, mtable >> 6 & 0x01, mtable >> 7 & 0x01]
+                if mtbrake != self._arm_motor_brake_states or mtable != self._arm_motor_enable_states:
+                    self._arm_motor_enable_states = mtable
+                    self._arm_motor_brake_states = mtbrake
+                    self._report_mtable_mtbrake_changed_callback()
+            else:
+                # only written by the report, so the lists of the previous frame are still valid
+                mtbrake, mtable = self._arm_motor_brake_states, self._arm_motor_enable_states
 
             if not self._is_first_report:
                 if state in [4, 5] or not all([bool(item[0] & item[1]) for item in zip(mtbrake, mtable)][:self.axis]):
@@ -1632,23 +2101,27 @@ class Base(BaseObject, Events):
             elif self._need_sync:
                 self._need_sync = False
                 self._sync()
+            if not is_rich:
+                self._report_field_callback(report, changes, self._change_detector)
+                self._report_subscription_callback(report)
 
         def __handle_report_rich(rx_data):
             # print('interval={}, max_interval={}'.format(interval, self._max_report_interval))
-            __handle_report_normal(rx_data)
+            report = rich_report_decoder.decode(rx_data)
+            __handle_report_normal(rx_data, report)
             (self._arm_type,
              arm_axis,
              self._arm_master_id,
              self._arm_slave_id,
              self._arm_motor_tid,
-             self._arm_motor_fid) = rx_data[145:151]
+             self._arm_motor_fid) = report['arm_info']
 
             if 7 >= arm_axis >= 5:
                 self._arm_axis = arm_axis
 
             # self._version = str(rx_data[151:180], 'utf-8')
 
-            trs_msg = convert.bytes_to_fp32s(rx_data[181:201], 5)
+            trs_msg = report['trs']
             # trs_msg = [i[0] for i in trs_msg]
             (self._tcp_jerk,
              self._min_tcp_acc,
@@ -1659,7 +2132,7 @@ class Base(BaseObject, Events):
             #     self._tcp_jerk, self._min_tcp_acc, self._max_tcp_acc, self._min_tcp_speed, self._max_tcp_speed
             # ))
 
-            p2p_msg = convert.bytes_to_fp32s(rx_data[201:221], 5)
+            p2p_msg = report['p2p']
             # p2p_msg = [i[0] for i in p2p_msg]
             (self._joint_jerk,
              self._min_joint_acc,
@@ -1671,12 +2144,12 @@ class Base(BaseObject, Events):
             #     self._min_joint_speed, self._max_joint_speed
             # ))
 
-            rot_msg = convert.bytes_to_fp32s(rx_data[221:229], 2)
+            rot_msg = report['rot']
             # rot_msg = [i[0] for i in rot_msg]
             self._rot_jerk, self._max_rot_acc = rot_msg
             # print('rot_jerk: {}, mac_acc: {}'.format(self._rot_jerk, self._max_rot_acc))
 
-            servo_codes = [val for val in rx_data[229:245]]
+            servo_codes = report['servo_codes']
             for i in range(self.axis):
                 if self._servo_codes[i][0] != servo_codes[i * 2] or self._servo_codes[i][1] != servo_codes[i * 2 + 1]:
                     print('servo_error_code, servo_id={}, status={}, code={}'.format(i + 1, servo_codes[i * 2], servo_codes[i * 2 + 1]))
@@ -1687,25 +2160,26 @@ class Base(BaseObject, Events):
 
             # length = convert.bytes_to_u32(rx_data[0:4])
             length = len(rx_data)
-            if length >= 252:
-                temperatures = list(map(int, rx_data[245:252]))
+            changes = self._report_changes
+            if length >= 252 and changes & CHANGED_TEMPERATURES:
+                temperatures = report['temperatures']
                 if temperatures != self.temperatures:
                     self._temperatures = temperatures
                     self._report_temperature_changed_callback()
             if length >= 284:
-                speeds = convert.bytes_to_fp32s(rx_data[252:8 * 4 + 252], 8)
+                speeds = report['speeds']
                 self._realtime_tcp_speed = speeds[0]
                 self._realtime_joint_speeds = speeds[1:]
                 # print(speeds[0], speeds[1:])
-            if length >= 288:
-                count = convert.bytes_to_u32(rx_data[284:288])
+            if length >= 288 and changes & CHANGED_COUNT:
+                count = report['count']
                 # print(count, rx_data[284:288])
                 if self._count != -1 and count != self._count:
                     self._count = count
                     self._report_count_changed_callback()
                 self._count = count
             if length >= 312:
-                world_offset = convert.bytes_to_fp32s(rx_data[288:6 * 4 + 288], 6)
+                world_offset = report['world_offset']
                 for i in range(len(world_offset)):
                     if i < 3:
                         world_offset[i] = float('{:.3f}'.format(world_offset[i]))
@@ -1714,43 +2188,39 @@ class Base(BaseObject, Events):
                 if math.inf not in world_offset and -math.inf not in world_offset and not (10 <= self._error_code <= 17):
                     self._world_offset = world_offset
             if length >= 314:
-                self._cgpio_reset_enable, self._tgpio_reset_enable = rx_data[312:314]
+                self._cgpio_reset_enable, self._tgpio_reset_enable = report['cgpio_reset_enable'], report['tgpio_reset_enable']
             if length >= 417:
-                self._is_simulation_robot = bool(rx_data[314])
-                self._is_collision_detection, self._collision_tool_type = rx_data[315:317]
-                self._collision_tool_params = convert.bytes_to_fp32s(rx_data[317:341], 6)
-
-                voltages = convert.bytes_to_u16s(rx_data[341:355], 7)
-                voltages = list(map(lambda x: x / 100, voltages))
-                self._voltages = voltages
-
-                currents = convert.bytes_to_fp32s(rx_data[355:383], 7)
-                self._currents = currents
-
-                cgpio_states = []
-                cgpio_states.extend(rx_data[383:385])
-                cgpio_states.extend(convert.bytes_to_u16s(rx_data[385:401], 8))
-                cgpio_states[6:10] = list(map(lambda x: x / 4095.0 * 10.0, cgpio_states[6:10]))
-                cgpio_states.append(list(map(int, rx_data[401:409])))
-                cgpio_states.append(list(map(int, rx_data[409:417])))
+                self._is_simulation_robot = bool(report['is_simulation_robot'])
+                self._is_collision_detection, self._collision_tool_type = report['is_collision_detection'], report['collision_tool_type']
+                self._collision_tool_params = report['collision_tool_params']
+
+                self._voltages = [x / 100 for x in report['voltages']]
+                self._currents = report['currents']
+
+                cgpio_states = report['cgpio_digital'] + report['cgpio_analog']
+                cgpio_states[6:10] = [x / 4095.0 * 10.0 for x in cgpio_states[6:10]]
+                cgpio_states.append(report['cgpio_input_conf'])
+                cgpio_states.append(report['cgpio_output_conf'])
                 if self._control_box_type_is_1300 and length >= 433:
-                    cgpio_states[-2].extend(list(map(int, rx_data[417:425])))
-                    cgpio_states[-1].extend(list(map(int, rx_data[425:433])))
+                    cgpio_states[-2].extend(report['cgpio_input_conf2'])
+                    cgpio_states[-1].extend(report['cgpio_output_conf2'])
                 self._cgpio_states = cgpio_states
             if length >= 481:
                 # FT_SENSOR
-                self._ft_ext_force = convert.bytes_to_fp32s(rx_data[433:457], 6)
-                self._ft_raw_force = convert.bytes_to_fp32s(rx_data[457:481], 6)
-            if length >= 482:
-                iden_progress = rx_data[481]
+                self._ft_ext_force = report['ft_ext_force']
+                self._ft_raw_force = report['ft_raw_force']
+            if length >= 482 and changes & CHANGED_IDEN_PROGRESS:
+                iden_progress = report['iden_progress']
                 if iden_progress != self._iden_progress:
                     self._iden_progress = iden_progress
                     self._report_iden_progress_changed_callback()
             if length >= 494:
-                pose_aa = convert.bytes_to_fp32s(rx_data[482:494], 3)
+                pose_aa = report['pose_aa']
                 for i in range(len(pose_aa)):
                     pose_aa[i] = filter_invaild_number(pose_aa[i], 6, default=self._pose_aa[i])
                 self._pose_aa = self._position[:3] + pose_aa
+            self._report_field_callback(report, changes, self._change_detector)
+            self._report_subscription_callback(report)
 
         try:
             if self._report_type == 'real':
@@ -1945,7 +2415,10 @@ class Base(BaseObject, Events):
                 'LIMIT_ANGLE_ACC': list(map(round, [math.degrees(self._min_joint_acc), math.degrees(self._max_joint_acc)])),
             }
 
-    def _check_code(self, code, is_move_cmd=False, mode=-1):
+    def _check_code(self, code, is_move_cmd=False, mode=-1, is_get_cmd=False):
+        if not is_get_cmd:
+            # called when a command is finished, the report frames received before may not reflect the command
+            self._report_seq_at_cmd = self._report_seq
         if is_move_cmd:
             if code in [0, XCONF.UxbusState.WAR_CODE]:
                 if self.arm_cmd.state_is_ready:
@@ -2003,8 +2476,13 @@ class Base(BaseObject, Events):
     @xarm_is_connected(_type='get')
     def get_position(self, is_radian=None):
         is_radian = self._default_is_radian if is_radian is None else is_radian
+        snapshot = self._get_fresh_report()
+        if snapshot is not None:
+            position = snapshot.position
+            return 0, [float('{:.6f}'.format(math.degrees(position[i]) if 2 < i < 6 and not is_radian else position[i]))
+                       for i in range(len(position))]
         ret = self.arm_cmd.get_tcp_pose()
-        ret[0] = self._check_code(ret[0])
+        ret[0] = self._check_code(ret[0], is_get_cmd=True)
         if ret[0] == 0 and len(ret) > 6:
             self._position = [filter_invaild_number(ret[i], 6, default=self._position[i-1]) for i in range(1, 7)]
         return ret[0], [float(
@@ -2014,19 +2492,24 @@ class Base(BaseObject, Events):
     @xarm_is_connected(_type='get')
     def get_servo_angle(self, servo_id=None, is_radian=None, is_real=False):
         is_radian = self._default_is_radian if is_radian is None else is_radian
-        if is_real and self.version_is_ge(1, 9, 110):
-            ret = self.arm_cmd.get_joint_states(num=1)
+        snapshot = None if is_real else self._get_fresh_report()
+        if snapshot is not None:
+            code, angles = 0, snapshot.angles
         else:
-            ret = self.arm_cmd.get_joint_pos()
-        ret[0] = self._check_code(ret[0])
-        if ret[0] == 0 and len(ret) > 7:
-            self._angles = [filter_invaild_number(ret[i], 6, default=self._angles[i-1]) for i in range(1, 8)]
-        if servo_id is None or servo_id == 8 or len(self._angles) < servo_id:
-            return ret[0], list(
-                map(lambda x: float('{:.6f}'.format(x if is_radian else math.degrees(x))), self._angles))
+            if is_real and self.version_is_ge(1, 9, 110):
+                ret = self.arm_cmd.get_joint_states(num=1)
+            else:
+                ret = self.arm_cmd.get_joint_pos()
+            ret[0] = self._check_code(ret[0], is_get_cmd=True)
+            if ret[0] == 0 and len(ret) > 7:
+                self._angles = [filter_invaild_number(ret[i], 6, default=self._angles[i-1]) for i in range(1, 8)]
+            code, angles = ret[0], self._angles
+        if servo_id is None or servo_id == 8 or len(angles) < servo_id:
+            return code, list(
+                map(lambda x: float('{:.6f}'.format(x if is_radian else math.degrees(x))), angles))
         else:
-            return ret[0], float(
-                '{:.6f}'.format(self._angles[servo_id - 1] if is_radian else math.degrees(self._angles[servo_id - 1])))
+            return code, float(
+                '{:.6f}'.format(angles[servo_id - 1] if is_radian else math.degrees(angles[servo_id - 1])))
 
     @xarm_is_connected(_type='get')
     def get_joint_states(self, is_radian=None, num=3):
@@ -2079,8 +2562,11 @@ class Base(BaseObject, Events):
 
     @xarm_is_connected(_type='get')
     def get_state(self):
+        snapshot = self._get_fresh_report()
+        if snapshot is not None:
+            return 0, snapshot.state
         ret = self.arm_cmd.get_state()
-        ret[0] = self._check_code(ret[0])
+        ret[0] = self._check_code(ret[0], is_get_cmd=True)
         if ret[0] == 0:
             # if ret[1] != self._state:
             #     self._state = ret[1]
@@ -2141,16 +2627,21 @@ class Base(BaseObject, Events):
 
     @xarm_is_connected(_type='get')
     def get_err_warn_code(self, show=False, lang='en'):
-        ret = self.arm_cmd.get_err_code()
         lang = lang if lang == 'cn' else 'en'
-        ret[0] = self._check_code(ret[0])
-        if ret[0] == 0:
-            # if ret[1] != self._error_code or ret[2] != self._warn_code:
-            #     self._error_code, self._warn_code = ret[1:3]
-            #     self._report_error_warn_changed_callback()
-
-            self._error_code, self._warn_code = ret[1:3]
-            self._last_update_err_time = time.monotonic()
+        # the real report has no error/warn code
+        snapshot = self._get_fresh_report() if self._report_type != 'real' else None
+        if snapshot is not None:
+            ret = [0, snapshot.error_code, snapshot.warn_code]
+        else:
+            ret = self.arm_cmd.get_err_code()
+            ret[0] = self._check_code(ret[0], is_get_cmd=True)
+            if ret[0] == 0:
+                # if ret[1] != self._error_code or ret[2] != self._warn_code:
+                #     self._error_code, self._warn_code = ret[1:3]
+                #     self._report_error_warn_changed_callback()
+
+                self._error_code, self._warn_code = ret[1:3]
+                self._last_update_err_time = time.monotonic()
         if show:
             pretty_print('************* {}, {}: {} **************'.format(
                          '获取控制器错误警告码' if lang == 'cn' else 'GetErrorWarnCode',
@@ -2230,6 +2721,97 @@ class Base(BaseObject, Events):
     def _get_feedback_transid(self, feedback_key, studio_wait=False):
         return self._fb_key_transid_map.pop(feedback_key, -1) if not studio_wait else -1
     
+    def _call_with_move_future(self, func, args, kwargs, feedback=True, wait_func=None):
+        """
+        Send the motion without waiting and return a MoveFuture of it
+        :param func: motion api which has the `wait` parameter
+        :param feedback: the future is resolved by the feedback of the motion (firmware supported) or not
+        :param wait_func: wait_func(timeout) => code, waits the motion if there is no feedback, default is wait_move
+        """
+        kwargs['wait'] = False
+        feedback_key = str(uuid.uuid1()) if feedback and self._support_feedback else ''
+        if feedback_key:
+            kwargs['feedback_key'] = feedback_key
+        code = func(self, *args, **kwargs)
+        # the feedback_key given by kwargs is not popped by the api
+        trans_id = self._fb_key_transid_map.pop(feedback_key, -1) if feedback_key else -1
+        future = MoveFuture(trans_id)
+        if code != 0:
+            future._resolve(code)
+        elif trans_id > 0:
+            with self._move_future_lock:
+                # the feedback may arrive before the future is registered
+                if trans_id in self._fb_transid_result_map:
+                    feedback_code = self._fb_transid_result_map.pop(trans_id)
+                else:
+                    feedback_code = None
+                    self._move_futures[trans_id] = future
+            if feedback_code is not None:
+                future._resolve(0, feedback_code=feedback_code)
+            elif kwargs.get('timeout', None) is not None:
+                # the feedback may be lost, resolved with WAIT_FINISH_TIMEOUT if it does not arrive in time
+                timer = threading.Timer(kwargs['timeout'], self._expire_move_future, args=(trans_id, future))
+                timer.daemon = True
+                timer.start()
+                future.add_done_callback(lambda f: timer.cancel())
+        else:
+            timeout = kwargs.get('timeout', None)
+            wait_func = wait_func or self.wait_move
+            if self._move_future_waiter is None:
+                self._move_future_waiter = KeyedWorkerPool(1, name='move-future')
+            if not self._move_future_waiter.submit(self, self._wait_move_future, future, wait_func, timeout):
+                future._resolve(APIState.API_EXCEPTION)
+        return future
+
+    @staticmethod
+    def _wait_move_future(future, wait_func, timeout):
+        try:
+            code = wait_func(timeout)
+        except Exception as e:
+            logger.error('wait move future exception: {}'.format(e))
+            code = APIState.API_EXCEPTION
+        future._resolve(code)
+
+    def _expire_move_future(self, trans_id, future):
+        with self._move_future_lock:
+            if self._move_futures.get(trans_id, None) is not future:
+                return
+            self._move_futures.pop(trans_id, None)
+        # the late feedback of the motion is ignored
+        self._fb_transid_type_map.pop(trans_id, None)
+        future._resolve(APIState.WAIT_FINISH_TIMEOUT)
+
+    def _resolve_move_futures(self, code):
+        with self._move_future_lock:
+            futures = list(self._move_futures.values())
+            self._move_futures.clear()
+        for future in futures:
+            future._resolve(code)
+
+    def _notify_state_event(self):
+        with self._state_cond:
+            self._state_event_seq += 1
+            self._state_cond.notify_all()
+
+    def _wait_state_event(self, event_seq, timeout):
+        """
+        Wait until the next report frame/feedback/disconnection after event_seq (read before checking the state)
+        :return: True if notified, False if timeout
+        """
+        with self._state_cond:
+            return self._state_cond.wait_for(lambda: self._state_event_seq != event_seq, timeout)
+
+    def _get_wait_state(self):
+        """
+        State used by wait_move/_wait_feedback, from the report if it is alive, otherwise from the command channel
+        :return: (code, state), state is None if the report frames after the last command are not received yet
+        """
+        if self._stream_report and self._stream_report.connected:
+            snapshot = self._report_snapshot
+            if snapshot is not None and time.monotonic() - snapshot.host_time < 0.5:
+                return 0, snapshot.state if snapshot.seq >= self._report_seq_at_cmd + 2 else None
+        return self.get_state()
+
     def _set_feedback_key_tranid(self, feedback_key, trans_id, feedback_type=0):
         self._fb_key_transid_map[feedback_key] = trans_id
         self._fb_transid_type_map[trans_id] = feedback_type
@@ -2240,8 +2822,9 @@ class Base(BaseObject, Events):
             expired = time.monotonic() + timeout + (self._sleep_finish_time if self._sleep_finish_time > time.monotonic() else 0)
         else:
             expired = 0
-        state5_cnt = 0
+        state5_time = 0
         while timeout is None or time.monotonic() < expired:
+            event_seq = self._state_event_seq
             if not self.connected:
                 self._fb_transid_result_map.clear()
                 if not ignore_log:
@@ -2252,23 +2835,25 @@ class Base(BaseObject, Events):
                 if not ignore_log:
                     self.log_api_info('wait_feedback, xarm has error, error={}'.format(self.error_code), code=APIState.HAS_ERROR)
                 return APIState.HAS_ERROR, -1
-            code, state = self.get_state()
+            code, state = self._get_wait_state()
             if code != 0:
                 return code, -1
-            if state >= 4:
+            if state is not None and state >= 4:
                 self._sleep_finish_time = 0
-                if state == 5:
-                    state5_cnt += 1
-                if state != 5 or state5_cnt >= 20:
+                if state == 5 and not state5_time:
+                    state5_time = time.monotonic()
+                # state 5 may be transient, it is treated as stopped if lasts 1 second
+                if state != 5 or time.monotonic() - state5_time >= 1:
                     self._fb_transid_result_map.clear()
                     if not ignore_log:
                         self.log_api_info('wait_feedback, xarm is stop, state={}'.format(state), code=APIState.EMERGENCY_STOP)
                     return APIState.EMERGENCY_STOP, -1
-            else:
-                state5_cnt = 0
+            elif state is not None:
+                state5_time = 0
             if trans_id in self._fb_transid_result_map:
                 return 0, self._fb_transid_result_map.pop(trans_id, -1)
-            time.sleep(0.05)
+            # woken up by the report frames/feedback, 0.05 seconds at most when there is no report
+            self._wait_state_event(event_seq, 0.05 if timeout is None else max(0, min(0.05, expired - time.monotonic())))
         return APIState.WAIT_FINISH_TIMEOUT, -1
     
     def wait_move(self, timeout=None, trans_id=-1):
@@ -2279,10 +2864,12 @@ class Base(BaseObject, Events):
         else:
             expired = 0
         _, state = self.get_state()
-        cnt = 0
-        state5_cnt = 0
-        max_cnt = 2 if _ == 0 and state == 1 else 10
+        # the arm is regarded as stopped after the state keeps not moving for the idle time
+        idle_time = 0.05 if _ == 0 and state == 1 else 0.45
+        idle_start = 0
+        state5_time = 0
         while timeout is None or time.monotonic() < expired:
+            event_seq = self._state_event_seq
             if not self.connected:
                 self.log_api_info('wait_move, xarm is disconnect', code=APIState.NOT_CONNECTED)
                 return APIState.NOT_CONNECTED
@@ -2291,33 +2878,38 @@ class Base(BaseObject, Events):
                 return APIState.HAS_ERROR
             if self.mode != 0 and self.mode != 11:
                 return 0
-            code, state = self.get_state()
+            code, state = self._get_wait_state()
             if code != 0:
                 return code
-            if state >= 4:
-                self._sleep_finish_time = 0
-                if state == 5:
-                    state5_cnt += 1
-                if state != 5 or state5_cnt >= 20:
-                    self.log_api_info('wait_move, xarm is stop, state={}'.format(state), code=APIState.EMERGENCY_STOP)
-                    return APIState.EMERGENCY_STOP
-            else:
-                state5_cnt = 0
-            if time.monotonic() < self._sleep_finish_time or state == 3:
-                cnt = 0
-                max_cnt = 2 if state == 3 else max_cnt
-                time.sleep(0.05)
-                continue
-            if state == 0 or state == 1:
-                cnt = 0
-                max_cnt = 2
-                time.sleep(0.05)
-                continue
-            else:
-                cnt += 1
-                if cnt >= max_cnt:
+            wait_time = 0.05
+            if state is not None:
+                if state >= 4:
+                    self._sleep_finish_time = 0
+                    if state == 5 and not state5_time:
+                        state5_time = time.monotonic()
+                    # state 5 may be transient, it is treated as stopped if lasts 1 second
+                    if state != 5 or time.monotonic() - state5_time >= 1:
+                        self.log_api_info('wait_move, xarm is stop, state={}'.format(state), code=APIState.EMERGENCY_STOP)
+                        return APIState.EMERGENCY_STOP
+                else:
+                    state5_time = 0
+                curr_time = time.monotonic()
+                if curr_time < self._sleep_finish_time or state == 3:
+                    idle_start = 0
+                    idle_time = 0.05 if state == 3 else idle_time
+                elif state == 0 or state == 1:
+                    idle_start = 0
+                    idle_time = 0.05
+                elif not idle_start:
+                    idle_start = curr_time
+                elif curr_time - idle_start >= idle_time:
                     return 0
-                time.sleep(0.05)
+                if idle_start:
+                    wait_time = min(wait_time, idle_start + idle_time - curr_time)
+            # woken up by the report frames, 0.05 seconds at most when there is no report
+            if timeout is not None:
+                wait_time = min(wait_time, expired - time.monotonic())
+            self._wait_state_event(event_seq, max(0, wait_time))
         return APIState.WAIT_FINISH_TIMEOUT
 
     @xarm_is_connected(_type='set')
@@ -2508,7 +3100,14 @@ class Base(BaseObject, Events):
         trans_id = convert.bytes_to_u16(data[0:2])
         feedback_type = self._fb_transid_type_map.pop(trans_id, -1)
         if feedback_type != -1:
-            self._fb_transid_result_map[trans_id] = data[12]  # feedback_code
+            with self._move_future_lock:
+                # written and checked under the same lock as the registration of the future
+                future = self._move_futures.pop(trans_id, None)
+                if future is None:
+                    self._fb_transid_result_map[trans_id] = data[12]  # feedback_code
+            if future is not None:
+                future._resolve(0, feedback_code=data[12])
+            self._notify_state_event()
         if feedback_type & data[8] == 0:
             return
         self.__report_callback(self.FEEDBACK_ID, data, name='feedback')
@@ -82,6 +82,24 @@ def xarm_wait_until_cmdnum_lt_max(func):
     return decorator
 
 
+def xarm_move_future(feedback=True, wait_func=None):
+    """
+    Add the `future` kwarg to the motion api, future=True sends the motion without waiting and returns a MoveFuture
+    :param feedback: the future is resolved by the feedback of the motion (if the firmware supports) or not
+    :param wait_func: wait_func(self, timeout) => code, used to wait the motion if there is no feedback, default is wait_move
+    """
+    def _xarm_move_future(func):
+        @functools.wraps(func)
+        def decorator(self, *args, **kwargs):
+            if not kwargs.pop('future', False):
+                return func(self, *args, **kwargs)
+            return self._call_with_move_future(
+                func, args, kwargs, feedback=feedback,
+                wait_func=(lambda timeout: wait_func(self, timeout)) if wait_func else None)
+        return decorator
+    return _xarm_move_future
+
+
 def xarm_is_not_simulation_mode(ret=0):
     def _xarm_is_not_simulation_mode(func):
         @functools.wraps(func)
@@ -17,6 +17,8 @@ REPORT_CMDNUM_CHANGED_ID = 'REPORT_CMDNUM_CHANGED'
 REPORT_TEMPERATURE_CHANGED_ID = 'REPORT_TEMPERATURE_CHANGED'
 REPORT_COUNT_CHANGED_ID = 'REPORT_COUNT_CHANGED'
 REPORT_IDEN_PROGRESS_CHANGED_ID = 'REPORT_IDEN_PROGRESS_CHANGED_ID'
+REPORT_FIELD_ID = 'REPORT_FIELD'
+REPORT_SUBSCRIPTION_ID = 'REPORT_SUBSCRIPTION'
 FEEDBACK_ID = 'FEEDBACK_ID'
 
 
@@ -32,6 +34,8 @@ class Events(object):
     REPORT_TEMPERATURE_CHANGED_ID = REPORT_TEMPERATURE_CHANGED_ID
     REPORT_COUNT_CHANGED_ID = REPORT_COUNT_CHANGED_ID
     REPORT_IDEN_PROGRESS_CHANGED_ID = REPORT_IDEN_PROGRESS_CHANGED_ID
+    REPORT_FIELD_ID = REPORT_FIELD_ID
+    REPORT_SUBSCRIPTION_ID = REPORT_SUBSCRIPTION_ID
     FEEDBACK_ID = FEEDBACK_ID
 
     def __init__(self):
@@ -46,6 +50,8 @@ class Events(object):
             REPORT_CMDNUM_CHANGED_ID: [],
             REPORT_COUNT_CHANGED_ID: [],
             REPORT_IDEN_PROGRESS_CHANGED_ID: [],
+            REPORT_FIELD_ID: [],
+            REPORT_SUBSCRIPTION_ID: [],
             FEEDBACK_ID: []
         }
 
@@ -129,6 +135,20 @@ class Events(object):
     def register_feedback_callback(self, callback=None):
         return self._register_report_callback(FEEDBACK_ID, callback)
 
+    def register_report_field_callback(self, callback=None, field='state', index=None, threshold=None):
+        if not callable(callback):
+            return False
+        for item in self._report_callbacks[REPORT_FIELD_ID]:
+            if item['callback'] == callback and item['field'] == field \
+                    and item['index'] == index and item['threshold'] == threshold:
+                return True
+        return self._register_report_callback(REPORT_FIELD_ID, {
+            'callback': callback,
+            'field': field,
+            'index': index,
+            'threshold': threshold,
+        })
+
     def release_report_callback(self, callback=None):
         return self._release_report_callback(REPORT_ID, callback)
 
@@ -164,3 +184,10 @@ class Events(object):
     
     def release_feedback_callback(self, callback=None):
         return self._release_report_callback(FEEDBACK_ID, callback)
+
+    def release_report_field_callback(self, callback=None):
+        if callback is None:
+            return self._release_report_callback(REPORT_FIELD_ID, None)
+        items = self._report_callbacks[REPORT_FIELD_ID]
+        items[:] = [item for item in items if item['callback'] != callback]
+        return True
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import asyncio
+from concurrent.futures import Future
+
+
+class MoveFuture(Future):
+    """
+    Completion of a motion command, returned by the motion api with future=True
+    result() is the code, same as the return of the api with wait=True (0 means the motion is finished)
+    Can be awaited in the coroutine: code = await arm.set_position(..., future=True)
+    Note:
+        1. resolved by the feedback of the motion (trans_id) if the firmware supports (firmware_version >= 2.0.102),
+            otherwise the motion is waited by wait_move in a background thread (one per arm, the waits run in order)
+        2. resolved with the code of the command at once if the command is failed
+        3. resolved with APIState.HAS_ERROR/EMERGENCY_STOP/NOT_CONNECTED if the arm has error/is stopped/is disconnected
+    """
+    def __init__(self, trans_id=-1):
+        super(MoveFuture, self).__init__()
+        self.trans_id = trans_id
+        self.feedback_code = None
+
+    @property
+    def code(self):
+        """
+        code of the motion, None if not finished
+        """
+        return self.result() if self.done() else None
+
+    def _resolve(self, code, feedback_code=None):
+        if self.done():
+            return
+        self.feedback_code = feedback_code
+        try:
+            self.set_result(code)
+        except Exception:
+            pass
+
+    def __await__(self):
+        return asyncio.wrap_future(self).__await__()
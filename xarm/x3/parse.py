@@ -29,26 +29,95 @@ GCODE_PARAM_V = 'V'  # Value
 GCODE_PARAM_D = 'D'  # Addr
 
 
+# letters of the commands, the first one found in this order is the command of the line
+GCODE_CMD_LETTERS = ('G', 'H', 'M', 'D', 'S', 'C')
+# the numbers of the motion commands (G1/G2/G7/G9), which can be sent in batches
+GCODE_MOTION_NUMS = (1, 2, 7, 9)
+
+# one pass over the line yields all the words, D{addr} is hex (3-4 chars), the others are decimal
+_GCODE_WORD_PATTERN = re.compile(r'(D)(-?\w{3,4})|([A-Z])(-?\d+\.?\d*)')
+
+
 class GcodeParser:
     def __init__(self):
         self._int_val = 0
         self._float_val = 0.0
 
     @staticmethod
-    def __get_value(string, ch, return_type, default=None):
-        pattern = '{}(\-?\d+\.?\d*)'.format(ch)
-        data = re.findall(pattern, string)
-        if len(data) > 0:
-            return return_type(data[0])
-        return default
+    def tokenize(string):
+        """
+        :param string: line of gcode (upper case)
+        :return: dict of {letter: value string}, the first word of every letter
+        """
+        words = {}
+        for hex_ch, hex_val, ch, val in _GCODE_WORD_PATTERN.findall(string):
+            if hex_ch:
+                ch, val = hex_ch, hex_val
+            if ch not in words:
+                words[ch] = val
+        return words
+
+    def _get_words(self, string):
+        # the getters accept the line or its words (tokenize once, get many)
+        return string if isinstance(string, dict) else self.tokenize(string)
+
+    def compile_line(self, string):
+        """
+        :param string: line of gcode
+        :return: (letter, num, words), the compiled command, letter is None if the line has no command
+            words are the other words of the line
+        """
+        words = self.tokenize(string.strip().upper())
+        for ch in GCODE_CMD_LETTERS:
+            num = self.__to_number(words.get(ch, None), int, None)
+            if num is not None and num >= 0:
+                words.pop(ch)
+                return ch, num, words
+        return None, -1, words
+
+    def compile(self, lines):
+        """
+        Compile the lines one by one (streaming), the lines without command are skipped
+        :param lines: iterable of the gcode lines, such as an opened file
+        :return: generator of the compiled commands (letter, num, words)
+        """
+        for line in lines:
+            cmd = self.compile_line(line)
+            if cmd[0] is not None:
+                yield cmd
+
+    @staticmethod
+    def format_cmd(cmd):
+        """
+        :param cmd: compiled command (letter, num, words)
+        :return: line of gcode
+        """
+        letter, num, words = cmd
+        return ' '.join(['{}{}'.format(letter, num)] + ['{}{}'.format(k, v) for k, v in words.items()])
 
     @staticmethod
-    def __get_hex_value(string, ch, default=None):
-        pattern = '{}(-?\w{{3,4}})'.format(ch)
-        data = re.findall(pattern, string)
-        if len(data) > 0:
-            return int(data[0], base=16)
-        return default
+    def __to_number(value, return_type, default):
+        if value is None:
+            return default
+        try:
+            return return_type(value)
+        except ValueError:
+            try:
+                return return_type(float(value))
+            except ValueError:
+                return default
+
+    def __get_value(self, string, ch, return_type, default=None):
+        return self.__to_number(self._get_words(string).get(ch, None), return_type, default)
+
+    def __get_hex_value(self, string, ch, default=None):
+        value = self._get_words(string).get(ch, None)
+        if value is None or len(value.lstrip('-')) < 3:
+            return default
+        try:
+            return int(value, base=16)
+        except ValueError:
+            return default
 
     def _get_int_value(self, string, ch, default=None):
         return self.__get_value(string, ch, int, default=default)
@@ -89,22 +158,26 @@ class GcodeParser:
         return self._get_int_value(string, GCODE_PARAM_I, default=default)
 
     def get_poses(self, string, default=None):
+        # the command word of the line is skipped
+        string = self._get_words(string[2:] if isinstance(string, str) else string)
         pose = [None] * 6
-        pose[0] = self._get_float_value(string[2:], GCODE_PARAM_X, default=default)
-        pose[1] = self._get_float_value(string[2:], GCODE_PARAM_Y, default=default)
-        pose[2] = self._get_float_value(string[2:], GCODE_PARAM_Z, default=default)
-        pose[3] = self._get_float_value(string[2:], GCODE_PARAM_A, default=default)
-        pose[4] = self._get_float_value(string[2:], GCODE_PARAM_B, default=default)
-        pose[5] = self._get_float_value(string[2:], GCODE_PARAM_C, default=default)
+        pose[0] = self._get_float_value(string, GCODE_PARAM_X, default=default)
+        pose[1] = self._get_float_value(string, GCODE_PARAM_Y, default=default)
+        pose[2] = self._get_float_value(string, GCODE_PARAM_Z, default=default)
+        pose[3] = self._get_float_value(string, GCODE_PARAM_A, default=default)
+        pose[4] = self._get_float_value(string, GCODE_PARAM_B, default=default)
+        pose[5] = self._get_float_value(string, GCODE_PARAM_C, default=default)
         return pose
 
     def get_joints(self, string, default=None):
+        # the command word of the line is skipped
+        string = self._get_words(string[2:] if isinstance(string, str) else string)
         joints = [None] * 7
-        joints[0] = self._get_float_value(string[2:], GCODE_PARAM_I, default=default)
-        joints[1] = self._get_float_value(string[2:], GCODE_PARAM_J, default=default)
-        joints[2] = self._get_float_value(string[2:], GCODE_PARAM_K, default=default)
-        joints[3] = self._get_float_value(string[2:], GCODE_PARAM_L, default=default)
-        joints[4] = self._get_float_value(string[2:], GCODE_PARAM_M, default=default)
-        joints[5] = self._get_float_value(string[2:], GCODE_PARAM_N, default=default)
-        joints[6] = self._get_float_value(string[2:], GCODE_PARAM_O, default=default)
+        joints[0] = self._get_float_value(string, GCODE_PARAM_I, default=default)
+        joints[1] = self._get_float_value(string, GCODE_PARAM_J, default=default)
+        joints[2] = self._get_float_value(string, GCODE_PARAM_K, default=default)
+        joints[3] = self._get_float_value(string, GCODE_PARAM_L, default=default)
+        joints[4] = self._get_float_value(string, GCODE_PARAM_M, default=default)
+        joints[5] = self._get_float_value(string, GCODE_PARAM_N, default=default)
+        joints[6] = self._get_float_value(string, GCODE_PARAM_O, default=default)
         return joints
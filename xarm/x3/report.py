@@ -1,12 +1,16 @@
-from xarm.core.utils import convert
+from xarm.core.comm.base import RxBuffer, ReportFrameSplitter
+from xarm.core.utils.report_decoder import real_report_decoder, normal_report_decoder, rich_report_decoder
 
 
 class ReportHandler(object):
+    """
+    Incremental parser of the report stream (new protocol), also usable offline on recorded captures
+    The received data is kept in a preallocated buffer, all the complete frames of every chunk are parsed
+    :param report_type: 'real'('devlop')/'normal'/'rich'
+    """
     def __init__(self, report_type):
-        self.buffer = b''
-        self.report_size = 0
         self.report_type = report_type
-        if self.report_type == 'devlop':
+        if self.report_type in ['real', 'devlop']:
             self.parse_handler = self._parse_report_tcp_develop_data
         elif self.report_type == 'normal':
             self.parse_handler = self._parse_report_tcp_normal_data
@@ -14,64 +18,86 @@ class ReportHandler(object):
             self.parse_handler = self._parse_report_tcp_rich_data
         else:
             self.parse_handler = None
+        self._rx_buffer = RxBuffer()
+        self._splitter = ReportFrameSplitter()
         self.source_data = b''
         self.parse_dict = {}
 
+    @property
+    def report_size(self):
+        return self._splitter.size
+
     def reset(self):
-        self.buffer = b''
-        self.report_size = 0
+        self._rx_buffer.clear()
+        self._splitter.reset()
+
+    def iter_frames(self, recv_data):
+        """
+        :param recv_data: chunk of the report stream
+        :return: generator of the complete frames (bytes), the incomplete tail is kept for the next chunk
+            raise ValueError if the stream is broken (the buffer is reset)
+        """
+        self._rx_buffer.extend(recv_data)
+        try:
+            for data in self._splitter.split(self._rx_buffer):
+                yield data
+        except ValueError:
+            self.reset()
+            raise
+
+    def feed(self, recv_data):
+        """
+        :param recv_data: chunk of the report stream
+        :return: generator of the parse results (dict) of all the complete frames in the chunk
+        """
+        for data in self.iter_frames(recv_data):
+            self.source_data = data
+            self.parse_dict = {}
+            if self.parse_handler:
+                self.parse_handler(data)
+            yield self.parse_dict
 
     def process_report_data(self, recv_data):
+        """
+        :return: parse result (list) of the last complete frame, None if no complete frame, -1 if the stream is broken
+        """
         if recv_data == -1:
             return
-        self.buffer += recv_data
-        if len(self.buffer) < 4:
-            return
-        if self.report_size == 0:
-            self.report_size = convert.bytes_to_u32(self.buffer[:4])
-        if len(self.buffer) < self.report_size:
-            return
-        if self.report_type == 'rich' and self.report_size == 233 and len(self.buffer) >= 245:
-            # 兼容某几版固件上报的数据的数据长度和实际数据的长度不一致
-            try:
-                if len(self.buffer) >= 249:
-                    if convert.bytes_to_u32(self.buffer[245:249]) != self.report_size:
-                        if convert.bytes_to_u32(self.buffer[233:237]) == self.report_size:
-                            data = self.buffer[:self.report_size]
-                            self.buffer = self.buffer[self.report_size:]
-                        else:
-                            self.reset()
-                            # TODO reconnect
-                            return -1
-                    else:
-                        data = self.buffer[:245]
-                        self.buffer = self.buffer[245:]
-                else:
-                    if convert.bytes_to_u32(self.buffer[233:237]) != self.report_size:
-                        data = self.buffer[:245]
-                        self.buffer = self.buffer[245:]
-                    else:
-                        data = self.buffer[:self.report_size]
-                        self.buffer = self.buffer[self.report_size:]
-            except:
-                self.reset()
-                # TODO reconnect
-                return -1
-        else:
-            data = self.buffer[:self.report_size]
-            self.buffer = self.buffer[self.report_size:]
-        self.source_data = data
-        if self.parse_handler:
-            return self.parse_handler(data)
+        ret = None
+        try:
+            for data in self.iter_frames(recv_data):
+                self.source_data = data
+                self.parse_dict = {}
+                if self.parse_handler:
+                    ret = self.parse_handler(data)
+        except ValueError:
+            # TODO reconnect
+            return -1
+        return ret
 
-    def __parse_report_common_data(self, rx_data):
+    @classmethod
+    def parse_capture(cls, report_type, chunks):
+        """
+        Parse a recorded report stream
+        :param report_type: 'real'/'normal'/'rich'
+        :param chunks: iterable of the bytes chunks (such as a file opened in binary mode read by blocks), or bytes
+        :return: generator of the parse results (dict)
+        """
+        handler = cls(report_type)
+        if isinstance(chunks, (bytes, bytearray, memoryview)):
+            chunks = [chunks]
+        for chunk in chunks:
+            for parse_dict in handler.feed(chunk):
+                yield parse_dict
+
+    def __parse_report_common_data(self, rx_data, report):
         # length = convert.bytes_to_u32(rx_data[0:4])
         length = len(rx_data)
-        state, mode = rx_data[4] & 0x0F, rx_data[4] >> 4
-        cmd_num = convert.bytes_to_u16(rx_data[5:7])
-        angles = convert.bytes_to_fp32s(rx_data[7:7 * 4 + 7], 7)
-        pose = convert.bytes_to_fp32s(rx_data[35:6 * 4 + 35], 6)
-        torque = convert.bytes_to_fp32s(rx_data[59:7 * 4 + 59], 7)
+        state, mode = report['state_mode'] & 0x0F, report['state_mode'] >> 4
+        cmd_num = report['cmd_num']
+        angles = report['angles']
+        pose = report['pose']
+        torque = report['torque']
         self.parse_dict['length'] = length
         self.parse_dict['state'] = state
         self.parse_dict['mode'] = mode
@@ -82,16 +108,18 @@ class ReportHandler(object):
         return [length, state, mode, cmd_num, angles, pose, torque]
 
     def _parse_report_tcp_develop_data(self, rx_data):
-        ret = self.__parse_report_common_data(rx_data)
+        ret = self.__parse_report_common_data(rx_data, real_report_decoder.decode(rx_data))
         return ret
 
-    def _parse_report_tcp_normal_data(self, rx_data):
-        ret = self.__parse_report_common_data(rx_data)
-        mtbrake, mtable, error_code, warn_code = rx_data[87:91]
-        tcp_offset = convert.bytes_to_fp32s(rx_data[91:6 * 4 + 91], 6)
-        tcp_load = convert.bytes_to_fp32s(rx_data[115:4 * 4 + 115], 4)
-        collis_sens, teach_sens = rx_data[131:133]
-        gravity_direction = convert.bytes_to_fp32s(rx_data[133:3 * 4 + 133], 3)
+    def _parse_report_tcp_normal_data(self, rx_data, report=None):
+        if report is None:
+            report = normal_report_decoder.decode(rx_data)
+        ret = self.__parse_report_common_data(rx_data, report)
+        mtbrake, mtable, error_code, warn_code = report['mtbrake'], report['mtable'], report['error_code'], report['warn_code']
+        tcp_offset = report['pose_offset']
+        tcp_load = report['tcp_load']
+        collis_sens, teach_sens = report['collis_sens'], report['teach_sens']
+        gravity_direction = report['gravity_direction']
         mtbrake = [mtbrake & 0x01, mtbrake >> 1 & 0x01, mtbrake >> 2 & 0x01, mtbrake >> 3 & 0x01,
                    mtbrake >> 4 & 0x01, mtbrake >> 5 & 0x01, mtbrake >> 6 & 0x01, mtbrake >> 7 & 0x01]
         mtable = [mtable & 0x01, mtable >> 1 & 0x01, mtable >> 2 & 0x01, mtable >> 3 & 0x01,
@@ -109,10 +137,11 @@ class ReportHandler(object):
         return ret
 
     def _parse_report_tcp_rich_data(self, rx_data):
-        ret = self._parse_report_tcp_normal_data(rx_data)
+        report = rich_report_decoder.decode(rx_data)
+        ret = self._parse_report_tcp_normal_data(rx_data, report)
         length = ret[0]
         if length >= 151:
-            arm_type, arm_axis, arm_master_id, arm_slave_id, arm_motor_tid, arm_motor_fid = rx_data[145:151]
+            arm_type, arm_axis, arm_master_id, arm_slave_id, arm_motor_tid, arm_motor_fid = report['arm_info']
             self.parse_dict['arm_type'] = arm_type
             self.parse_dict['arm_axis'] = arm_axis
             self.parse_dict['arm_master_id'] = arm_master_id
@@ -121,12 +150,11 @@ class ReportHandler(object):
             self.parse_dict['arm_motor_fid'] = arm_motor_fid
             ret.extend([arm_type, arm_axis, arm_master_id, arm_slave_id, arm_motor_tid, arm_motor_fid])
         if length >= 181:
-            version = str(rx_data[151:180], 'utf-8')
+            version = str(report['version'][:29], 'utf-8')
             self.parse_dict['version'] = version
             ret.append(version)
         if length >= 201:
-            trs_msg = convert.bytes_to_fp32s(rx_data[181:201], 5)
-            tcp_jerk, min_tcp_acc, max_tcp_acc, min_tcp_speed, max_tcp_speed = trs_msg
+            tcp_jerk, min_tcp_acc, max_tcp_acc, min_tcp_speed, max_tcp_speed = report['trs']
             self.parse_dict['tcp_jerk'] = tcp_jerk
             self.parse_dict['min_tcp_acc'] = min_tcp_acc
             self.parse_dict['max_tcp_acc'] = max_tcp_acc
@@ -134,8 +162,7 @@ class ReportHandler(object):
             self.parse_dict['max_tcp_speed'] = max_tcp_speed
             ret.extend([tcp_jerk, min_tcp_acc, max_tcp_acc, min_tcp_speed, max_tcp_speed])
         if length >= 221:
-            p2p_msg = convert.bytes_to_fp32s(rx_data[201:221], 5)
-            joint_jerk, min_joint_acc, max_joint_acc, min_joint_speed, max_joint_speed = p2p_msg
+            joint_jerk, min_joint_acc, max_joint_acc, min_joint_speed, max_joint_speed = report['p2p']
             self.parse_dict['joint_jerk'] = joint_jerk
             self.parse_dict['min_joint_acc'] = min_joint_acc
             self.parse_dict['max_joint_acc'] = max_joint_acc
@@ -143,62 +170,54 @@ class ReportHandler(object):
             self.parse_dict['max_joint_speed'] = max_joint_speed
             ret.extend([joint_jerk, min_joint_acc, max_joint_acc, min_joint_speed, max_joint_speed])
         if length >= 229:
-            rot_msg = convert.bytes_to_fp32s(rx_data[221:229], 2)
-            rot_jerk, max_rot_acc = rot_msg
+            rot_jerk, max_rot_acc = report['rot']
             self.parse_dict['rot_jerk'] = rot_jerk
             self.parse_dict['max_rot_acc'] = max_rot_acc
             ret.extend([rot_jerk, max_rot_acc])
         if length >= 245:
-            servo_code = [val for val in rx_data[229:245]]
+            servo_code = report['servo_codes']
             self.parse_dict['servo_code'] = servo_code
             ret.extend([servo_code[:-2], servo_code[-2:]])
         if length >= 252:
-            temperatures = list(map(int, rx_data[245:252]))
+            temperatures = report['temperatures']
             self.parse_dict['temperatures'] = temperatures
             ret.append(temperatures)
         if length >= 284:
-            speeds = convert.bytes_to_fp32s(rx_data[252:8 * 4 + 252], 8)
+            speeds = report['speeds']
             self.parse_dict['speeds'] = speeds
             ret.append(speeds)
         if length >= 288:
-            count = convert.bytes_to_u32(rx_data[284:288])
+            count = report['count']
             self.parse_dict['count'] = count
             ret.append(count)
         if length >= 312:
-            world_offset = convert.bytes_to_fp32s(rx_data[288:6 * 4 + 288], 6)
+            world_offset = report['world_offset']
             self.parse_dict['world_offset'] = world_offset
             ret.append(world_offset)
         if length >= 314:
-            cgpio_reset_enable, tgpio_reset_enable = rx_data[312:314]
+            cgpio_reset_enable, tgpio_reset_enable = report['cgpio_reset_enable'], report['tgpio_reset_enable']
             self.parse_dict['cgpio_reset_enable'] = cgpio_reset_enable
             self.parse_dict['tgpio_reset_enable'] = tgpio_reset_enable
             ret.extend([cgpio_reset_enable, tgpio_reset_enable])
-        if length >= 416:
-        # if length >= 340:
-            is_collision_check, collision_tool_type = rx_data[314:316]
-            collision_tool_params = convert.bytes_to_fp32s(rx_data[316:340], 6)
+        if length >= 417:
+            # the byte 314 is is_simulation_robot
+            is_collision_check, collision_tool_type = report['is_collision_detection'], report['collision_tool_type']
+            collision_tool_params = report['collision_tool_params']
             self.parse_dict['is_collision_check'] = is_collision_check
             self.parse_dict['collision_tool_type'] = collision_tool_type
             self.parse_dict['collision_tool_params'] = collision_tool_params
             ret.extend([is_collision_check, collision_tool_type, collision_tool_params])
-        # if length >= 354:
-            voltages = convert.bytes_to_u16s(rx_data[340:354], 7)
-            voltages = list(map(lambda x: x / 100, voltages))
+            voltages = [x / 100 for x in report['voltages']]
             self.parse_dict['voltages'] = voltages
             ret.append(voltages)
-        # if length >= 382:
-            currents = convert.bytes_to_fp32s(rx_data[354:382], 7)
+            currents = report['currents']
             self._currents = currents
             self.parse_dict['currents'] = currents
             ret.append(currents)
-        # if length >= 416:
-            cgpio_states = []
-            cgpio_states.extend(rx_data[382:384])
-            cgpio_states.extend(convert.bytes_to_u16s(rx_data[384:400], 8))
-            cgpio_states[6:10] = list(map(lambda x: x / 4095.0 * 10.0, cgpio_states[6:10]))
-            cgpio_states.append(list(map(int, rx_data[400:408])))
-            cgpio_states.append(list(map(int, rx_data[408:416])))
+            cgpio_states = report['cgpio_digital'] + report['cgpio_analog']
+            cgpio_states[6:10] = [x / 4095.0 * 10.0 for x in cgpio_states[6:10]]
+            cgpio_states.append(report['cgpio_input_conf'])
+            cgpio_states.append(report['cgpio_output_conf'])
             self.parse_dict['cgpio_states'] = cgpio_states
             ret.append(cgpio_states)
         return ret
-
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import math
+from collections import namedtuple
+
+REPORT_SNAPSHOT_FIELDS = (
+    'seq',  # number of the report frames handled since connected
+    'host_time',  # time.monotonic() when the frame was received
+    'ctrl_time',  # timestamp of the controller (microseconds), 0 if the frame has no timestamp (only the rich report has)
+    'is_radian',
+    'state', 'mode', 'cmd_num', 'error_code', 'warn_code',
+    'angles', 'position', 'position_aa', 'position_offset', 'joints_torque',
+    'realtime_joint_speeds', 'realtime_tcp_speed',
+    'currents', 'voltages', 'temperatures',
+    'ft_ext_force', 'ft_raw_force',
+    'motor_brake_states', 'motor_enable_states', 'count',
+)
+
+
+class ReportSnapshot(namedtuple('ReportSnapshot', REPORT_SNAPSHOT_FIELDS)):
+    """
+    Immutable state of one report frame, a new snapshot replaces the old one by a single reference assignment,
+    so all the fields of a snapshot always come from the same frame
+    Note: the list fields are tuples, angles/position/position_aa/position_offset are radian if is_radian else degree
+    """
+    __slots__ = ()
+
+    def to_degree(self):
+        if not self.is_radian:
+            return self
+        return self._replace(
+            is_radian=False,
+            angles=tuple(math.degrees(x) for x in self.angles),
+            position=_pose_to_degree(self.position),
+            position_aa=_pose_to_degree(self.position_aa),
+            position_offset=_pose_to_degree(self.position_offset),
+        )
+
+    def to_dict(self):
+        return dict(zip(self._fields, self))
+
+
+def _pose_to_degree(pose):
+    return tuple(math.degrees(x) if 2 < i < 6 else x for i, x in enumerate(pose))
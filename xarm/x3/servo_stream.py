@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2024, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import asyncio
+from ..core.utils.log import logger
+from ..core.utils.stats import Histogram
+
+# mode => (name of the api, mode of the arm)
+SERVO_STREAM_MODES = {
+    'servo_j': ('set_servo_angle_j', 1),
+    'servo_cartesian': ('set_servo_cartesian', 1),
+    'joint_velocity': ('vc_set_joint_velocity', 4),
+    'cartesian_velocity': ('vc_set_cartesian_velocity', 5),
+}
+
+_END = object()
+
+
+class ServoStreamer(object):
+    """
+    Push the setpoints of a trajectory at a fixed period, scheduled by monotonic deadlines
+    The deadline of the setpoint k is start_time + k * period, so the sleep jitter never accumulates (no drift)
+    :param arm: XArm instance
+    :param mode: 'servo_j'/'servo_cartesian'/'joint_velocity'/'cartesian_velocity'
+    :param period: send period (seconds)
+    :param spin: the last part (seconds) before the deadline is busy-waited instead of sleeping, 0 means always sleep (run only)
+    :param skip_late: drop the setpoints whose next deadline already passed (instead of sending them in a burst)
+    :param kwargs: passed to the api of the mode, such as speed/mvacc/is_radian/is_tool_coord/duration
+    """
+    def __init__(self, arm, mode='servo_j', period=0.004, spin=0.0005, skip_late=False, **kwargs):
+        if mode not in SERVO_STREAM_MODES:
+            raise ValueError('mode must be one of {}'.format(list(SERVO_STREAM_MODES.keys())))
+        self.mode = mode
+        self.period = period
+        self.spin = spin
+        self.skip_late = skip_late
+        self._arm = arm
+        self._send = getattr(arm, SERVO_STREAM_MODES[mode][0])
+        self._kwargs = kwargs
+        self._alive = False
+        self.reset_stats()
+
+    @property
+    def running(self):
+        return self._alive
+
+    def reset_stats(self):
+        self._stats = {
+            'sent': 0,
+            'failed': 0,
+            'skipped': 0,
+            'overruns': 0,
+            'last_code': 0,
+            # how late the send started after its deadline (ms)
+            'late': Histogram(over=self.period * 1000 / 2),
+            # duration of the api call (ms)
+            'send': Histogram(over=self.period * 1000),
+        }
+
+    def get_stats(self):
+        """
+        :return: {
+                'sent', 'failed' (code != 0), 'skipped' (skip_late), 'overruns' (the send finished after the next deadline),
+                'last_code', 'late' (histogram, ms), 'send' (histogram, ms)
+            }
+        """
+        return {k: (v.to_dict() if isinstance(v, Histogram) else v) for k, v in self._stats.items()}
+
+    def stop(self):
+        """
+        Stop the running stream after the current setpoint
+        """
+        self._alive = False
+
+    def _send_point(self, point, deadline):
+        start_time = time.monotonic()
+        self._stats['late'].record(max(0, start_time - deadline) * 1000)
+        code = self._send(point.tolist() if hasattr(point, 'tolist') else list(point), **self._kwargs)
+        end_time = time.monotonic()
+        self._stats['send'].record((end_time - start_time) * 1000)
+        self._stats['sent'] += 1
+        self._stats['last_code'] = code
+        if code != 0:
+            self._stats['failed'] += 1
+        if end_time > deadline + self.period:
+            self._stats['overruns'] += 1
+        return code
+
+    def _advance(self, points, deadline):
+        """
+        :return: (deadline of the next setpoint, False) or (None, True) if the trajectory ends while skipping
+        """
+        deadline += self.period
+        if self.skip_late:
+            skip = int((time.monotonic() - deadline) / self.period)
+            for _ in range(skip):
+                if next(points, _END) is _END:
+                    return None, True
+                self._stats['skipped'] += 1
+                deadline += self.period
+        return deadline, False
+
+    def _start(self):
+        arm_mode = SERVO_STREAM_MODES[self.mode][1]
+        if self._arm.mode != arm_mode:
+            logger.warn('servo stream, mode={} requires the arm in mode {}, but it is {}'.format(
+                self.mode, arm_mode, self._arm.mode))
+        self._alive = True
+
+    def run(self, trajectory, stop_on_error=True):
+        """
+        Stream the trajectory in the calling thread
+        :param trajectory: iterable of the setpoints, such as a 2D NumPy array (one row per setpoint) or a generator
+        :param stop_on_error: stop if the api returns a non-zero code
+        :return: code of the last send, 0 if nothing is sent
+        """
+        self._start()
+        code = 0
+        try:
+            points = iter(trajectory)
+            deadline = time.monotonic()
+            for point in points:
+                if not self._alive:
+                    break
+                self._sleep_until(deadline)
+                code = self._send_point(point, deadline)
+                if code != 0 and stop_on_error:
+                    logger.error('servo stream stopped, mode={}, code={}'.format(self.mode, code))
+                    break
+                deadline, is_end = self._advance(points, deadline)
+                if is_end:
+                    break
+        finally:
+            self._alive = False
+        return code
+
+    async def run_async(self, trajectory, stop_on_error=True):
+        """
+        Stream the trajectory in the running asyncio loop, the deadlines are waited by asyncio.sleep (no busy-wait)
+        Note: the api is called in the default executor of the loop, the loop is not blocked by the round-trips
+        :return: code of the last send, 0 if nothing is sent
+        """
+        self._start()
+        code = 0
+        loop = asyncio.get_event_loop()
+        try:
+            points = iter(trajectory)
+            deadline = time.monotonic()
+            for point in points:
+                if not self._alive:
+                    break
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                code = await loop.run_in_executor(None, self._send_point, point, deadline)
+                if code != 0 and stop_on_error:
+                    logger.error('servo stream stopped, mode={}, code={}'.format(self.mode, code))
+                    break
+                deadline, is_end = self._advance(points, deadline)
+                if is_end:
+                    break
+        finally:
+            self._alive = False
+        return code
+
+    def _sleep_until(self, deadline):
+        delay = deadline - time.monotonic() - self.spin
+        if delay > 0:
+            time.sleep(delay)
+        self._spin_until(deadline)
+
+    @staticmethod
+    def _spin_until(deadline):
+        while time.monotonic() < deadline:
+            pass
@@ -8,7 +8,7 @@ from ..core.utils.log import logger
 from ..core.utils import convert
 from .code import APIState
 from .gpio import GPIO
-from .decorator import xarm_is_connected, xarm_wait_until_not_pause, xarm_is_not_simulation_mode
+from .decorator import xarm_is_connected, xarm_wait_until_not_pause, xarm_is_not_simulation_mode, xarm_move_future
 
 
 class Track(GPIO):
@@ -147,8 +147,9 @@ class Track(GPIO):
             ret[0] = self.set_linear_track_enable(True)
         return ret[0] if self.linear_track_error_code == 0 else APIState.LINEAR_TRACK_HAS_FAULT
 
+    @xarm_move_future(feedback=False, wait_func=lambda self, timeout: self.__wait_linear_track_stop(timeout))
     @xarm_is_connected(_type='set')
-    @xarm_is_not_simulation_mode(ret=(0, []))
+    @xarm_is_not_simulation_mode(ret=0)
     def set_linear_track_pos(self, pos, speed=None, wait=True, timeout=100, **kwargs):
         code = self.checkset_modbus_baud(self._default_linear_track_baud, host_id=XCONF.LINEER_TRACK_HOST_ID)
         if code != 0:
@@ -41,3 +41,21 @@ def filter_invaild_number(num, ndigits=3, default=0.0):
 def to_radian(val, is_radian=False, default=0):
     return default if val is None else float(val) if is_radian else math.radians(val)
 
+
+
+class ReadOnlyDict(dict):
+    """
+    Dict which can not be modified, used for the data shared by the callbacks
+    It is still a dict for json/pickle/copy, a copy (dict(data), pickle, copy.deepcopy) is a normal dict
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('{} is read-only, copy it (dict(data)) to modify'.format(self.__class__.__name__))
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
@@ -9,11 +9,16 @@
 import os
 import math
 import time
+import random
+import threading
 import uuid
 import warnings
 from collections.abc import Iterable
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from ..core.config.x_config import XCONF
 from ..core.utils.log import logger
+from ..core.utils.kinematics import DHKinematics
+from ..core.utils.limits import LimitChecker
 from .base import Base
 from .gripper import Gripper
 from .track import Track
@@ -23,10 +28,13 @@ from .record import Record
 from .robotiq import RobotIQ
 from .ft_sensor import FtSensor
 from .modbus_tcp import ModbusTcp
-from .parse import GcodeParser
+from .parse import GcodeParser, GCODE_MOTION_NUMS
 from .code import APIState
-from .decorator import xarm_is_connected, xarm_is_ready, xarm_wait_until_not_pause, xarm_wait_until_cmdnum_lt_max
+from .decorator import xarm_is_connected, xarm_is_ready, xarm_wait_until_not_pause, xarm_wait_until_cmdnum_lt_max, xarm_move_future
 from .utils import to_radian
+from .move_future import MoveFuture
+from .servo_stream import ServoStreamer
+from ..tools.threads import KeyedWorkerPool
 try:
     # from ..tools.blockly_tool import BlocklyTool
     from ..tools.blockly import BlocklyTool
@@ -218,6 +226,7 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
             return self._set_position_absolute(*tcp_pos, radius=radius, speed=speed, mvacc=mvacc, mvtime=mvtime,
                                                is_radian=True, wait=wait, timeout=timeout, **kwargs)
 
+    @xarm_move_future()
     @xarm_wait_until_not_pause
     @xarm_wait_until_cmdnum_lt_max
     @xarm_is_ready(_type='set')
@@ -436,6 +445,7 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
             return self._set_servo_angle_absolute(joints, speed=speed, mvacc=mvacc, mvtime=mvtime, is_radian=True,
                                                   wait=wait, timeout=timeout, radius=radius, **kwargs)
 
+    @xarm_move_future()
     @xarm_wait_until_not_pause
     @xarm_wait_until_cmdnum_lt_max
     @xarm_is_ready(_type='set')
@@ -504,6 +514,7 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
         self._is_set_move = True
         return ret[0]
 
+    @xarm_move_future()
     @xarm_wait_until_not_pause
     @xarm_wait_until_cmdnum_lt_max
     @xarm_is_ready(_type='set')
@@ -656,6 +667,95 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
             self.wait_move()
             self._sync()
 
+    def move_batch(self, segments, is_radian=None, wait=False, timeout=None):
+        """
+        :param segments: list of dict, the keys except type/pose/angles/pose1/pose2/percent are passed to the motion api
+            {'type': 'line', 'pose': [x, y, z, roll, pitch, yaw], 'speed': .., 'mvacc': .., 'mvtime': .., 'radius': ..}
+            {'type': 'joint', 'angles': [...], 'speed': .., 'mvacc': .., 'mvtime': .., 'radius': ..}
+            {'type': 'circle', 'pose1': [...], 'pose2': [...], 'percent': .., 'speed': .., 'mvacc': .., 'mvtime': ..}
+        :param timeout: timeout of the whole batch (sending and moving), the segments not sent in time are dropped
+        :return: code if wait else MoveFuture of the whole batch
+        """
+        future = MoveFuture()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for segment in segments:
+            seg_type = segment.get('type', 'line')
+            keys = self.__MOVE_BATCH_KEYS.get(seg_type, None)
+            if keys is None or any(k not in segment for k in keys):
+                logger.error('move_batch, invalid segment: {}'.format(segment))
+                future._resolve(APIState.PARAM_ERROR)
+                break
+        else:
+            if not segments:
+                future._resolve(0)
+            else:
+                # sent by the move-batch thread even if wait, so the wait is bounded by the timeout
+                if self._move_batch_sender is None:
+                    self._move_batch_sender = KeyedWorkerPool(1, name='move-batch')
+                if not self._move_batch_sender.submit(self, self.__send_move_batch, segments, is_radian, deadline, future):
+                    logger.error('move_batch, too many batches are waiting to be sent')
+                    future._resolve(APIState.API_EXCEPTION)
+        if not wait:
+            return future
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            # the segments not sent yet are dropped
+            future._resolve(APIState.WAIT_FINISH_TIMEOUT)
+            return APIState.WAIT_FINISH_TIMEOUT
+
+    __MOVE_BATCH_KEYS = {
+        'line': ('pose',),
+        'joint': ('angles',),
+        'circle': ('pose1', 'pose2', 'percent'),
+    }
+
+    def __send_move_batch(self, segments, is_radian, deadline, future):
+        try:
+            self.__send_move_batch_segments(segments, is_radian, deadline, future)
+        except Exception as e:
+            logger.error('move_batch, send exception: {}'.format(e))
+            future._resolve(APIState.API_EXCEPTION)
+
+    def __send_move_batch_segments(self, segments, is_radian, deadline, future):
+        # the cmdnum limit of every api keeps the command buffer of the controller filled (woken by the report frames)
+        last = len(segments) - 1
+        for i, segment in enumerate(segments):
+            if future.done():
+                # cancelled or timeout, the segments already sent are not stopped
+                return
+            if self.has_error:
+                future._resolve(APIState.HAS_ERROR)
+                return
+            if self.state == 4:
+                future._resolve(APIState.EMERGENCY_STOP)
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                future._resolve(APIState.WAIT_FINISH_TIMEOUT)
+                return
+            kwargs = {k: v for k, v in segment.items() if k not in ('type', 'pose', 'angles', 'pose1', 'pose2', 'percent')}
+            kwargs.setdefault('is_radian', is_radian)
+            kwargs['wait'] = False
+            if i == last:
+                kwargs['future'] = True
+                kwargs['timeout'] = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            seg_type = segment.get('type', 'line')
+            if seg_type == 'line':
+                ret = self.set_position(*segment['pose'][:6], **kwargs)
+            elif seg_type == 'joint':
+                ret = self.set_servo_angle(angle=segment['angles'], **kwargs)
+            else:
+                ret = self.move_circle(segment['pose1'], segment['pose2'], segment['percent'], **kwargs)
+            if i == last and isinstance(ret, MoveFuture):
+                # the batch is finished when its last segment is finished
+                ret.add_done_callback(lambda f: future._resolve(f.result(), feedback_code=f.feedback_code))
+            elif i == last:
+                future._resolve(ret)
+            elif ret != 0:
+                logger.error('move_batch, segment {} failed, code={}'.format(i, ret))
+                future._resolve(ret)
+                return
+
     @xarm_is_connected(_type='set')
     def set_servo_attach(self, servo_id=None):
         # assert isinstance(servo_id, int) and 1 <= servo_id <= 8
@@ -688,6 +788,7 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
     @xarm_is_connected(_type='set')
     def set_reduced_mode(self, on_off):
         ret = self.arm_cmd.set_reduced_mode(int(on_off))
+        self._limit_cache = None
         self.log_api_info('API -> set_reduced_mode -> code={}'.format(ret[0]), code=ret[0])
         return ret[0]
 
@@ -733,6 +834,7 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
         limits[2:4] = boundary[2:4] if boundary[2] >= boundary[3] else boundary[2:4][::-1]
         limits[4:6] = boundary[4:6] if boundary[4] >= boundary[5] else boundary[4:6][::-1]
         ret = self.arm_cmd.set_xyz_limits(limits)
+        self._limit_cache = None
         self.log_api_info('API -> set_reduced_tcp_boundary -> code={}, boundary={}'.format(ret[0], limits), code=ret[0])
         return ret[0]
 
@@ -763,12 +865,14 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
                 if limits[i * 2 + 1] <= angle_range[0]:
                     return APIState.OUT_OF_RANGE
         ret = self.arm_cmd.set_reduced_jrange(limits)
+        self._limit_cache = None
         self.log_api_info('API -> set_reduced_joint_range -> code={}, boundary={}'.format(ret[0], limits), code=ret[0])
         return ret[0]
 
     @xarm_is_connected(_type='set')
     def set_fense_mode(self, on_off):
         ret = self.arm_cmd.set_fense_on(int(on_off))
+        self._limit_cache = None
         self.log_api_info('API -> set_fense_mode -> code={}, on={}'.format(ret[0], on_off), code=ret[0])
         return ret
 
@@ -1043,6 +1147,93 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
                 pose = [pose[i] if i < 3 else math.degrees(pose[i]) for i in range(len(pose))]
         return ret[0], pose
 
+    def get_local_kinematics(self, samples=8):
+        code, dh_params = self.get_dh_params()
+        if code != 0:
+            return code, None
+        joint_limits = XCONF.Robot.JOINT_LIMITS.get(self.axis, {}).get(self.device_type, [])
+        refs = []
+        for _ in range(max(1, samples)):
+            # random angles inside the limits (at most +/- pi), validated against the fk of the controller
+            angles = [random.uniform(max(joint_limits[i][0], -math.pi), min(joint_limits[i][1], math.pi))
+                      if i < len(joint_limits) else random.uniform(-math.pi, math.pi) for i in range(self.axis)]
+            code, pose = self.get_forward_kinematics(angles, input_is_radian=True, return_is_radian=True)
+            if code != 0:
+                return code, None
+            refs.append((angles, pose))
+        base_offsets = [None]
+        if any(self._world_offset):
+            base_offsets.append(self._world_offset)
+        best = None
+        try:
+            for base_offset in base_offsets:
+                ret = DHKinematics.detect(dh_params, refs, axis=self.axis, tcp_offset=self._position_offset,
+                                          base_offset=base_offset, joint_limits=joint_limits)
+                if best is None or ret[1] + ret[2] * 100 < best[1] + best[2] * 100:
+                    best = ret
+        except ImportError as e:
+            logger.error(e)
+            return APIState.API_EXCEPTION, None
+        kinematics, pos_err, rot_err = best
+        self.log_api_info('API -> get_local_kinematics -> layout={}, convention={}, pos_err={}, rot_err={}'.format(
+            kinematics.layout, kinematics.convention, pos_err, rot_err), code=0)
+        if pos_err > 0.1 or rot_err > 0.001:
+            logger.error('local kinematics does not match the controller, pos_err={}mm, rot_err={}rad'.format(pos_err, rot_err))
+            return APIState.API_EXCEPTION, None
+        return 0, kinematics
+
+    def __get_limit_checker(self, refresh=False, margin=None):
+        if self._limit_cache is None or refresh:
+            reduced_on, tcp_boundary, reduced_joint_range, fense_on = 0, None, None, 0
+            if self.version_is_ge(1, 2, 11):
+                code, states = self.get_reduced_states(is_radian=True)
+                if code != 0:
+                    return code, None
+                reduced_on, tcp_boundary, reduced_joint_range, fense_on = states[0], states[1], states[4], states[5]
+            self._limit_cache = {
+                'reduced_joint_range': reduced_joint_range[:self.axis * 2] if reduced_on else None,
+                'tcp_boundary': tcp_boundary if fense_on else None,
+            }
+        rot_offset = [self._position_offset[i] + self._world_offset[i] for i in range(6)]
+        kwargs = {} if margin is None else {'margin': margin}
+        checker = LimitChecker(
+            joint_limits=XCONF.Robot.JOINT_LIMITS.get(self.axis, {}).get(self.device_type, []),
+            tcp_limits=XCONF.Robot.TCP_LIMITS.get(self.axis, {}).get(self.device_type, []),
+            rot_offset=rot_offset, **self._limit_cache, **kwargs)
+        return 0, checker
+
+    @xarm_is_connected(_type='get')
+    def check_limits(self, targets, is_joint=False, is_radian=None, kinematics=None, confirm=False, margin=None, refresh=False):
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        try:
+            code, checker = self.__get_limit_checker(refresh=refresh, margin=margin)
+            if code != 0:
+                return code, None
+            targets = LimitChecker.as_targets(targets, is_joint=is_joint, is_radian=is_radian)
+            seeds = None if is_joint else self._last_angles[:self.axis]
+            result = checker.check(targets, is_joint=is_joint, kinematics=kinematics, seeds=seeds)
+        except ImportError as e:
+            logger.error(e)
+            return APIState.API_EXCEPTION, None
+        result['confirmed'] = result['borderline'].copy()
+        result['confirmed'][:] = False
+        if confirm and result['borderline'].any():
+            indexes = result['borderline'].nonzero()[0]
+            if is_joint:
+                rets = self.arm_cmd.is_joint_limits([(targets[i][:7].tolist() + [0] * 7)[:7] for i in indexes])
+            else:
+                rets = self.arm_cmd.is_tcp_limits([targets[i][:6].tolist() for i in indexes])
+            for i, ret in zip(indexes, rets):
+                code = self._check_code(ret[0])
+                if code != 0:
+                    self.log_api_info('API -> check_limits -> confirm -> code={}'.format(code), code=code)
+                    return code, result
+                result['confirmed'][i] = True
+                result['ok'][i] = not ret[1]
+        self.log_api_info('API -> check_limits -> count={}, ok={}, borderline={}, confirmed={}'.format(
+            len(targets), int(result['ok'].sum()), int(result['borderline'].sum()), int(result['confirmed'].sum())), code=0)
+        return 0, result
+
     @xarm_is_connected(_type='get')
     def is_tcp_limit(self, pose, is_radian=None):
         is_radian = self._default_is_radian if is_radian is None else is_radian
@@ -1089,54 +1280,59 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
     def send_cmd_sync(self, command=None):
         if command is None:
             return 0
-        command = command.upper()
-        return self._handle_gcode(command)
+        return self._handle_gcode(gcode_p.compile_line(command))
+
+    def _handle_gcode(self, cmd):
+        """
+        :param cmd: compiled command (letter, num, words), see GcodeParser.compile_line
+        """
+        letter, cmd_num, words = cmd
+        command = gcode_p.format_cmd(cmd) if letter is not None else ''
 
-    def _handle_gcode(self, command):
         def __handle_gcode_g(num):
             if num == 1:  # G1 move_line, ex: G1 X{} Y{} Z{} A{roll} B{pitch} C{yaw} F{speed} Q{acc} T{}
-                mvvelo = gcode_p.get_mvvelo(command)
-                mvacc = gcode_p.get_mvacc(command)
-                mvtime = gcode_p.get_mvtime(command)
-                mvpose = gcode_p.get_poses(command)
+                mvvelo = gcode_p.get_mvvelo(words)
+                mvacc = gcode_p.get_mvacc(words)
+                mvtime = gcode_p.get_mvtime(words)
+                mvpose = gcode_p.get_poses(words)
                 ret = self.set_position(*mvpose, radius=-1, speed=mvvelo, mvacc=mvacc, mvtime=mvtime)
             elif num == 2:  # G2 move_circle, ex: G2 X{} Y{} Z{} A{} B{} C{} I{} J{} K{} L{} M{} N{} F{speed} Q{acc} T{}
-                mvvelo = gcode_p.get_mvvelo(command)
-                mvacc = gcode_p.get_mvacc(command)
-                mvtime = gcode_p.get_mvtime(command)
-                pos1 = gcode_p.get_poses(command, default=0)
-                pos2 = gcode_p.get_joints(command, default=0)[:6]
-                percent = gcode_p.get_mvradius(command, default=0)
+                mvvelo = gcode_p.get_mvvelo(words)
+                mvacc = gcode_p.get_mvacc(words)
+                mvtime = gcode_p.get_mvtime(words)
+                pos1 = gcode_p.get_poses(words, default=0)
+                pos2 = gcode_p.get_joints(words, default=0)[:6]
+                percent = gcode_p.get_mvradius(words, default=0)
                 ret = self.move_circle(pos1, pos2, percent=percent, speed=mvvelo, mvacc=mvacc, mvtime=mvtime)
             elif num == 4:  # G4 set_pause_time, ex: G4 T{}
-                sltime = gcode_p.get_mvtime(command, default=0)
+                sltime = gcode_p.get_mvtime(words, default=0)
                 ret = self.set_pause_time(sltime)
             elif num == 7:  # G7 move_joint, ex: G7 I{} J{} K{} L{} M{} N{} O{} F{} Q{} T{}
-                mvvelo = gcode_p.get_mvvelo(command)
-                mvacc = gcode_p.get_mvacc(command)
-                mvtime = gcode_p.get_mvtime(command)
-                mvjoint = gcode_p.get_joints(command)
+                mvvelo = gcode_p.get_mvvelo(words)
+                mvacc = gcode_p.get_mvacc(words)
+                mvtime = gcode_p.get_mvtime(words)
+                mvjoint = gcode_p.get_joints(words)
                 ret = self.set_servo_angle(angle=mvjoint, speed=mvvelo, mvacc=mvacc, mvtime=mvtime)
             elif num == 8:  # G8 move_gohome, ex: G8 F{} Q{} T{}
-                mvvelo = gcode_p.get_mvvelo(command)
-                mvacc = gcode_p.get_mvacc(command)
-                mvtime = gcode_p.get_mvtime(command)
+                mvvelo = gcode_p.get_mvvelo(words)
+                mvacc = gcode_p.get_mvacc(words)
+                mvtime = gcode_p.get_mvtime(words)
                 ret = self.move_gohome(speed=mvvelo, mvacc=mvacc, mvtime=mvtime)
             elif num == 9:  # G9 move_arc_line, ex: G9 X{} Y{} Z{} A{roll} B{pitch} C{yaw} R{radius} F{speed} Q{acc} T{}
-                mvvelo = gcode_p.get_mvvelo(command)
-                mvacc = gcode_p.get_mvacc(command)
-                mvtime = gcode_p.get_mvtime(command)
-                mvpose = gcode_p.get_poses(command)
-                mvradii = gcode_p.get_mvradius(command, default=0)
+                mvvelo = gcode_p.get_mvvelo(words)
+                mvacc = gcode_p.get_mvacc(words)
+                mvtime = gcode_p.get_mvtime(words)
+                mvpose = gcode_p.get_poses(words)
+                mvradii = gcode_p.get_mvradius(words, default=0)
                 ret = self.set_position(*mvpose, speed=mvvelo, mvacc=mvacc, mvtime=mvtime, radius=mvradii)
             elif num == 11:  # G11 set_servo_angle_j, ex: G11 I{} J{} K{} L{} M{} N{} O{} F{} Q{} T{}
-                mvvelo = gcode_p.get_mvvelo(command)
-                mvacc = gcode_p.get_mvacc(command)
-                mvtime = gcode_p.get_mvtime(command)
-                mvjoint = gcode_p.get_joints(command, default=0)
+                mvvelo = gcode_p.get_mvvelo(words)
+                mvacc = gcode_p.get_mvacc(words)
+                mvtime = gcode_p.get_mvtime(words)
+                mvjoint = gcode_p.get_joints(words, default=0)
                 ret = self.set_servo_angle_j(mvjoint, speed=mvvelo, mvacc=mvacc, mvtime=mvtime)
             elif num == 12:  # G12 sleep, ex: G12 T{}
-                mvtime = gcode_p.get_mvtime(command, default=0)
+                mvtime = gcode_p.get_mvtime(words, default=0)
                 time.sleep(mvtime)
                 ret = 0
             else:
@@ -1148,14 +1344,14 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
             if num == 1:  # H1 get_version, ex: H1
                 ret = self.get_version()
             elif num == 10:  # H10 system_control, ex: H10 V{}
-                value = gcode_p.get_int_value(command, default=0)
+                value = gcode_p.get_int_value(words, default=0)
                 ret = self.system_control(value)
             elif num == 11:  # H11 motion_enable, ex: H11 I{id} V{enable}
-                value = gcode_p.get_int_value(command)
-                servo_id = gcode_p.get_id_num(command, default=0)
+                value = gcode_p.get_int_value(words)
+                servo_id = gcode_p.get_id_num(words, default=0)
                 ret = self.motion_enable(enable=value, servo_id=servo_id)
             elif num == 12:  # H12 set_state, ex: H12 V{state}
-                value = gcode_p.get_int_value(command, default=0)
+                value = gcode_p.get_int_value(words, default=0)
                 ret = self.set_state(value)
             elif num == 13:  # H13 get_state, ex: H13
                 ret = self.get_state()
@@ -1168,35 +1364,35 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
             elif num == 17:  # H17 clean_warn, ex: H17
                 ret = self.clean_warn()
             elif num == 18:  # H18 set_brake, ex: H18 I{id} V{open}
-                value = gcode_p.get_int_value(command)
-                servo_id = gcode_p.get_id_num(command, default=0)
+                value = gcode_p.get_int_value(words)
+                servo_id = gcode_p.get_id_num(words, default=0)
                 ret = self.arm_cmd.set_brake(servo_id, value)[0]
             elif num == 19:  # H19 set_mode, ex: H19 V{mode}
-                value = gcode_p.get_int_value(command, default=0)
+                value = gcode_p.get_int_value(words, default=0)
                 ret = self.set_mode(value)
             elif num == 31:  # H31 set_tcp_jerk, ex: H31 V{jerk}
-                value = gcode_p.get_float_value(command, default=-1)
+                value = gcode_p.get_float_value(words, default=-1)
                 ret = self.set_tcp_jerk(value)
             elif num == 32:  # H32 set_tcp_maxacc, ex: H32 V{maxacc}
-                value = gcode_p.get_float_value(command, default=-1)
+                value = gcode_p.get_float_value(words, default=-1)
                 ret = self.set_tcp_maxacc(value)
             elif num == 33:  # H33 set_joint_jerk, ex: H33 V{jerk}
-                value = gcode_p.get_float_value(command, default=-1)
+                value = gcode_p.get_float_value(words, default=-1)
                 ret = self.set_joint_jerk(value)
             elif num == 34:  # H34 set_joint_maxacc, ex: H34 V{maxacc}
-                value = gcode_p.get_float_value(command, default=-1)
+                value = gcode_p.get_float_value(words, default=-1)
                 ret = self.set_joint_maxacc(value)
             elif num == 35:  # H35 set_tcp_offset, ex: H35 X{x} Y{y} Z{z} A{roll} B{pitch} C{yaw}
-                pose = gcode_p.get_poses(command)
+                pose = gcode_p.get_poses(words)
                 ret = self.set_tcp_offset(pose)
             elif num == 36:  # H36 set_tcp_load, ex: H36 I{weight} J{center_x} K{center_y} L{center_z}
-                values = gcode_p.get_joints(command, default=0)
+                values = gcode_p.get_joints(words, default=0)
                 ret = self.set_tcp_load(values[0], values[1:4])
             elif num == 37:  # H37 set_collision_sensitivity, ex: H37 V{sensitivity}
-                value = gcode_p.get_int_value(command, default=0)
+                value = gcode_p.get_int_value(words, default=0)
                 ret = self.set_collision_sensitivity(value)
             elif num == 38:  # H38 set_teach_sensitivity, ex: H38 V{sensitivity}
-                value = gcode_p.get_int_value(command, default=0)
+                value = gcode_p.get_int_value(words, default=0)
                 ret = self.set_teach_sensitivity(value)
             elif num == 39:  # H39 clean_conf, ex: H39
                 ret = self.clean_conf()
@@ -1207,40 +1403,40 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
             elif num == 42:  # H42 get_servo_angle, ex: H42
                 ret = self.get_servo_angle()
             elif num == 43:  # H43 get_ik, ex: H43 X{} Y{} Z{} A{roll} B{pitch} C{yaw}
-                pose = gcode_p.get_poses(command, default=0)
+                pose = gcode_p.get_poses(words, default=0)
                 ret = self.get_inverse_kinematics(pose, input_is_radian=False, return_is_radian=False)
             elif num == 44:  # H44 get_fk, ex: H44 I{} J{} K{} L{} M{} N{} O{}
-                joint = gcode_p.get_joints(command, default=0)
+                joint = gcode_p.get_joints(words, default=0)
                 ret = self.get_forward_kinematics(joint, input_is_radian=False, return_is_radian=False)
             elif num == 45:  # H45 is_joint_limit, ex: H45 I{} J{} K{} L{} M{} N{} O{}
-                joint = gcode_p.get_joints(command)
+                joint = gcode_p.get_joints(words)
                 ret = self.is_joint_limit(joint, is_radian=False)
             elif num == 46:  # H46 is_tcp_limit, ex: H46 X{} Y{} Z{} A{roll} B{pitch} C{yaw}
-                pose = gcode_p.get_poses(command)
+                pose = gcode_p.get_poses(words)
                 ret = self.is_tcp_limit(pose, is_radian=False)
             elif num == 51:  # H51 set_gravity_direction, ex: H51 X{} Y{} Z{} A{roll} B{pitch} C{yaw}
-                pose = gcode_p.get_poses(command, default=0)
+                pose = gcode_p.get_poses(words, default=0)
                 ret = self.set_gravity_direction(pose)
             elif num == 101:  # H101 set_servo_addr_16, ex: H101 I{id} D{addr} V{value}
-                value = gcode_p.get_int_value(command)
-                servo_id = gcode_p.get_id_num(command, default=0)
-                addr = gcode_p.get_addr(command)
+                value = gcode_p.get_int_value(words)
+                servo_id = gcode_p.get_id_num(words, default=0)
+                addr = gcode_p.get_addr(words)
                 ret = self.set_servo_addr_16(servo_id=servo_id, addr=addr, value=value)
             elif num == 102:  # H102 get_servo_addr_16, ex: H102 I{id} D{addr}
-                servo_id = gcode_p.get_id_num(command, default=0)
-                addr = gcode_p.get_addr(command)
+                servo_id = gcode_p.get_id_num(words, default=0)
+                addr = gcode_p.get_addr(words)
                 ret = self.get_servo_addr_16(servo_id=servo_id, addr=addr)
             elif num == 103:  # H103 set_servo_addr_32, ex: H103 I{id} D{addr} V{value}
-                servo_id = gcode_p.get_id_num(command, default=0)
-                addr = gcode_p.get_addr(command)
-                value = gcode_p.get_int_value(command)
+                servo_id = gcode_p.get_id_num(words, default=0)
+                addr = gcode_p.get_addr(words)
+                value = gcode_p.get_int_value(words)
                 ret = self.set_servo_addr_32(servo_id=servo_id, addr=addr, value=value)
             elif num == 104:  # H104 get_servo_addr_32, ex: H104 I{id} D{addr}
-                servo_id = gcode_p.get_id_num(command, default=0)
-                addr = gcode_p.get_addr(command)
+                servo_id = gcode_p.get_id_num(words, default=0)
+                addr = gcode_p.get_addr(words)
                 ret = self.get_servo_addr_32(servo_id=servo_id, addr=addr)
             elif num == 105:  # H105 set_servo_zero, ex: H105 I{id}
-                servo_id = gcode_p.get_id_num(command, default=0)
+                servo_id = gcode_p.get_id_num(words, default=0)
                 ret = self.set_servo_zero(servo_id=servo_id)
             elif num == 106:  # H106 get_servo_debug_msg, ex: H106
                 ret = self.get_servo_debug_msg()
@@ -1251,20 +1447,20 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
 
         def __handle_gcode_m(num):
             if num == 116:  # M116 set_gripper_enable, ex: M116 V{enable}
-                value = gcode_p.get_int_value(command)
+                value = gcode_p.get_int_value(words)
                 ret = self.set_gripper_enable(value)
             elif num == 117:  # M117 set_gripper_mode, ex: M117 V{mode}
-                value = gcode_p.get_int_value(command)
+                value = gcode_p.get_int_value(words)
                 ret = self.set_gripper_mode(value)
             elif num == 118:  # M118 set_gripper_zero, ex: M118
                 ret = self.set_gripper_zero()
             elif num == 119:  # M119 get_gripper_position, ex: M119
                 ret = self.get_gripper_position()
             elif num == 120:  # M120 set_gripper_position, ex: M120 V{pos}
-                value = gcode_p.get_int_value(command)
+                value = gcode_p.get_int_value(words)
                 ret = self.set_gripper_position(value)
             elif num == 121:  # M121 set_gripper_speed, ex: M121 V{speed}
-                value = gcode_p.get_int_value(command)
+                value = gcode_p.get_int_value(words)
                 ret = self.set_gripper_speed(value)
             elif num == 125:  # M125 get_gripper_err_code, ex: M125
                 ret = self.get_gripper_err_code()
@@ -1275,14 +1471,14 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
             elif num == 131:  # M131 get_tgpio_digital, ex: M131
                 ret = self.get_tgpio_digital()
             elif num == 132:  # M132 set_tgpio_digital, ex: M132 I{ionum} V{}
-                ionum = gcode_p.get_id_num(command, default=0)
-                value = gcode_p.get_int_value(command)
+                ionum = gcode_p.get_id_num(words, default=0)
+                value = gcode_p.get_int_value(words)
                 ret = self.set_tgpio_digital(ionum, value)
             elif num == 133:  # M133 get_tgpio_analog(0), ex: M133 I{ionum=0}
-                ionum = gcode_p.get_id_num(command, default=0)
+                ionum = gcode_p.get_id_num(words, default=0)
                 ret = self.get_tgpio_analog(ionum=ionum)
             elif num == 134:  # M134 get_tgpio_analog(1), ex: M134 I{ionum=1}
-                ionum = gcode_p.get_id_num(command, default=0)
+                ionum = gcode_p.get_id_num(words, default=0)
                 ret = self.get_tgpio_analog(ionum=ionum)
             elif num == 135:
                 return self.get_tgpio_version()
@@ -1293,10 +1489,10 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
 
         def __handle_gcode_d(num):
             if num == 11:  # D11 I{id}
-                id_num = gcode_p.get_id_num(command, default=None)
+                id_num = gcode_p.get_id_num(words, default=None)
                 ret = self.get_servo_error_code(id_num)
             elif num == 12:  # D12 I{id}
-                id_num = gcode_p.get_id_num(command, default=None)
+                id_num = gcode_p.get_id_num(words, default=None)
                 if id_num == 0:
                     id_num = 8
                 self.clean_error()
@@ -1304,13 +1500,13 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
                 self.motion_enable(enable=False, servo_id=id_num)
                 ret = self.set_servo_detach(id_num)
             elif num == 13:  # D13 I{id}
-                id_num = gcode_p.get_id_num(command, default=None)
+                id_num = gcode_p.get_id_num(words, default=None)
                 if id_num == 0:
                     id_num = 8
                 self.set_servo_zero(id_num)
                 ret = self.motion_enable(enable=True, servo_id=id_num)
             elif num == 21:  # D21 I{id}
-                id_num = gcode_p.get_id_num(command, default=None)
+                id_num = gcode_p.get_id_num(words, default=None)
                 self.clean_servo_pvl_err(id_num)
                 ret = self.get_servo_error_code(id_num)
             else:
@@ -1320,10 +1516,10 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
 
         def __handle_gcode_s(num):
             if num == 44:  # S44 I{id}
-                id_num = gcode_p.get_id_num(command, default=None)
+                id_num = gcode_p.get_id_num(words, default=None)
                 ret = self.get_servo_all_pids(id_num)
             elif num == 45:
-                id_num = gcode_p.get_id_num(command, default=1)
+                id_num = gcode_p.get_id_num(words, default=1)
                 ret = self.get_servo_version(servo_id=id_num)
             else:
                 logger.debug('command {} is not exist'.format(command))
@@ -1334,30 +1530,30 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
             if num == 131:  # C131 get_cgpio_digital, ex: C131
                 ret = self.get_cgpio_digital()
             elif num == 132:  # C132 get_cgpio_analog(0), ex: C132 I{ionum=0}
-                ionum = gcode_p.get_id_num(command, default=0)
+                ionum = gcode_p.get_id_num(words, default=0)
                 ret = self.get_cgpio_analog(ionum)
             elif num == 133:  # C133 get_cgpio_analog(1), ex: C133 I{ionum=1}
-                ionum = gcode_p.get_id_num(command, default=1)
+                ionum = gcode_p.get_id_num(words, default=1)
                 ret = self.get_cgpio_analog(ionum)
             elif num == 134:  # C134 set_cgpio_digital, ex: C134 I{ionum} V{value}
-                ionum = gcode_p.get_id_num(command, default=0)
-                value = gcode_p.get_int_value(command)
+                ionum = gcode_p.get_id_num(words, default=0)
+                value = gcode_p.get_int_value(words)
                 ret = self.set_cgpio_digital(ionum, value)
             elif num == 135:  # C135 set_cgpio_analog(0, v), ex: C135 I{ionum=0} V{value}
-                ionum = gcode_p.get_id_num(command, default=0)
-                value = gcode_p.get_float_value(command)
+                ionum = gcode_p.get_id_num(words, default=0)
+                value = gcode_p.get_float_value(words)
                 ret = self.set_cgpio_analog(ionum, value)
             elif num == 136:  # C136 set_cgpio_analog(1, v), ex: C136 I{ionum=1} V{value}
-                ionum = gcode_p.get_id_num(command, default=1)
-                value = gcode_p.get_float_value(command)
+                ionum = gcode_p.get_id_num(words, default=1)
+                value = gcode_p.get_float_value(words)
                 ret = self.set_cgpio_analog(ionum, value)
             elif num == 137:  # C137 set_cgpio_digital_input_function, ex: C137 I{ionum} V{fun}
-                ionum = gcode_p.get_id_num(command, default=0)
-                value = gcode_p.get_int_value(command)
+                ionum = gcode_p.get_id_num(words, default=0)
+                value = gcode_p.get_int_value(words)
                 ret = self.set_cgpio_digital_input_function(ionum, value)
             elif num == 138:  # C138 set_cgpio_digital_output_function, ex: C138 I{ionum} V{fun}
-                ionum = gcode_p.get_id_num(command, default=0)
-                value = gcode_p.get_int_value(command)
+                ionum = gcode_p.get_id_num(words, default=0)
+                value = gcode_p.get_int_value(words)
                 ret = self.set_cgpio_digital_output_function(ionum, value)
             elif num == 139:  # C139 get_cgpio_state, ex: C139
                 ret = self.get_cgpio_state()
@@ -1366,61 +1562,161 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
                 ret = APIState.CMD_NOT_EXIST, 'command {} is not exist'.format(command)
             return ret
 
-        cmd_num = gcode_p.get_gcode_cmd_num(command, 'G')
-        if cmd_num >= 0:
+        if letter == 'G':
             return __handle_gcode_g(cmd_num)
-        cmd_num = gcode_p.get_gcode_cmd_num(command, 'H')
-        if cmd_num >= 0:
+        elif letter == 'H':
             return __handle_gcode_h(cmd_num)
-        cmd_num = gcode_p.get_gcode_cmd_num(command, 'M')
-        if cmd_num >= 0:
+        elif letter == 'M':
             return __handle_gcode_m(cmd_num)
-        cmd_num = gcode_p.get_gcode_cmd_num(command, 'D')
-        if cmd_num >= 0:
+        elif letter == 'D':
             return __handle_gcode_d(cmd_num)
-        cmd_num = gcode_p.get_gcode_cmd_num(command, 'S')
-        if cmd_num >= 0:
+        elif letter == 'S':
             return __handle_gcode_s(cmd_num)
-        cmd_num = gcode_p.get_gcode_cmd_num(command, 'C')
-        if cmd_num >= 0:
+        elif letter == 'C':
             return __handle_gcode_c(cmd_num)
         logger.debug('command {} is not exist'.format(command))
         return APIState.CMD_NOT_EXIST, 'command {} is not exist'.format(command)
 
+    @staticmethod
+    def __gcode_motion_segment(cmd):
+        # compiled G1/G2/G7/G9 => segment of move_batch
+        words = cmd[2]
+        segment = {
+            'speed': gcode_p.get_mvvelo(words),
+            'mvacc': gcode_p.get_mvacc(words),
+            'mvtime': gcode_p.get_mvtime(words),
+        }
+        if cmd[1] == 1:
+            segment.update(type='line', pose=gcode_p.get_poses(words), radius=-1)
+        elif cmd[1] == 2:
+            segment.update(type='circle', pose1=gcode_p.get_poses(words, default=0),
+                           pose2=gcode_p.get_joints(words, default=0)[:6], percent=gcode_p.get_mvradius(words, default=0))
+        elif cmd[1] == 7:
+            segment.update(type='joint', angles=gcode_p.get_joints(words))
+        else:
+            segment.update(type='line', pose=gcode_p.get_poses(words), radius=gcode_p.get_mvradius(words, default=0))
+        return segment
+
+    def __send_gcode_buffer(self, buffer, pending, blend_radius=None, is_end=False):
+        """
+        :param buffer: [(num, segment)] of the consecutive motion commands
+        :param pending: [(future, sent event)] of the batches, the batches are sent in order by the move-batch thread
+        :param is_end: the motions end (a non-motion command follows or the end of the commands),
+            all the segments are sent and waited until sent, otherwise the last segment is kept in the buffer
+        :return: code, < 0 if a batch failed
+        """
+        segments = [x[1] for x in (buffer if is_end else buffer[:-1])]
+        if blend_radius is not None:
+            # blend the G1 commands which are followed by another motion command
+            for num, segment in buffer[:-1]:
+                if num == 1:
+                    segment['radius'] = blend_radius
+        del buffer[:len(segments)]
+        if segments:
+            future = self.move_batch(segments)
+            sent = threading.Event()
+            if self._move_batch_sender is None or not self._move_batch_sender.submit(self, sent.set):
+                sent.set()
+            pending.append((future, sent))
+        # bound the read-ahead, wait until the older batches are sent
+        max_pending = 0 if is_end else 2
+        while len(pending) > max_pending:
+            pending[0][1].wait()
+            future = pending.pop(0)[0]
+            if future.done() and future.result() < 0:
+                return future.result()
+        for future, _ in pending:
+            if future.done() and future.result() < 0:
+                return future.result()
+        return 0
+
+    def _run_gcode_commands(self, commands, lookahead=0, blend_radius=None):
+        """
+        :param commands: iterable of the compiled commands (letter, num, words)
+        :param lookahead: max number of the consecutive motion commands (G1/G2/G7/G9) sent as one move_batch,
+            0 means every command is handled on its own (same as send_cmd_sync)
+        :param blend_radius: radius (mm) of the G1 commands followed by another motion command, None means no blending
+        """
+        buffer = []
+        pending = []
+        for cmd in commands:
+            if not self.connected:
+                logger.error('xArm is disconnect')
+                return APIState.NOT_CONNECTED
+            if lookahead > 0 and cmd[0] == 'G' and cmd[1] in GCODE_MOTION_NUMS:
+                buffer.append((cmd[1], self.__gcode_motion_segment(cmd)))
+                if len(buffer) > lookahead:
+                    code = self.__send_gcode_buffer(buffer, pending, blend_radius=blend_radius)
+                    if code < 0:
+                        return code
+                continue
+            if buffer or pending:
+                # the motions before the command are sent first (the motions are not waited)
+                code = self.__send_gcode_buffer(buffer, pending, blend_radius=blend_radius, is_end=True)
+                if code < 0:
+                    return code
+            ret = self._handle_gcode(cmd)
+            if isinstance(ret, int) and ret < 0:
+                return ret
+        if buffer or pending:
+            code = self.__send_gcode_buffer(buffer, pending, blend_radius=blend_radius, is_end=True)
+            if code < 0:
+                return code
+        return APIState.NORMAL
+
+    def __prepare_gcode_run(self, **kwargs):
+        if kwargs.get('init', False):
+            self.clean_error()
+            self.clean_warn()
+            self.motion_enable(True)
+            self.set_mode(kwargs.get('mode', 0))
+            self.set_state(kwargs.get('state', 0))
+        wait_seconds = kwargs.get('wait_seconds', 0)
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
     @xarm_is_connected(_type='set')
     def run_gcode_file(self, path, **kwargs):
         times = kwargs.get('times', 1)
-        init = kwargs.get('init', False)
-        mode = kwargs.get('mode', 0)
-        state = kwargs.get('state', 0)
-        wait_seconds = kwargs.get('wait_seconds', 0)
+        lookahead = kwargs.get('lookahead', 0)
+        blend_radius = kwargs.get('blend_radius', None)
         try:
             abs_path = os.path.abspath(path)
             if not os.path.exists(abs_path):
                 raise FileNotFoundError
-            with open(abs_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            lines = [line.strip() for line in lines]
-            if init:
-                self.clean_error()
-                self.clean_warn()
-                self.motion_enable(True)
-                self.set_mode(mode)
-                self.set_state(state)
-            if wait_seconds > 0:
-                time.sleep(wait_seconds)
+            self.__prepare_gcode_run(**kwargs)
+            for i in range(times):
+                # streaming, the file is compiled line by line while running
+                with open(abs_path, 'r', encoding='utf-8') as f:
+                    ret = self._run_gcode_commands(gcode_p.compile(f), lookahead=lookahead, blend_radius=blend_radius)
+                if ret < 0:
+                    return ret
+            return APIState.NORMAL
+        except Exception as e:
+            logger.error(e)
+            return APIState.API_EXCEPTION
+
+    def parse_gcode_file(self, path):
+        try:
+            with open(os.path.abspath(path), 'r', encoding='utf-8') as f:
+                return 0, list(gcode_p.compile(f))
+        except Exception as e:
+            logger.error(e)
+            return APIState.API_EXCEPTION, None
 
+    @xarm_is_connected(_type='set')
+    def run_gcode_commands(self, commands, **kwargs):
+        times = kwargs.get('times', 1)
+        if times > 1 and not isinstance(commands, (list, tuple)):
+            # a generator (such as gcode_p.compile(f)) can only be iterated once
+            commands = list(commands)
+        try:
+            self.__prepare_gcode_run(**kwargs)
             for i in range(times):
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    if not self.connected:
-                        logger.error('xArm is disconnect')
-                        return APIState.NOT_CONNECTED
-                    ret = self.send_cmd_sync(line)
-                    if isinstance(ret, int) and ret < 0:
-                        return ret
+                ret = self._run_gcode_commands(commands, lookahead=kwargs.get('lookahead', 0),
+                                               blend_radius=kwargs.get('blend_radius', None))
+                if ret < 0:
+                    return ret
             return APIState.NORMAL
         except Exception as e:
             logger.error(e)
@@ -1676,6 +1972,9 @@ class XArm(Gripper, Servo, Record, RobotIQ, BaseBoard, Track, FtSensor, ModbusTc
         ), code=ret[0])
         return ret[0]
 
+    def create_servo_streamer(self, mode='servo_j', period=0.004, **kwargs):
+        return ServoStreamer(self, mode=mode, period=period, **kwargs)
+
     @xarm_is_connected(_type='get')
     def calibrate_tcp_coordinate_offset(self, four_points, is_radian=None):
         assert len(four_points) >= 4, 'The parameter four_points must contain 4 TCP points'